@@ -31,26 +31,94 @@ Here's the final score:
 
 """
 import argparse
+import itertools
 import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from cantstop.lib.all_the_things import Game
 from cantstop.lib.bots.bots import *
+from cantstop.lib.odds import RollSource, derive_seed
+
+# How many games to time each bot with before sorting the jobs.
+PILOT_GAMES = 3
+
+
+def play_job(seat_order, repetitions, seed, headless=True):
+    """
+    Play the same seating repetitions times.  This runs in the worker
+    processes so keep it at the module level.
+
+    :param seat_order: tuple of bot classes in the order they take turns
+    :param repetitions:
+    :param seed: the tournament seed
+    :param headless:
+    :return: (seat_order, list of (winning seat, GameResult))
+    """
+    names = [p.__name__ for p in seat_order]
+    results = []
+    for repetition in range(repetitions):
+        game = Game(headless=headless, shuffle_seats=False,
+                    seed=derive_seed(seed, "-".join(names), repetition))
+        for p in seat_order:
+            game.add_player(p(p.__name__))
+
+        result = game.run()
+        if not headless:
+            print("Winner is {}".format(result.winner))
+        results.append((names.index(result.winner), result))
+
+    return seat_order, results
 
 
 class Tournament(object):
-    def __init__(self):
-        self.game_history = []
-        self.scoreboard = None
-        self.game_contestants = []  # list of tuples of Players
-        self.results = {}
+    def __init__(self, headless=True, repetitions=1, workers=1, seed=None):
+        """
+        :param headless:
+        :param repetitions: how many games to play for each seating
+        :param workers: how many processes to play the games on
+        :param seed: seed for the whole tournament.  Every seating gets its
+        own substream.
+        """
+        if seed is None:
+            seed = RollSource().seed
+        self.headless = headless
+        self.repetitions = repetitions
+        self.workers = workers
+        self.seed = seed
+        self.game_contestants = []  # list of tuples of bot classes
+        self.jobs = []  # list of tuples of bot classes in seat order
         self.all_players = []
 
+        # These are filled in as the results come back.
+        self.games_played = 0
+        self.win_record = defaultdict(int)  # name -> wins
+        self.seat_wins = defaultdict(int)  # seat -> wins
+        self.combination_wins = {}  # sorted tuple of names -> defaultdict of name -> wins
+
+    @staticmethod
+    def estimate_seconds(bot_class, games=PILOT_GAMES):
+        """
+        Time a few seeded games of the bot against two copies of itself to
+        guess how long its games run.  Attempts aren't good enough since
+        some bots spend a fixed time on each decision.
+
+        :return: the average seconds per game
+        """
+        start = time.perf_counter()
+        for seed in range(games):
+            game = Game(headless=True, seed=seed)
+            for i in range(3):
+                game.add_player(bot_class("{}{}".format(bot_class.__name__, i)))
+            game.run()
+        return (time.perf_counter() - start) / games
+
     def plan(self):
         # Find the players - eventually, this should not be explicit.
         self.all_players = [CowardBot, SmartCowardBot, ConservativeBot, ScoringBot, ChoosingScoringBot,
                             RunningScoringBot, QuadRollerBot, HexRollerBot, SeptaRollerBot, OctoRollerBot,
-                            DecaRollerBot]
+                            DecaRollerBot, ExpectimaxBot]
 
         # Make a game with each combination of three players.
         pcount = len(self.all_players)
@@ -61,38 +129,59 @@ class Tournament(object):
                                                   self.all_players[b],
                                                   self.all_players[c]))
 
-        print("Will play {} games with {} players.".format(len(self.game_contestants), pcount))
+        # Each combination is played in every seat order so going first
+        # doesn't decide the standings.
+        for gc in self.game_contestants:
+            self.jobs.extend(itertools.permutations(gc))
+
+        # With a pool, start the longest jobs first so they don't straggle
+        # at the end.
+        if self.workers > 1:
+            expected_seconds = {}
+            for p in self.all_players:
+                expected_seconds[p] = Tournament.estimate_seconds(p)
+            self.jobs.sort(key=lambda job: sum(expected_seconds[p] for p in job), reverse=True)
 
-    def play_game(self, players):
-        # print("Playing a game with {}, {}, and {}".format(players[0].name, players[1].name, players[2].name))
-        game = Game()
-        for player in players:
-            game.add_player(player)
+        print("Will play {} games with {} players.".format(len(self.jobs) * self.repetitions, pcount))
 
-        game.run()
-        print("Winner is {}".format(game.winner))
-        self.results[tuple(players)] = game.winner  # this is a str of the winning player's name
+    def record(self, seat_order, results):
+        names = tuple(sorted(p.__name__ for p in seat_order))
+        if names not in self.combination_wins:
+            self.combination_wins[names] = defaultdict(int)
+
+        for seat, result in results:
+            self.games_played += 1
+            self.win_record[result.winner] += 1
+            self.seat_wins[seat] += 1
+            self.combination_wins[names][result.winner] += 1
 
     def run(self):
-        for gc in self.game_contestants:
-            players = []  # instances of bots
+        if self.workers <= 1:
+            for seat_order in self.jobs:
+                self.record(*play_job(seat_order, self.repetitions, self.seed, self.headless))
+            return
 
-            # gc is a tuple of bot classes.
-            for p in gc:
-                players.append(p(p.__name__))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for seat_order in self.jobs:
+                futures.append(pool.submit(play_job, seat_order, self.repetitions, self.seed))
 
-            self.play_game(players)
+            for future in as_completed(futures):
+                self.record(*future.result())
 
     def report(self):
-        win_record = defaultdict(int)
-        for r in self.results:
-            game_players = "{}, {}, {}".format(r[0].name, r[1].name, r[2].name)
-            print("{:>55} ---> {}".format(game_players, self.results[r], ))
-            win_record[self.results[r]] += 1
+        for names in sorted(self.combination_wins):
+            wins = self.combination_wins[names]
+            score = ", ".join("{} {}".format(name, wins[name]) for name in names)
+            print("{:>55} ---> {}".format(", ".join(names), score))
+
+        print("\nWins by seat:")
+        for seat in sorted(self.seat_wins):
+            print("{:>20} won {} games".format("Seat {}".format(seat + 1), self.seat_wins[seat]))
 
-        print("\nHere's the final score:")
-        for name in sorted(win_record.items(), key=lambda x: x[1], reverse=True):
-            print("{:>20} won {} games".format(name[0], win_record[name[0]]))
+        print("\nHere's the final score after {} games:".format(self.games_played))
+        for name in sorted(self.win_record.items(), key=lambda x: x[1], reverse=True):
+            print("{:>20} won {} games".format(name[0], self.win_record[name[0]]))
 
 
 def main():
@@ -102,16 +191,27 @@ This will take all the bots and find the best performer.
     epilog = '''
 Examples:
 ./arena.py
+./arena.py -r 10 -w 8 --seed 42
 '''
     parser = argparse.ArgumentParser(description=description, epilog=epilog)
-    parser.add_argument("-i", "--iteration", help="How many times to run?",
-                        type=int, default=10000)
+    parser.add_argument("-r", "--repetitions", help="How many games for each seating of each combination?",
+                        type=int, default=1)
+    parser.add_argument("-w", "--workers", help="Number of processes to play the games on",
+                        type=int, default=1)
+    parser.add_argument("--seed", help="Seed to make the tournament reproducible", type=int)
+    parser.add_argument("--print-games", help="Print every round and turn of every game",
+                        action="store_true")
+    args = parser.parse_args()
+    if args.print_games and args.workers > 1:
+        parser.error("--print-games only works with one worker")
     logging.basicConfig(level=logging.WARNING,
                         stream=sys.stdout,
                         format='%(levelname)s - %(message)s')
     logging.debug("Starting up....")
 
-    t = Tournament()
+    t = Tournament(headless=not args.print_games, repetitions=args.repetitions,
+                   workers=args.workers, seed=args.seed)
+    print("Using seed {}".format(t.seed))
     t.plan()
     t.run()
     t.report()
@@ -53,17 +53,24 @@ of rolling that value.
     epilog = '''
 Examples:
 ./infinite_attempts.py
+./infinite_attempts.py --audit 100000
 '''
     parser = argparse.ArgumentParser(description=description, epilog=epilog)
     parser.add_argument("-i", "--iteration", help="How many times to run?",
                         type=int, default=10000)
+    parser.add_argument("--audit", help="Check the dice against the exact odds and report every this many rolls.",
+                        type=int, default=0)
     args = parser.parse_args()
-    logging.basicConfig(level=logging.WARNING,
+    logging.basicConfig(level=logging.INFO if args.audit else logging.WARNING,
                         stream=sys.stdout,
                         format='%(levelname)s - %(message)s')
     logging.debug("Starting up....")
     print("Running {} infinite games....".format(args.iteration))
 
+    audit = None
+    if args.audit:
+        audit = odds.RollAudit(args.audit)
+
     game = None
     record = []
     for i in range(1, args.iteration+1):
@@ -71,7 +78,7 @@ Examples:
             print("\n===== We have begun iteration #{} =====".format(i))
 
         # Maybe I could make a reset() method in Game()?
-        game = InfiniteGame()
+        game = InfiniteGame(headless=True, audit=audit)
         game.add_player(OctoRollerBot("Woody"))
         turn, winning_columns = game.run()
         record.append([turn, winning_columns])
@@ -95,9 +102,9 @@ Examples:
         winning_columns_tracker[tuple(r[1])] += 1
 
     for wc in winning_columns_tracker:
-        if wc[1] < least_frequent_winning_triple[1]:
+        if winning_columns_tracker[wc] < least_frequent_winning_triple[1]:
             least_frequent_winning_triple = [wc, winning_columns_tracker[wc]]
-        if wc[1] > most_frequent_winning_triple[1]:
+        if winning_columns_tracker[wc] > most_frequent_winning_triple[1]:
             most_frequent_winning_triple = [wc, winning_columns_tracker[wc]]
 
     pprint.PrettyPrinter().pprint(winning_columns_tracker)
@@ -105,6 +112,8 @@ Examples:
     print("The average number of rounds in a game is {:3.3f}".format(round_sum/len(record)))
     print("The most winning triple: {}".format(most_frequent_winning_triple))
     print("The least winning triple: {}".format(least_frequent_winning_triple))
+    if audit:
+        audit.log_report(audit.get_report())
 
 
 if __name__ == "__main__":
@@ -113,6 +122,9 @@ if __name__ == "__main__":
 
 """
 The below outputs make me think the random() isn't that random.
+
+Those most and least winning triples were picked by comparing the middle
+column of each triple, not its count.  Use --audit to check the dice.
 After 100000 infinite games with CowardBot....
 The average number of rounds in a game is 28.7
 The most winning triple: ((2, 3, 12), 2349)
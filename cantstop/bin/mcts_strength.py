@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Q: How much stronger than ChoosingScoringBot does MCTS make a bot?
+A: Play MCTSBot against it with a few rollout budgets, see mcts.py.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from cantstop.lib.all_the_things import Game
+from cantstop.lib.bots.bots import ChoosingScoringBot, MCTSBot
+from cantstop.lib.odds import RollSource
+
+
+def set_logger(verbose_level):
+    if verbose_level >= 2:
+        logging_level = logging.DEBUG
+    elif verbose_level == 1:
+        logging_level = logging.INFO
+    else:
+        logging_level = logging.ERROR
+
+    logging.basicConfig(level=logging_level,
+                        stream=sys.stdout,
+                        format='%(levelname)s - %(message)s')
+
+
+def play_match(args, rollouts, seed):
+    """
+    Game i of every match uses substream i of the seed, so the budgets
+    see the same dice until their decisions differ.
+
+    :return: (MCTSBot wins, seconds)
+    """
+    master_source = RollSource(seed)
+    wins = 0
+    start = time.perf_counter()
+    for i in range(0, args.iteration):
+        game = Game(headless=True, roll_source=master_source.spawn(i))
+        game.add_player(MCTSBot("MCTSBot", rollouts, args.milliseconds, args.workers, args.policy, seed + i))
+        game.add_player(ChoosingScoringBot("ChoosingScoringBot"))
+        result = game.run()
+        if result.winner == "MCTSBot":
+            wins += 1
+        logging.debug("Game #{}: {} won.".format(i + 1, result.winner))
+    return wins, time.perf_counter() - start
+
+
+def main():
+    description = '''
+Play MCTSBot against ChoosingScoringBot with each rollout budget.
+'''
+    epilog = '''
+Examples:
+./mcts_strength.py -i 20
+./mcts_strength.py -i 100 --rollouts 500 2000 --workers 4 --seed 42
+./mcts_strength.py -i 50 --milliseconds 100 --policy random
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilog)
+    parser.add_argument("-i", "--iteration", help="Games per budget", default=100, type=int)
+    parser.add_argument("-v", "--verbose", help="Print info/debug", action="count", default=1)
+    parser.add_argument("--rollouts", help="Rollouts per decision, one match each", nargs="+",
+                        default=[1000], type=int)
+    parser.add_argument("--milliseconds", help="Search each decision for this long instead", type=float)
+    parser.add_argument("--policy", help="How the rollouts play", choices=("heuristic", "random"),
+                        default="heuristic")
+    parser.add_argument("-w", "--workers", help="Number of processes to search each decision on",
+                        default=1, type=int)
+    parser.add_argument("--seed", help="Seed to make the whole run reproducible", type=int)
+    args = parser.parse_args()
+    set_logger(args.verbose)
+
+    seed = args.seed
+    if seed is None:
+        seed = RollSource().seed
+    print("Using seed {}".format(seed))
+
+    budgets = args.rollouts
+    if args.milliseconds is not None:
+        budgets = budgets[:1]
+    for rollouts in budgets:
+        wins, seconds = play_match(args, rollouts, seed)
+        if args.milliseconds is None:
+            budget = "{} rollouts".format(rollouts)
+        else:
+            budget = "{}ms".format(args.milliseconds)
+        print("{}: MCTSBot won {} of {} games ({:.1%}) in {:.1f}s".format(
+            budget, wins, args.iteration, wins / args.iteration, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,11 @@ Run different bots many times to see who is best.
 import argparse
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from cantstop.lib.all_the_things import Game
 from cantstop.lib.bots.bots import *
+from cantstop.lib.odds import BulkRollSource, RollSource, derive_seed
 
 
 def set_logger(verbose_level):
@@ -30,6 +32,94 @@ def set_logger(verbose_level):
                         format='%(levelname)s - %(message)s')
 
 
+def play_games(players, seed, bulk, first, last, print_games=False, show_progress=False):
+    """
+    Play games number first to last - 1.  Game i always uses substream i of
+    the seed, so the results don't depend on how the games are split up.
+
+    This runs in the worker processes so keep it at the module level.  The
+    workers leave printing to the parent, see play_parallel().
+
+    :param print_games: print every game.  Only for a single worker.
+    :param show_progress: print a line every tenth of the games.  Only for
+    a single worker since the numbers are out of last.
+
+    :return: list of GameResult
+    """
+    if bulk:
+        master_source = BulkRollSource(seed)
+    else:
+        master_source = RollSource(seed)
+
+    results = []
+    progress_step = max(1, round((last - first) / 10))
+    for i in range(first, last):
+        if print_games:
+            print("\n>>>>>>\n>>>>>> Simulation #{}/{} <<<<<<\n>>>>>>".format(i+1, last))
+        game = Game(headless=not print_games, roll_source=master_source.spawn(i))
+        for player in players:
+            name = player.__name__
+            game.add_player(player(name))
+
+        result = game.run()
+        if print_games:
+            print("Winner is {}".format(result.winner))
+        elif show_progress and i % progress_step == 0:
+            print("Simulation #{}/{}".format(i+1, last))
+        results.append(result)
+
+    return results
+
+
+def play_batch(players, seed, first, last):
+    """
+    Play the games in lockstep with BatchGame.  This needs numpy.
+
+    :return: list of GameResult
+    """
+    from cantstop.lib.batch import BatchGame
+
+    batch = BatchGame(last - first, derive_seed(seed, first))
+    for player in players:
+        batch.add_player(player(player.__name__))
+
+    return batch.run()
+
+
+def play_parallel(args, players, seed):
+    """
+    Shard the games across a process pool.  Each job is a chunk of games and
+    comes back as one list of GameResult.
+
+    :return: defaultdict of winner name -> wins
+    """
+    if args.batch:
+        # The batch engine wants big chunks.
+        chunk_size = -(-args.iteration // args.workers)
+    else:
+        chunk_size = args.chunk_size
+
+    chicken_dinner = defaultdict(int)
+    done = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for first in range(0, args.iteration, chunk_size):
+            last = min(first + chunk_size, args.iteration)
+            if args.batch:
+                futures.append(pool.submit(play_batch, players, seed, first, last))
+            else:
+                futures.append(pool.submit(play_games, players, seed, args.bulk, first, last))
+
+        for future in as_completed(futures):
+            results = future.result()
+            for result in results:
+                chicken_dinner[result.winner] += 1
+            done += len(results)
+            logging.info("{}/{} games are done.".format(done, args.iteration))
+
+    return chicken_dinner
+
+
 def main():
     description = '''
 Run different bots many times to see who is best.
@@ -38,30 +128,50 @@ Run different bots many times to see who is best.
 Examples:
 ./multi_sim.py
 ./multi_sim.py -i 10
-./multi_sim.py -i 5 -vv
+./multi_sim.py -i 5 -vv --print-games
+./multi_sim.py -i 100000 --seed 42 --bulk
+./multi_sim.py -i 1000000 --batch
+./multi_sim.py -i 100000 --seed 42 --workers 32
 '''
     parser = argparse.ArgumentParser(description=description,
                                      epilog=epilog)
     parser.add_argument("-i", "--iteration", help="How many times to run?", default=1000, type=int)
     parser.add_argument("-v", "--verbose", help="Print info/debug", action="count", default=1)
+    parser.add_argument("--print-games", help="Print every round and turn of every game",
+                        action="store_true")
+    parser.add_argument("--seed", help="Seed to make the whole run reproducible", type=int)
+    parser.add_argument("--bulk", help="Draw the dice in blocks with numpy", action="store_true")
+    parser.add_argument("--batch", help="Play all the games in lockstep with numpy",
+                        action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of processes to play the games on",
+                        default=1, type=int)
+    parser.add_argument("--chunk-size", help="Games per job sent to a worker",
+                        default=500, type=int)
     args = parser.parse_args()
+    if args.print_games and args.workers > 1:
+        parser.error("--print-games only works with one worker")
     set_logger(args.verbose)
 
     logging.debug("Starting up....")
 
-    chicken_dinner = defaultdict(int)
-    for i in range(0, args.iteration):
-        print("\n>>>>>>\n>>>>>> Simulation #{}/{} <<<<<<\n>>>>>>".format(i+1, args.iteration))
-        game = Game()
-        players = [ChoosingScoringBot, ScoringBot, RunningScoringBot]
-        # players = [ChoosingScoringBot, ScoringBot]
-        for player in players:
-            name = player.__name__
-            game.add_player(player(name))
+    # Every game gets its own substream of this seed.
+    seed = args.seed
+    if seed is None:
+        seed = RollSource().seed
+    print("Using seed {}".format(seed))
 
-        game.run()
-        print("Winner is {}".format(game.winner))
-        chicken_dinner[game.winner] += 1
+    players = [ChoosingScoringBot, ScoringBot, RunningScoringBot]
+    # players = [ChoosingScoringBot, ScoringBot]
+    if args.workers > 1:
+        chicken_dinner = play_parallel(args, players, seed)
+    else:
+        if args.batch:
+            results = play_batch(players, seed, 0, args.iteration)
+        else:
+            results = play_games(players, seed, args.bulk, 0, args.iteration, args.print_games, True)
+        chicken_dinner = defaultdict(int)
+        for result in results:
+            chicken_dinner[result.winner] += 1
 
     print("\n\n-----:::::===== Final Score =====:::::-----")
     print("After {} iterations, here are the winners:".format(args.iteration))
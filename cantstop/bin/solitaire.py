@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""
+Q: Playing alone and as well as possible, how many turns does it take to win?
+A: Solve every board, see solitaire.py.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from cantstop.lib.settings import Settings
+from cantstop.lib.solitaire import SolitaireTable, get_table_path, solve_table
+
+
+def set_logger(verbose_level):
+    if verbose_level >= 2:
+        logging_level = logging.DEBUG
+    elif verbose_level == 1:
+        logging_level = logging.INFO
+    else:
+        logging_level = logging.ERROR
+
+    logging.basicConfig(level=logging_level,
+                        stream=sys.stdout,
+                        format='%(levelname)s - %(message)s')
+
+
+def parse_ranks(text):
+    return tuple(int(rank) for rank in text.split(","))
+
+
+def main():
+    description = '''
+Solve solitaire Can't Stop for the fewest expected turns to win.  The table is kept
+in the table cache and a stopped solve picks up where it left off.  The full board
+can't be solved, see solitaire.py in /lib, so use --lengths to solve a smaller one.
+'''
+    epilog = '''
+Examples:
+./solitaire.py --lengths 1,1,1,1,1,1,1,1,1,1,1
+./solitaire.py --lengths 1,1,2,2,2,3,2,2,2,1,1 --workers 8
+./solitaire.py --lengths 1,1,1,1,1,1,1,1,1,1,1 --query 0,0,0,0,1,1,0,0,0,0,0
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilog)
+    parser.add_argument("-v", "--verbose", help="Print info/debug", action="count", default=1)
+    parser.add_argument("--lengths", help="Comma separated length of each column", type=parse_ranks)
+    parser.add_argument("--columns-to-win", help="How many columns win the game", type=int)
+    parser.add_argument("-w", "--workers", help="Number of processes to solve on", default=1, type=int)
+    parser.add_argument("--chunk-size", help="Boards per job sent to a worker", default=64, type=int)
+    parser.add_argument("--query", help="Comma separated committed rank of each column to look up "
+                                        "once the table is solved", type=parse_ranks)
+    args = parser.parse_args()
+    if args.lengths is not None and (len(args.lengths) != Settings.COLUMN_COUNT or min(args.lengths) < 1):
+        parser.error("--lengths needs {} lengths of at least 1".format(Settings.COLUMN_COUNT))
+    set_logger(args.verbose)
+
+    start = time.perf_counter()
+    try:
+        expected_turns = solve_table(args.workers, args.chunk_size, args.lengths, args.columns_to_win)
+    except ValueError as e:
+        parser.error(str(e))
+    print("Table: {}".format(get_table_path(args.lengths, args.columns_to_win)))
+    print("Solved in {:.1f}s".format(time.perf_counter() - start))
+    print("Expected turns to win from the start: {:.4f}".format(expected_turns))
+
+    if args.query is not None:
+        table = SolitaireTable.load(args.lengths, args.columns_to_win)
+        print("Expected turns to win from {}: {:.4f}".format(args.query, table.get_expected_turns(args.query)))
+
+
+if __name__ == "__main__":
+    main()
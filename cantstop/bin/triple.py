@@ -6,7 +6,7 @@ A: XXX
 """
 import argparse
 
-from cantstop.lib.odds import HitPredictor
+from cantstop.lib.odds import HitPredictor, get_column_triplets
 
 
 def main():
@@ -20,17 +20,13 @@ Examples:
     # This is just to generate the usage.
     argparse.ArgumentParser(description=description, epilog=epilog)
 
+    # Each of these is a lookup in the precomputed hit table.
     results = {}
     column_ctr = 0
     hp = HitPredictor()
-    for a in range(2, 11):
-        for b in range(a+1, 12):
-            for c in range(b+1, 13):
-                column_ctr += 1
-                columns_chosen = [a, b, c]
-                # results[tuple(columns_chosen)] = AttemptHitter(columns_chosen).next_attempt_odds
-                results[tuple(columns_chosen)] = \
-                    hp.compute_next_attempt_odds(columns_chosen)
+    for columns_chosen in get_column_triplets():
+        column_ctr += 1
+        results[columns_chosen] = hp.compute_next_attempt_odds(columns_chosen)
 
     print("There are {} possible column combinations.".format(column_ctr))
 
@@ -60,13 +56,9 @@ Examples:
     hp = HitPredictor()
     hp.update_columns(minus_seven)
     # hp.update_columns(minus_odd)
-    for a in range(2, 11):
-        for b in range(a+1, 12):
-            for c in range(b+1, 13):
-                column_ctr += 1
-                columns_chosen = [a, b, c]
-                results[tuple(columns_chosen)] = \
-                    hp.compute_next_attempt_odds(columns_chosen)
+    for columns_chosen in get_column_triplets():
+        column_ctr += 1
+        results[columns_chosen] = hp.compute_next_attempt_odds(columns_chosen)
 
     print("There are {} possible column combinations.".format(column_ctr))
 
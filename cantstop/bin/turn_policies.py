@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+"""
+Q: How does each bot play a single turn from the start of the game?
+A: Exactly, without simulating.  See evaluator.py.
+"""
+import argparse
+import time
+
+from cantstop.lib.bots.bots import *
+from cantstop.lib.evaluator import PolicyEvaluator
+from cantstop.lib.settings import Settings
+
+
+def main():
+    description = '''
+Compare how each bot plays a single turn from an empty board: the odds of busting,
+the expected number of attempts and the expected ranks committed.
+'''
+    epilog = '''
+Examples:
+./turn_policies.py
+'''
+    # This is just to generate the usage.
+    argparse.ArgumentParser(description=description, epilog=epilog).parse_args()
+
+    bots = [CowardBot, SmartCowardBot, ConservativeBot, ScoringBot, ChoosingScoringBot,
+            RunningScoringBot, QuadRollerBot, HexRollerBot, SeptaRollerBot, OctoRollerBot,
+            DecaRollerBot]
+    player_positions = {"Player": (0,) * Settings.COLUMN_COUNT}
+    evaluator = PolicyEvaluator(player_positions, "Player")
+
+    print("{:>19}{:>8}{:>10}{:>8}{:>8}".format("Bot", "Bust", "Attempts", "Ranks", "ms"))
+    for bot_class in bots:
+        start = time.perf_counter()
+        outcome = evaluator.evaluate(bot_class("Player"))
+        elapsed = (time.perf_counter() - start) * 1000
+        print("{:>19}{:>7.1f}%{:>10.2f}{:>8.2f}{:>8.0f}".format(
+            bot_class.__name__, outcome.bust * 100, outcome.attempts, sum(outcome.ranks.values()), elapsed))
+
+
+if __name__ == "__main__":
+    main()
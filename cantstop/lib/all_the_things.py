@@ -13,22 +13,57 @@ long as that players gets dice rolls that are valid or that player decides to
 stop and make their progress permanent.
 """
 import logging
-import sys
 
-from collections import defaultdict
-from random import shuffle
+from collections import defaultdict, namedtuple
+from types import MappingProxyType
 
-from cantstop.lib.odds import Dice, perc, HitPredictor
+from cantstop.lib.engine import BoardEngine
+from cantstop.lib.odds import Dice, RollSource, perc, HitPredictor, mask_to_columns, get_pair_sums, \
+    get_weighted_multisets
 from cantstop.lib.settings import Settings
 
 
+# This is all that a headless game reports back.
+GameResult = namedtuple("GameResult", ["winner", "rounds", "attempts", "busts"])
+
+
 class Game(object):
-    def __init__(self):
-        self.board = Board()
+    def __init__(self, headless=False, observer=None, seed=None, roll_source=None,
+                 shuffle_seats=True, audit=None):
+        """
+        :param headless: If True, nothing is printed to the console.  Use this
+        for simulations where only the GameResult matters.
+        :param observer: Optional callable that is given every game event as
+        observer(event, name, detail).  The events are:
+            "round"  - a new round has begun, detail is the round number
+            "turn"   - name's turn has begun, detail is the round number
+            "bust"   - name has busted out, detail is the attempt count
+            "stop"   - name has stopped, detail is the attempt count
+            "column" - name has won a column, detail is the column number
+            "win"    - name has won the game, detail is the GameResult
+        :param seed: Seed for the dice and the seating order.  The same seed
+        and players replay the same game.
+        :param roll_source: A RollSource to use instead of one made from seed,
+        eg a BulkRollSource or a substream from RollSource.spawn().
+        :param shuffle_seats: If False, the players take their turns in the
+        order they were added.
+        :param audit: A RollAudit to check every roll of the game.  Share one
+        between games to audit a whole simulation.
+        """
+        if roll_source is None:
+            roll_source = RollSource(seed)
+        self.roll_source = roll_source
+        self.seed = roll_source.seed
+        self.shuffle_seats = shuffle_seats
+        self.headless = headless
+        self.observer = observer
+        self.board = Board(verbose=not headless)
         self.players = []
         self.round_ctr = 0
+        self.attempt_ctr = 0
+        self.bust_ctr = 0
         self.game_won = False
-        self.dice = Dice()
+        self.dice = Dice(roll_source, audit)
         self.winner = None
 
     def get_roll_choices(self, player):
@@ -36,50 +71,14 @@ class Game(object):
         Check the board to see which of the rolls are possible choices.  It is
         possible that there are no choices.
 
-        :return:
+        :return: tuple of choice tuples
         """
-        free_columns = self.board.get_incomplete_columns()
-        not_free_columns = self.board.get_complete_columns()
-        roll_values = self.dice.get_sums()
-        temp_columns = self.board.temporary_progress.keys()
-
-        # Check that the progress in the temp_columns don't exceed the
-        # available space in the free columns.
-        for col in temp_columns:
-            locked_position = self.board.columns[col].get_position(player.name)
-            temp_position = self.board.temporary_progress[col]
-            if locked_position + temp_position >= self.board.columns[col].ranks:
-                free_columns.remove(col)
-
-        logging.debug("Available: {}".format(free_columns))
-        logging.debug("Not available: {}".format(not_free_columns))
-        logging.debug("Rolls:     {}".format(roll_values))
-
-        # If there are free markers, then the player can still choose
-        # a new column or two new columns.  Otherwise, their rolls
-        # have to overlap the columns they have already chosen on this
-        # turn.  Or they bust out.
-        choices = []
-        if self.board.free_markers >= 2:
-            for input_tuple in roll_values:
-                output_list = []
-                for element in input_tuple:
-                    if element in free_columns:
-                        output_list.append(element)
-                if output_list:
-                    choices.append(tuple(output_list))
-        else:
-            flattened_choices = [item for rv in roll_values for item in rv]
-            if self.board.free_markers == 1:
-                for element in flattened_choices:
-                    if element in free_columns:
-                        choices.append((element,))
-            else:
-                for element in flattened_choices:
-                    if element in free_columns:
-                        if element in temp_columns:
-                            choices.append((element,))
+        choices = self.board.engine.get_roll_choices(player.name, self.dice.roll_index)
 
+        if logging.root.level <= logging.DEBUG:
+            temp_mask, blocked_mask = self.board.engine.get_choice_masks(player.name)
+            logging.debug("Not available: {}".format(mask_to_columns(blocked_mask)))
+            logging.debug("Rolls:     {}".format(self.dice.get_sums()))
         logging.debug("Choices:   {}".format(choices))
         return choices
 
@@ -91,21 +90,39 @@ class Game(object):
         self.board.print_status()
         print("The game is on turn {}.".format(self.round_ctr))
 
+    def get_result(self):
+        return GameResult(self.winner, self.round_ctr, self.attempt_ctr, self.bust_ctr)
+
     def run(self):
-        shuffle(self.players)
+        """
+        Play until someone wins three columns.
+
+        :return: GameResult
+        """
+        if self.shuffle_seats:
+            self.roll_source.shuffle(self.players)
+        observer = self.observer
+        turn_order = tuple(p.name for p in self.players)
 
         while not self.game_won:
             self.round_ctr += 1
-            print("\n===== We have begun round #{} =====".format(self.round_ctr))
+            if not self.headless:
+                print("\n===== We have begun round #{} =====".format(self.round_ctr))
+            if observer:
+                observer("round", None, self.round_ctr)
 
             for p in self.players:
-                print("{}'s turn:".format(p.name))
+                if not self.headless:
+                    print("{}'s turn:".format(p.name))
+                if observer:
+                    observer("turn", p.name, self.round_ctr)
                 attempt_counter = 0
 
                 is_busted = False
                 do_play = True
                 while not is_busted and do_play:
                     attempt_counter += 1
+                    self.attempt_ctr += 1
                     self.dice.roll()
                     roll_choices = self.get_roll_choices(p)
 
@@ -114,29 +131,42 @@ class Game(object):
                         The player rolled once to many times.
                         """
                         self.board.reset_progress()
-                        logging.debug("Dice roll: {}".format(self.dice.values))
-                        logging.debug("Roll values: {}".format(self.dice.get_sums()))
+                        if logging.root.level <= logging.DEBUG:
+                            logging.debug("Dice roll: {}".format(self.dice.values))
+                            logging.debug("Roll values: {}".format(self.dice.get_sums()))
+                        self.bust_ctr += 1
+                        if not self.headless:
+                            print("Player {} has busted out.".format(p.name))
+                        if observer:
+                            observer("bust", p.name, attempt_counter)
                         p.bust_out()
                         is_busted = True
                         continue
 
-                    state = State(roll_choices, self.board.get_status(), self.round_ctr)
+                    state = State.from_board(roll_choices, self.board, self.round_ctr, turn_order)
                     choice = p.choose_columns(state)
                     self.board.register_roll_choice(choice, p.name)
 
-                    state = State(roll_choices, self.board.get_status(), self.round_ctr)
+                    state = State.from_board(roll_choices, self.board, self.round_ctr, turn_order)
                     choice = p.stop_or_continue(state)
                     if choice == 1:
                         do_play = False
-                        self.board.register_stop_choice(p)
+                        won_columns = self.board.register_stop_choice(p)
+                        if observer:
+                            observer("stop", p.name, attempt_counter)
+                            for column in won_columns:
+                                observer("column", p.name, column)
 
                         winner = self.board.check_for_winner()
                         if winner:
                             self.game_won = True
                             self.winner = winner
+                            result = self.get_result()
+                            if observer:
+                                observer("win", winner, result)
 
                             # Once there is a winner, return to main.
-                            return
+                            return result
 
     def print_conclusion(self):
         """
@@ -165,127 +195,144 @@ class Column(object):
     rolls 2 or 12 are shorter because it's less likely you can climb one rank of
     this column when compared to the column for dice rolls 6, 7, or 8.
 
-    At each rank, there is a list of players at that rank.  All players start at
-    the zeroth rank of each column.
+    All players start at the zeroth rank of each column.  The ranks themselves
+    are kept in a BoardEngine which is shared by all the columns of a Board.
     """
 
-    def __init__(self, column_number):
+    def __init__(self, column_number, engine=None, verbose=True):
         """
         :param column_number: The die roll that corresponds to this column, eg
         7 or 12.
+        :param engine: The BoardEngine holding the ranks.  A standalone column
+        gets its own.
+        :param verbose: If False, never print when the column is won.
         """
         self.column_number = column_number
+        self.verbose = verbose
         self.ranks = Column.get_ranks_by_column(self.column_number)
-        self.positions = []  # This will be a list of list of players at each position.
-        self.winner = None
-        self.initialize_positions()
+        if engine is None:
+            engine = BoardEngine()
+        self.engine = engine
 
     def __repr__(self):
-        return self.positions
+        return str(self.positions)
+
+    @property
+    def positions(self):
+        """
+        A list of list of players at each rank.  This is built on demand so
+        only use it for display.
+
+        :return:
+        """
+        positions = []
+        for rank in range(0, self.ranks + 1):
+            positions.append([])
+        for name in self.engine.names:
+            if self.engine.get_owner(self.column_number) not in (None, name):
+                continue
+            positions[self.engine.get_rank(name, self.column_number)].append(name)
+        return positions
+
+    @property
+    def winner(self):
+        return self.engine.get_owner(self.column_number)
 
     @staticmethod
     def get_ranks_by_column(column):
         # The columns on the extreme right and left has 3
         # positions.  The next column in, has 5 positions.  This
         # continues until the middle column has 13 positions.
-        if column <= 7:
-            num_positions = column * 2 - 1
-        else:
-            num_positions = 27 - (column * 2)
-        return num_positions
+        return Settings.COLUMN_LENGTHS[column - Settings.MIN_COLUMN]
 
     def _declare_winner(self, name):
         # If this column is completed by a player, then that player
         # is marked the owner.  All other players are removed.
-        self.winner = name
-        if logging.root.level <= logging.INFO:
+        self.engine.claim_column(self.column_number, name)
+        if self.verbose and logging.root.level <= logging.INFO:
             print("------- {} has won column {} -------".format(name, self.column_number))
 
-        # Remove other players
-        self.initialize_positions()
-        self.positions[-1] = [self.winner]
-
     def initialize_positions(self):
-        self.positions = []
-        for rank in range(0, self.ranks + 1):
-            self.positions.append([])
+        self.engine.clear_column(self.column_number)
 
     def add_player(self, name):
         """
         Since players start at the bottom of the column, that's where
-        we'll put them.st
+        we'll put them.
         :return:
         """
-        self.positions[0].append(name)
+        self.engine.add_player(name)
 
     def is_complete(self):
-        if self.positions[-1]:
-            return True
-        return False
+        return self.engine.get_owner(self.column_number) is not None
 
     def is_incomplete(self):
-        return not self.is_complete()
+        return self.engine.get_owner(self.column_number) is None
 
     def get_position(self, name):
-        position = 0
-        for players_at_this_rank in self.positions:
-            if name in players_at_this_rank:
-                return position
-            position += 1
-
-        logging.fatal("Unreachable code.")
-        sys.exit(2)
+        return self.engine.get_rank(name, self.column_number)
 
     def advance(self, name, ranks):
+        """
+        :return: True if this advance won the column
+        """
         logging.debug("Advancing {} {} positions".format(name, ranks))
 
-        current_position = self.get_position(name)
+        current_position = self.engine.get_rank(name, self.column_number)
         future_position = current_position + ranks
-        if future_position > self.ranks:
-            future_position = self.ranks
+        if future_position >= self.ranks:
+            self._declare_winner(name)
+            return True
 
         logging.debug("Was {}, now {}".format(current_position, future_position))
-        logging.debug(self.__repr__())
-        self.positions[current_position].remove(name)
-        self.positions[future_position].append(name)
-        logging.debug(self.__repr__())
-
-        if self.is_complete():
-            self._declare_winner(name)
+        self.engine.set_rank(name, self.column_number, future_position)
+        return False
 
 
 class Board(object):
-    def __init__(self):
+    def __init__(self, verbose=True):
         self.players = []
+        self.engine = BoardEngine()
         self.columns = {}
-        self.temporary_progress = {}
-        self.free_markers = 3
+        self.verbose = verbose
         self.initialize()
 
     def initialize(self):
         for column in Settings.COLUMN_RANGE:
-            self.columns[column] = Column(column)
+            self.columns[column] = Column(column, self.engine, self.verbose)
+
+    @property
+    def temporary_progress(self):
+        return self.engine.temp_progress
+
+    @temporary_progress.setter
+    def temporary_progress(self, value):
+        self.engine.temp_progress = value
+
+    @property
+    def free_markers(self):
+        return self.engine.free_markers
+
+    @free_markers.setter
+    def free_markers(self, value):
+        self.engine.free_markers = value
 
     def reset_progress(self):
-        self.temporary_progress = {}
-        self.free_markers = 3
+        self.engine.reset_progress()
 
     def add_player(self, p):
         self.players.append(p)
 
         # Begin everyone at zero on each column.
-        for position in Settings.COLUMN_RANGE:
-            self.columns[position].add_player(p.name)
+        self.engine.add_player(p.name)
+
+    def get_position(self, name, column):
+        return self.engine.get_rank(name, column)
 
     def get_player_positions(self):
         player_positions = {}
         for p in self.players:
-            player_positions[p.name] = [0] * (Settings.MAX_COLUMN - Settings.MIN_COLUMN + 1)
-
-        for c in self.columns:
-            for rank, players_at_this_rank in enumerate(self.columns[c].positions):
-                for p in players_at_this_rank:
-                    player_positions[p][c - 2] = rank
+            player_positions[p.name] = list(self.engine.ranks[p.name])
 
         return player_positions
 
@@ -293,16 +340,13 @@ class Board(object):
         return self.get_player_positions(), self.temporary_progress
 
     def get_incomplete_columns(self):
-        incomplete_columns = []
-        for column in self.columns:
-            if self.columns[column].is_incomplete():
-                incomplete_columns.append(column)
-
-        return incomplete_columns
+        return mask_to_columns(self.engine.open_mask)
 
     def get_complete_columns(self):
-        ic = self.get_incomplete_columns()
-        return list(set(Settings.COLUMN_RANGE).difference(set(ic)))
+        return mask_to_columns(self.engine.get_complete_mask())
+
+    def is_column_open(self, column):
+        return self.engine.is_open(column)
 
     @staticmethod
     def get_columns_won_by_player(positions, name):
@@ -398,51 +442,67 @@ class Board(object):
         if not name:
             name = "Player"
         logging.debug("{} chose: {}".format(name, choice))
-        for column in choice:
-            if column in self.temporary_progress:
-                # We can assume that if a column is temporarily maxed,
-                # then the player would not have had a chance to choose
-                # it so no need to check for maxed out state here.
-                self.temporary_progress[column] += 1
-            else:
-                self.free_markers -= 1
-                self.temporary_progress[column] = 1
+
+        # We can assume that if a column is temporarily maxed, then the
+        # player would not have had a chance to choose it so no need to
+        # check for maxed out state here.
+        self.engine.register_roll_choice(choice)
 
     def register_stop_choice(self, player):
-        # Commit the temporary progress.
+        """
+        Commit the temporary progress.
+
+        :param player:
+        :return: list of the columns this won
+        """
         logging.debug("Player chose to stop")
+        won_columns = []
         for pos in self.temporary_progress:
-            self.columns[pos].advance(player.name, self.temporary_progress[pos])
+            if self.columns[pos].advance(player.name, self.temporary_progress[pos]):
+                won_columns.append(pos)
 
         self.reset_progress()
+        return won_columns
 
-    def get_won_columns(self):
-        won = []
-        for col in self.columns:
-            if self.columns[col].winner:
-                won.append(col)
+    def make_choice(self, choice):
+        """
+        Like register_roll_choice() but it can be taken back with unmake().
+        Search code should use these instead of copying the Board.
+        """
+        self.engine.make_choice(choice)
 
-        return won
+    def make_stop(self, name):
+        """
+        Like register_stop_choice() but quiet and it can be taken back with
+        unmake().
+
+        :return: list of the columns this won
+        """
+        return self.engine.make_stop(name)
+
+    def make_bust(self):
+        """
+        Like bust_player() but it can be taken back with unmake().
+        """
+        self.engine.make_bust()
+
+    def unmake(self):
+        """
+        Take back the last make_choice(), make_stop() or make_bust().
+        """
+        self.engine.unmake()
+
+    def get_won_columns(self):
+        return mask_to_columns(self.engine.get_complete_mask())
 
     def get_won_columns_by_player(self, name):
-        # This may be unusable.
-        won = []
-        for col in self.columns:
-            if self.columns[col].winner and name == self.columns[col].winner:
-                won.append(col)
+        return mask_to_columns(self.engine.won_masks.get(name, 0))
 
-        return won
+    def get_won_column_count(self, name):
+        return self.engine.won_counts.get(name, 0)
 
     def check_for_winner(self):
-        col_winners = defaultdict(int)
-        for col in self.columns:
-            possible_winner = self.columns[col].winner
-            if possible_winner:
-                col_winners[possible_winner] += 1
-                if col_winners[possible_winner] >= 3:
-                    return possible_winner
-
-        return None
+        return self.engine.winner
 
 
 class State(object):
@@ -450,13 +510,56 @@ class State(object):
     The players are presented with the game state when the player has a chance
     to act.  The state is composed of the game board and the available column
     choices.
+
+    When the State is built on a BoardEngine, it shares the engine's
+    snapshot of the positions, which is only rebuilt when a turn ends, and
+    copies the few columns of temp progress.  So a State that a bot keeps
+    still shows the decision it was made for.  The scores are computed on
+    first use.  Treat everything here as read-only.
     """
+    __slots__ = ("choices", "turn", "turn_order", "_player_positions", "_temp_progress",
+                 "_current_columns", "_p2_scores", "_r28_scores")
 
-    def __init__(self, choices, board_status, turn):
+    def __init__(self, choices, board_status, turn, engine=None, turn_order=None):
+        """
+        :param choices: the available column choices
+        :param board_status: (player_positions, temp_progress) as returned by
+        Board.get_status().  This can be None if engine is given.
+        :param turn:
+        :param engine: the BoardEngine to take the positions from
+        :param turn_order: tuple of the names in the order they take their
+        turns.  By default, the order of player_positions.
+        """
         self.choices = choices
-        self.player_positions = board_status[0]  # dict: name->list of current_rank_by_column
-        self.temp_progress = board_status[1]  # dict: column_num->temp_rank_by_that_column
         self.turn = turn
+        if board_status is None:
+            board_status = (engine.get_player_positions(), MappingProxyType(dict(engine.temp_progress)))
+        self._player_positions = board_status[0]
+        self._temp_progress = board_status[1]
+        if turn_order is None and self._player_positions is not None:
+            turn_order = tuple(self._player_positions)
+        self.turn_order = turn_order
+        self._current_columns = {}
+        self._p2_scores = None
+        self._r28_scores = None
+
+    @classmethod
+    def from_board(cls, choices, board, turn, turn_order=None):
+        return cls(choices, None, turn, board.engine, turn_order)
+
+    @property
+    def player_positions(self):
+        """
+        :return: dict: name->tuple of current_rank_by_column
+        """
+        return self._player_positions
+
+    @property
+    def temp_progress(self):
+        """
+        :return: dict: column_num->temp_rank_by_that_column
+        """
+        return self._temp_progress
 
     def display(self, percentage=False):
         print(Board.get_status_string(self.player_positions, percentage=percentage))
@@ -467,6 +570,12 @@ class State(object):
             print("{}: {}".format(ctr, choice))
 
     def get_current_columns(self, name):
+        """
+        :return: tuple of the columns that name has committed progress in
+        """
+        if name in self._current_columns:
+            return self._current_columns[name]
+
         my_position = self.player_positions[name]
         logging.debug("Position = {}".format(my_position))
         chosen_cols = []
@@ -475,10 +584,12 @@ class State(object):
                 chosen_cols.append(col_num)
         logging.debug("Chosen_cols = {}".format(chosen_cols))
 
+        chosen_cols = tuple(chosen_cols)
+        self._current_columns[name] = chosen_cols
         return chosen_cols
 
     def get_free_marker_count(self):
-        return 3 - len(self.temp_progress)
+        return Settings.MARKER_COUNT - len(self.temp_progress)
 
     @staticmethod
     def weight_column(col):
@@ -527,14 +638,9 @@ class State(object):
 
         :return: defaultdict name -> int
         """
-        scores = defaultdict(int)
-        for name in self.player_positions:
-            for i, rank_count in enumerate(self.player_positions[name]):
-                col = i + 2
-
-                # This might exist elsewhere.
-                scores[name] += (rank_count / Column.get_ranks_by_column(col)) ** 2 * 100
-        return scores
+        if self._p2_scores is None:
+            self._p2_scores = State.get_p2_scores(self.player_positions)
+        return self._p2_scores
 
     def get_players_rule28_score(self):
         """
@@ -543,31 +649,27 @@ class State(object):
 
         :return: defaultdict name -> int
         """
-        scores = defaultdict(int)
-        for name in self.player_positions:
-            for i, rank_count in enumerate(self.player_positions[name]):
-                col = i + 2
-                # print("{} has {} ranks of col {} = {}"
-                #       .format(name, rank_count, col, rank_count * self.weight_column(col)))
-                scores[name] += rank_count * self.weight_column(col)
-        return scores
+        if self._r28_scores is None:
+            self._r28_scores = State.get_r28_scores(self.player_positions)
+        return self._r28_scores
 
-    def rule28(self):
+    @staticmethod
+    def score_rule28(temp_progress):
         """
         From https://www.aaai.org/ocs/index.php/FLAIRS/2009/paper/download/123/338
 
         This method will naively weigh all ranks equally, whether it is the first
-        or last.  Also disregard the number of free markers.
-        :return:
-        """
-        score_by_col = {}
-        for col in Settings.COLUMN_RANGE:
-            score_by_col[col] = State.weight_column(col)
+        or last.  Also disregard the number of free markers.  The searches
+        call this on their own temp progress so that they don't have to
+        build a State.
 
+        :param temp_progress: dict: column_num->temp_rank_by_that_column
+        :return: int
+        """
         score28 = 0
         product = 1
-        for col in self.temp_progress:
-            score28 += score_by_col[col] * (self.temp_progress[col] + 1)
+        for col, temp_rank in temp_progress.items():
+            score28 += State.weight_column(col) * (temp_rank + 1)
             product *= col
 
         # Check for oddness.
@@ -580,6 +682,12 @@ class State(object):
 
         return score28
 
+    def rule28(self):
+        """
+        :return: score_rule28() of the temp progress
+        """
+        return State.score_rule28(self.temp_progress)
+
     def p2(self, name):
         """
         This is a naive way to score the existing progress.  "p2" is percentage squared.
@@ -663,7 +771,13 @@ class Player(object):
         return 1
 
     def bust_out(self):
-        print("Player {} has busted out.".format(self.name))
+        """
+        The Game announces the bust.  Override this to clean up after a
+        busted turn.
+
+        :return:
+        """
+        pass
 
 
 class HumanPlayer(Player):
@@ -775,12 +889,36 @@ class HumanPlayer(Player):
 
     def print_info_block(self):
         self.print_marker_count()
-        print("TempProgress: {}".format(self.state.temp_progress))
+        print("TempProgress: {}".format(dict(self.state.temp_progress)))
         print("Current Rule28 score: {}".format(self.state.rule28()))
         print("{:3.1f}: Initial P2 score".format(self.state.p2(self.name)))
         print("{:3.1f}: TempProgress P2 score".format(self.state.p2_temp_progress(self.name)))
         print("{:3.1f}: Combined P2 score".format(self.state.p2_combined(self.name)))
 
+    def print_endgame_hint(self, choosing):
+        """
+        In a two player endgame, show what perfect play would do.  The
+        tablebase is only loaded when a human plays.
+
+        :param choosing: True when picking a choice, False when deciding to stop
+        """
+        from cantstop.lib.endgame import get_tablebase
+
+        solver = get_tablebase().get_solver(self.state, self.name)
+        if solver is None:
+            return
+
+        temp = solver.get_temp(self.state.temp_progress)
+        if choosing:
+            win_odds = [solver.get_value(solver.apply_choice(temp, choice)) for choice in self.state.choices]
+            best = max(range(0, len(win_odds)), key=win_odds.__getitem__)
+            print("Endgame: choice {} is best with {:3.1f}% to win the game."
+                  .format(best + 1, win_odds[best] * 100))
+        else:
+            turn_value = solver.evaluate(self.state.temp_progress)
+            print("Endgame: stopping wins {:3.1f}% of the time and continuing wins {:3.1f}%."
+                  .format(turn_value.stop * 100, turn_value.go * 100))
+
     def compute_inc_rule28_score(self, choice_tuple):
         # TODO incremental Rule28
         return 11
@@ -892,6 +1030,7 @@ class HumanPlayer(Player):
         self.print_competition()
         self.print_info_block()
         self.print_choices()
+        self.print_endgame_hint(True)
 
         user_input = None
         while True:
@@ -913,6 +1052,7 @@ class HumanPlayer(Player):
         self.state = state
         self.print_temp_progress_table()
         self.print_info_block()
+        self.print_endgame_hint(False)
 
         print("1: Stop\n2: Continue")
         user_input = None
@@ -972,20 +1112,22 @@ class SingleValueOdds(object):
             """
             This results in the same odds as a pair of dice x 4 since four dice
             creates four sets of pairs.
+
+            Each sorted roll stands in for all the rolls that sort to it.  A
+            given pair of positions, eg d1 + d2, sees each of a roll's six
+            pair-sums equally often across those rolls, so four positional
+            pairs count 4/6 of the roll's pair-sums.
             :return:
             """
             ctr = 0
-            for d1 in range(1, 7):
-                for d2 in range(1, 7):
-                    for d3 in range(1, 7):
-                        for d4 in range(1, 7):
-                            ctr += 1
-                            self.sum_count[d1 + d2] += 1
-                            self.sum_count[d1 + d3] += 1
-                            self.sum_count[d1 + d4] += 1
-                            self.sum_count[d2 + d4] += 1
-
-            for roll in self.sum_count:
+            pair_count = defaultdict(int)
+            for values, weight in get_weighted_multisets():
+                ctr += weight
+                for pair_sum in get_pair_sums(values):
+                    pair_count[pair_sum] += weight
+
+            for roll in sorted(pair_count):
+                self.sum_count[roll] = pair_count[roll] * 4 // 6
                 self.odds[roll] = self.sum_count[roll] / ctr
 
     instance = None
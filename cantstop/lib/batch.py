@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+Play many independent games at once.
+
+Game.run() plays one game at a time with Python objects.  BatchGame plays N
+games in lockstep: every step, each unfinished game makes one attempt for
+whoever's turn it is.  The positions, temp progress, markers and column
+owners of all the games are NumPy arrays, so a step is a few dozen array
+operations no matter how many games there are.
+
+Only bots whose decisions can be written as array operations can play here.
+See BatchPolicy.from_bot() for the list.
+
+This needs numpy.
+"""
+
+import numpy
+
+from cantstop.lib.all_the_things import GameResult, State
+from cantstop.lib.bots.bots import Bot, ChoosingScoringBot, ConservativeBot, RollerBot, \
+    RunningScoringBot, ScoringBot, SmartCowardBot
+from cantstop.lib.odds import ROLL_COUNT, ROLL_SUMS, RollSource, derive_seed, mask_to_columns
+from cantstop.lib.settings import Settings
+
+# Column indices run from 0 to COLUMN_COUNT - 1.  One more index is used to
+# pad the choice tables.  That column is always blocked.
+DUMMY = Settings.COLUMN_COUNT
+WIDTH = Settings.COLUMN_COUNT + 1
+
+LENGTHS = numpy.array(Settings.COLUMN_LENGTHS + (0,), dtype=numpy.int16)
+WEIGHTS = numpy.array([State.weight_column(column) for column in Settings.COLUMN_RANGE] + [0],
+                      dtype=numpy.int16)
+BITS = numpy.array([1 << index for index in range(0, Settings.COLUMN_COUNT)] + [0], dtype=numpy.intp)
+
+# State.score_rule28() of one rank in each column of the mask.  Every rank
+# past the first adds the column's weight, see rule28().
+RULE28_BASES = numpy.array([State.score_rule28(dict.fromkeys(mask_to_columns(mask), 0))
+                            for mask in range(0, 1 << Settings.COLUMN_COUNT)], dtype=numpy.int16)
+
+# Losing this much would make any real choice better than a padded one.
+INVALID_SCORE = -10000
+
+
+def _build_choice_tables():
+    """
+    For each roll, lay out the candidate choices in the same order that
+    engine.get_roll_choices() would list them.  With two or more free markers,
+    there is one candidate per pair of sums.  Otherwise, there is one per sum.
+
+    :return: (first column of each pair, second column of each pair, each
+    sum on its own), each an array of shape (ROLL_COUNT, 6)
+    """
+    pair_first = numpy.full((ROLL_COUNT, 6), DUMMY, dtype=numpy.intp)
+    pair_second = numpy.full((ROLL_COUNT, 6), DUMMY, dtype=numpy.intp)
+    flat = numpy.full((ROLL_COUNT, 6), DUMMY, dtype=numpy.intp)
+    for roll_index, roll_values in enumerate(ROLL_SUMS):
+        for i, (a, b) in enumerate(roll_values):
+            pair_first[roll_index, i] = a - Settings.MIN_COLUMN
+            pair_second[roll_index, i] = b - Settings.MIN_COLUMN
+            flat[roll_index, 2 * i] = a - Settings.MIN_COLUMN
+            flat[roll_index, 2 * i + 1] = b - Settings.MIN_COLUMN
+
+    return pair_first, pair_second, flat
+
+
+PAIR_FIRST, PAIR_SECOND, FLAT = _build_choice_tables()
+
+
+class BatchPolicy(object):
+    """
+    A bot's choose_columns() and stop_or_continue() described as codes the
+    batch engine understands.
+    """
+    CHOOSE_FIRST = 0     # state.choices[0]
+    CHOOSE_OVERLAP = 1   # Bot.choose_already_selected_columns()
+    CHOOSE_WEIGHTED = 2  # ChoosingScoringBot
+    CHOOSE_RUNNING = 3   # RunningScoringBot
+
+    STOP_ALWAYS = 0      # stop after every attempt
+    STOP_BUDGET = 1      # RollerBot
+    STOP_RULE28 = 2      # ScoringBot
+    STOP_NO_MARKERS = 3  # ConservativeBot
+
+    def __init__(self, name, choose, stop, budget=0):
+        self.name = name
+        self.choose = choose
+        self.stop = stop
+        self.budget = budget
+
+    def __repr__(self):
+        return "BatchPolicy({}, choose={}, stop={}, budget={})".format(
+            self.name, self.choose, self.stop, self.budget)
+
+    @staticmethod
+    def from_bot(bot):
+        """
+        Look at which choose_columns() and stop_or_continue() the bot really
+        uses, so subclasses that only rename a bot still work.
+
+        :param bot: a Bot instance
+        :return: BatchPolicy
+        """
+        bot_class = type(bot)
+        choose_method = bot_class.choose_columns
+        stop_method = bot_class.stop_or_continue
+
+        if choose_method is Bot.choose_columns:
+            choose = BatchPolicy.CHOOSE_FIRST
+        elif choose_method in (SmartCowardBot.choose_columns, ConservativeBot.choose_columns,
+                               ScoringBot.choose_columns, RollerBot.choose_columns):
+            choose = BatchPolicy.CHOOSE_OVERLAP
+        elif choose_method is ChoosingScoringBot.choose_columns:
+            choose = BatchPolicy.CHOOSE_WEIGHTED
+        elif choose_method is RunningScoringBot.choose_columns:
+            choose = BatchPolicy.CHOOSE_RUNNING
+        else:
+            raise ValueError("{} chooses columns in a way the batch engine can't.".format(bot.name))
+
+        budget = 0
+        if stop_method is Bot.stop_or_continue:
+            stop = BatchPolicy.STOP_ALWAYS
+        elif stop_method is RollerBot.stop_or_continue:
+            stop = BatchPolicy.STOP_BUDGET
+            budget = bot.fixed_budget
+        elif stop_method is ScoringBot.stop_or_continue:
+            stop = BatchPolicy.STOP_RULE28
+        elif stop_method is ConservativeBot.stop_or_continue:
+            stop = BatchPolicy.STOP_NO_MARKERS
+        else:
+            raise ValueError("{} decides to stop in a way the batch engine can't.".format(bot.name))
+
+        return BatchPolicy(bot.name, choose, stop, budget)
+
+
+def rule28(temp):
+    """
+    State.rule28() for many games at once.
+
+    :param temp: array of shape (games, WIDTH) of temp progress
+    :return: array of shape (games,)
+    """
+    masks = ((temp > 0) * BITS).sum(axis=1)
+    return RULE28_BASES[masks] + (WEIGHTS * temp.astype(numpy.int16)).sum(axis=1)
+
+
+class BatchGame(object):
+    """
+    Play count games between the same players.  The seats are shuffled in
+    every game like Game.run() does.
+    """
+
+    def __init__(self, count, seed=None):
+        if seed is None:
+            seed = RollSource().seed
+        self.count = count
+        self.seed = seed
+        self.generator = numpy.random.default_rng(derive_seed(seed, "batch"))
+        self.policies = []
+
+    def add_player(self, bot):
+        self.policies.append(BatchPolicy.from_bot(bot))
+
+    def run(self):
+        """
+        :return: list of GameResult, one per game
+        """
+        count = self.count
+        player_count = len(self.policies)
+        generator = self.generator
+
+        # seating[g, s] is the player in seat s of game g.
+        seating = numpy.argsort(generator.random((count, player_count)), axis=1)
+        choose = numpy.array([p.choose for p in self.policies])[seating]
+        stop = numpy.array([p.stop for p in self.policies])[seating]
+        budget = numpy.array([p.budget for p in self.policies])[seating]
+
+        positions = numpy.zeros((count, player_count, WIDTH), dtype=numpy.int16)
+        temp = numpy.zeros((count, WIDTH), dtype=numpy.int16)
+        markers = numpy.full(count, Settings.MARKER_COUNT, dtype=numpy.int16)
+        owners = numpy.full((count, WIDTH), -1, dtype=numpy.int16)
+        won_counts = numpy.zeros((count, player_count), dtype=numpy.int16)
+        seat = numpy.zeros(count, dtype=numpy.intp)
+        turn_attempts = numpy.zeros(count, dtype=numpy.int32)
+        rounds = numpy.ones(count, dtype=numpy.int32)
+        attempts = numpy.zeros(count, dtype=numpy.int32)
+        busts = numpy.zeros(count, dtype=numpy.int32)
+        winner_seat = numpy.full(count, -1, dtype=numpy.intp)
+
+        active = numpy.arange(count)
+        while active.size:
+            games = active
+            rows = numpy.arange(games.size)
+            current = seat[games]
+            attempts[games] += 1
+            rolls = generator.integers(0, ROLL_COUNT, size=games.size)
+
+            my_positions = positions[games, current]
+            my_temp = temp[games]
+            my_markers = markers[games]
+
+            # Lay out the candidates.  A candidate is one or two columns.
+            blocked = (owners[games] >= 0) | (my_positions + my_temp >= LENGTHS)
+            two_free = (my_markers >= 2)[:, None]
+            first = numpy.where(two_free, PAIR_FIRST[rolls], FLAT[rolls])
+            second = numpy.where(two_free, PAIR_SECOND[rolls], DUMMY)
+            first_ok = ~blocked[rows[:, None], first]
+            second_ok = ~blocked[rows[:, None], second]
+            first_ok &= (my_markers > 0)[:, None] | (my_temp[rows[:, None], first] > 0)
+            valid = first_ok | second_ok
+            hit = valid.any(axis=1)
+
+            # Score the candidates for each kind of bot.
+            my_choose = choose[games, current][:, None]
+            chosen = my_positions > 0
+            first_chosen = chosen[rows[:, None], first]
+            second_chosen = chosen[rows[:, None], second]
+            overlap = (first_ok & first_chosen).astype(numpy.int16) + (second_ok & second_chosen)
+            weight_sum = first_ok * WEIGHTS[first] + second_ok * WEIGHTS[second]
+            new_columns = (first_ok & ~first_chosen).astype(numpy.int16) + (second_ok & ~second_chosen)
+            weighted = weight_sum - 6 * new_columns
+            running = numpy.where((my_markers == Settings.MARKER_COUNT)[:, None], -weight_sum, weighted)
+            scores = numpy.select([my_choose == BatchPolicy.CHOOSE_OVERLAP,
+                                   my_choose == BatchPolicy.CHOOSE_WEIGHTED,
+                                   my_choose == BatchPolicy.CHOOSE_RUNNING],
+                                  [overlap, weighted, running], 0)
+            scores = numpy.where(valid, scores, INVALID_SCORE)
+
+            # Like max(scores, key=scores.get), the first best candidate wins.
+            pick = scores.argmax(axis=1)
+            for column, ok in ((first[rows, pick], first_ok[rows, pick]),
+                               (second[rows, pick], second_ok[rows, pick])):
+                my_markers -= ok & (my_temp[rows, column] == 0)
+                my_temp[rows, column] += ok
+
+            # Decide to stop.
+            my_turn_attempts = turn_attempts[games] + 1
+            my_stop = stop[games, current]
+            stopping = numpy.select([my_stop == BatchPolicy.STOP_BUDGET,
+                                     my_stop == BatchPolicy.STOP_RULE28,
+                                     my_stop == BatchPolicy.STOP_NO_MARKERS],
+                                    [my_turn_attempts >= budget[games, current],
+                                     rule28(my_temp) >= 28,
+                                     my_markers == 0], True)
+            stopping &= hit
+
+            # Commit the temp progress of the players who stopped.
+            won = numpy.zeros(games.size, dtype=bool)
+            stopped = numpy.flatnonzero(stopping)
+            if stopped.size:
+                stopped_games = games[stopped]
+                stopped_seats = current[stopped]
+                stopped_temp = my_temp[stopped]
+                committed = my_positions[stopped] + stopped_temp
+                claimed = (stopped_temp > 0) & (committed >= LENGTHS)
+                everyone = positions[stopped_games]
+                everyone[claimed[:, None, :].repeat(player_count, axis=1)] = 0
+                everyone[numpy.arange(stopped.size), stopped_seats] = numpy.minimum(committed, LENGTHS)
+                positions[stopped_games] = everyone
+                owners[stopped_games] = numpy.where(claimed, stopped_seats[:, None], owners[stopped_games])
+                won_counts[stopped_games, stopped_seats] += claimed.sum(axis=1, dtype=numpy.int16)
+                won[stopped] = won_counts[stopped_games, stopped_seats] >= Settings.COLUMNS_TO_WIN
+                winner_seat[games[won]] = current[won]
+
+            # A bust or a stop ends the turn.
+            turn_over = ~hit | stopping
+            busts[games[~hit]] += 1
+            my_temp[turn_over] = 0
+            my_markers[turn_over] = Settings.MARKER_COUNT
+            my_turn_attempts[turn_over] = 0
+            temp[games] = my_temp
+            markers[games] = my_markers
+            turn_attempts[games] = my_turn_attempts
+
+            next_turn = turn_over & ~won
+            next_seat = (current + 1) % player_count
+            seat[games[next_turn]] = next_seat[next_turn]
+            rounds[games[next_turn & (next_seat == 0)]] += 1
+
+            active = games[~won]
+
+        names = [p.name for p in self.policies]
+        winners = seating[numpy.arange(count), winner_seat]
+        return [GameResult(names[w], int(r), int(a), int(b))
+                for w, r, a, b in zip(winners, rounds, attempts, busts)]
@@ -2,8 +2,12 @@ import logging
 
 """
 The best bot is ChoosingScoringBot.
+
+The bots that search or solve import their modules when they're used so
+that importing the bots stays cheap.
 """
 from cantstop.lib.all_the_things import Player, State
+from cantstop.lib.settings import Settings
 
 
 class Bot(Player):
@@ -95,7 +99,8 @@ class ConservativeBot(Bot):
     - stop when there are no free markers
     """
     def choose_columns(self, state):
-        state.display()
+        if logging.root.level <= logging.DEBUG:
+            state.display()
         chosen_cols = state.get_current_columns(self.name)
 
         overlap = {}
@@ -109,7 +114,7 @@ class ConservativeBot(Bot):
         # This will prioritize choosing a column if it has already
         # been chosen in the past.  If there's a choice to advance
         # two ranks in a column, then that choise will be taken.
-        logging.info("CB: overlap = {}".format(overlap))
+        logging.debug("CB: overlap = {}".format(overlap))
         best_choice_index = max(overlap, key=overlap.get)
         return state.choices[best_choice_index]
 
@@ -177,17 +182,16 @@ class RunningScoringBot(ScoringBot):
     CSB except when placing the first marker, will prefer the middle columns.
     """
     def find_middle_column(self):
-        print("RUNNING")
+        logging.debug("RUNNING")
         scores = {}
         for i, choice_tup in enumerate(self.state.choices):
             score = 0
             for choice in choice_tup:
                 score += State.weight_column(choice)
             scores[i] = score
-        print("scores:")
-        print(scores)
+        logging.debug("scores: {}".format(scores))
         best_choice_index = min(scores, key=scores.get)
-        print("best choice: {}".format(best_choice_index))
+        logging.debug("best choice: {}".format(best_choice_index))
         return self.state.choices[best_choice_index]
 
     def choose_columns(self, state):
@@ -256,6 +260,39 @@ defaultdict(<class 'int'>, {'DecaRollerBot': 3888, 'HexRollerBot': 6112})
         self.end_of_turn_cleanup()
 
 
+class AdaptiveRollerBot(RollerBot):
+    """
+    This bot will:
+        - choose columns it has already chosen
+        - after its first choice of a turn, set its budget to the number of
+          attempts it survives with at least the target odds
+
+    The odds come from the survival curve in solver.py so nothing is
+    simulated.
+
+    Results: head to head against HexRB, this bot won 66 of 100 seeded games.
+    """
+    def __init__(self, name, target=0.5, max_budget=12):
+        self.target = target
+        self.max_budget = max_budget
+        super().__init__(name, max_budget)
+
+    def stop_or_continue(self, state):
+        if self.sub_turn == 1:
+            from cantstop.lib.solver import TurnSolver
+
+            solver = TurnSolver.from_state(state, self.name)
+            curve = solver.get_survival_curve(state.temp_progress, self.max_budget - 1)
+            self.risk_budget = 1
+            for odds in curve:
+                if odds < self.target:
+                    break
+                self.risk_budget += 1
+            logging.debug("{} picked a budget of {}.".format(self.name, self.risk_budget))
+
+        return super().stop_or_continue(state)
+
+
 class QuadRollerBot(RollerBot):
     def __init__(self, name):
         super().__init__(name, 4)
@@ -281,5 +318,145 @@ class DecaRollerBot(RollerBot):
         super().__init__(name, 10)
 
 
+class SolverBot(Bot):
+    """
+    This bot will:
+    - choose the columns and stop exactly when that maximizes the expected
+      P2 gain of the turn.  See solver.py.
+
+    Results: head to head against CSB, this bot won 34 of 40 seeded games.
+    """
+    def get_solver(self, state):
+        from cantstop.lib.solver import TurnSolver
+
+        return TurnSolver.from_state(state, self.name)
+
+    def choose_columns(self, state):
+        return self.get_solver(state).get_best_choice(state.temp_progress, state.choices)
+
+    def stop_or_continue(self, state):
+        if self.get_solver(state).should_continue(state.temp_progress):
+            return 2  # Play
+
+        return 1  # Stop
+
+
+class SolitaireBot(SolverBot):
+    """
+    This bot will:
+    - play as if it were alone and take the fewest expected turns to win,
+      see solitaire.py.  The columns the others won are just out of reach.
+
+    It needs the solitaire table for the rules of the game to be solved
+    first, eg with solitaire.py --lengths, and that's only feasible for
+    shorter columns than the standard board's.
+
+    Results: with columns 1,1,1,2,2,2,2,2,1,1,1 long, head to head against
+    SolverBot, this bot won 121 of 200 seeded games.
+    """
+    def __init__(self, name):
+        from cantstop.lib.solitaire import get_table
+
+        super().__init__(name)
+        self.table = get_table()
+        if self.table is None:
+            raise ValueError("SolitaireBot needs a solved solitaire table for columns {} long.  Solve it with "
+                             "solitaire.py --lengths, which is only feasible for short columns."
+                             .format(",".join(str(length) for length in Settings.COLUMN_LENGTHS)))
+
+    def get_solver(self, state):
+        from cantstop.lib.solver import TurnSolver
+
+        return TurnSolver.from_state(state, self.name, self.table.get_utility(state.player_positions[self.name]),
+                                     self.table.lengths)
+
 
+class EndgameBot(ChoosingScoringBot):
+    """
+    This bot will:
+    - play like CSB until there are few enough boards left in a two player
+      game, then play perfectly from the endgame tablebase, see endgame.py.
+
+    Results: on the standard board, the endgame never came up in 100 seeded
+    games against CSB, so it plays like CSB there.  With columns
+    2,2,3,3,4,4,4,3,3,2,2 long, it won 53 of 100 seeded games against CSB.
+    """
+    def get_solver(self, state):
+        """
+        :return: the tablebase's TurnSolver or None if it isn't an endgame
+        """
+        from cantstop.lib.endgame import get_tablebase
+
+        return get_tablebase().get_solver(state, self.name)
+
+    def choose_columns(self, state):
+        solver = self.get_solver(state)
+        if solver is None:
+            return super().choose_columns(state)
+        return solver.get_best_choice(state.temp_progress, state.choices)
+
+    def stop_or_continue(self, state):
+        solver = self.get_solver(state)
+        if solver is None:
+            return super().stop_or_continue(state)
+        if solver.should_continue(state.temp_progress):
+            return 2  # Play
+
+        return 1  # Stop
+
+
+class ExpectimaxBot(Bot):
+    """
+    This bot will:
+    - search the turn depth rolls ahead and score the horizon with P2 and
+      rule 28.  See search.py.  With a budget in seconds, it stops deepening
+      when the time is up, so its games can't be replayed from a seed.
+
+    Results: in a seeded arena.py tournament, this bot won 293 of its 330
+    games.  The whole tournament took five and a half minutes on one core.
+    """
+    def __init__(self, name, depth=2, budget=None):
+        super().__init__(name)
+        self.depth = depth
+        self.budget = budget
+
+    def get_search(self, state):
+        from cantstop.lib.search import ExpectimaxSearch
+
+        return ExpectimaxSearch.from_state(state, self.name, self.budget, max_depth=self.depth)
+
+    def choose_columns(self, state):
+        search = self.get_search(state)
+        return search.get_best_choice(state.temp_progress, state.choices)
+
+    def stop_or_continue(self, state):
+        search = self.get_search(state)
+        if search.should_continue(state.temp_progress):
+            return 2  # Play
+
+        return 1  # Stop
 
+
+class MCTSBot(Bot):
+    """
+    This bot will:
+    - grow a UCT tree over the rest of the turn for each decision and play
+      out the games from its leaves with ChoosingScoringBot's choices and
+      ScoringBot's stops.  See mcts.py.
+
+    Results: with 1000 rollouts per decision, this bot won 10 of 20 games
+    against ChoosingScoringBot (mcts_strength.py --seed 7), at about 30s a
+    game on one core.  The stop or roll edges are only a point or two of win
+    odds apart, so it takes more rollouts than that to tell them apart.
+    """
+    def __init__(self, name, rollouts=1000, milliseconds=None, workers=1, policy="heuristic", seed=None):
+        from cantstop.lib.mcts import MonteCarloSearch
+
+        super().__init__(name)
+        self.search = MonteCarloSearch(rollouts, milliseconds, workers, policy=policy, seed=seed)
+
+    def choose_columns(self, state):
+        return self.search.get_best_choice(state, self.name)
+
+    def stop_or_continue(self, state):
+        return self.search.stop_or_continue(state, self.name)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+
+"""
+Exact two player endgames.
+
+At the start of a turn, a two player game is just the committed ranks of
+the player to move and of the player waiting.  Its value is the odds that
+the player to move wins, playing the best way from there on.  The turn is
+solved by TurnSolver with those odds as the utility:
+
+    - a stop that wins the game is worth 1
+    - any other stop is worth 1 - (the value of the board after it, with
+      the other player to move)
+    - a bust is worth 1 - (the value of the same board, with the other
+      player to move)
+
+Every stop either wins a column or moves up one, so the only loop is the
+bust, which swaps the two players and leaves the board as it was.  The two
+sides of a board are solved together.  If x is one side and y is the other,
+x = f(1 - y) and y = g(1 - x) where f and g are the turn values.  Both have
+a slope of the bust odds, which is less than 1, so the secant method finds
+x in a few passes.
+
+Each open column can only go up for each player, or be won by one of them.
+So when a board is asked for, every board that can follow it is solved
+first, from the most columns won and the most ranks down.  A board is an
+endgame when there are few enough of those.  On the standard board, that's
+only in the last turns of a game, if at all.  Until then, nothing is
+answered rather than an approximation.
+
+Solved boards go into a tablebase file next to the other cached tables.
+It's a list of records that only ever grows, so every board is solved
+once.
+
+This should not import any other module in /lib except odds, solitaire, solver, tables and settings.
+"""
+
+import logging
+import os
+import struct
+
+from cantstop.lib.odds import ALL_COLUMNS_MASK
+from cantstop.lib.settings import Settings
+from cantstop.lib.solitaire import decode, encode, get_strides
+from cantstop.lib.solver import TurnSolver
+from cantstop.lib.tables import get_cache_path, get_rules_key
+
+# Bump this whenever the encoding or the meaning of the tablebase changes.
+ENDGAME_VERSION = 1
+
+# A board is an endgame if at most this many boards can follow it.
+MAX_ENDGAME_BOARDS = 1 << 12
+
+# The board of the player to move, the board of the other player and the
+# odds that the player to move wins.
+_RECORD = struct.Struct("<QQd")
+
+# When the cache of is_endgame() grows past this, it starts over.
+MAX_CACHE_SIZE = 1 << 16
+
+# (ranks, other ranks) -> True if it's an endgame
+_endgames = {}
+
+# The tablebase of this process.
+_tablebase = None
+
+
+def get_open_mask(ranks, other_ranks):
+    open_mask = ALL_COLUMNS_MASK
+    for index, length in enumerate(Settings.COLUMN_LENGTHS):
+        if ranks[index] >= length or other_ranks[index] >= length:
+            open_mask &= ~(1 << index)
+    return open_mask
+
+
+def get_won_count(ranks):
+    return sum(1 for rank, length in zip(ranks, Settings.COLUMN_LENGTHS) if rank >= length)
+
+
+def _get_column_options(rank, other_rank, length):
+    """
+    :return: list of the (rank, other rank) that a column can go to
+    """
+    if rank >= length or other_rank >= length:
+        return [(rank, other_rank)]
+    return [(length, 0), (0, length)] + [(r, o) for r in range(rank, length) for o in range(other_rank, length)]
+
+
+def get_board_count(ranks, other_ranks):
+    """
+    :return: how many boards can follow this one, itself included, before
+    somebody wins
+    """
+    counts = {(get_won_count(ranks), get_won_count(other_ranks)): 1}
+    for index, length in enumerate(Settings.COLUMN_LENGTHS):
+        if ranks[index] >= length or other_ranks[index] >= length:
+            continue
+        open_count = (length - ranks[index]) * (length - other_ranks[index])
+        next_counts = {}
+        for (won_count, other_won_count), count in counts.items():
+            for key, ways in (((won_count, other_won_count), open_count),
+                              ((won_count + 1, other_won_count), 1),
+                              ((won_count, other_won_count + 1), 1)):
+                if max(key) < Settings.COLUMNS_TO_WIN:
+                    next_counts[key] = next_counts.get(key, 0) + count * ways
+        counts = next_counts
+    return sum(counts.values())
+
+
+def get_following_boards(ranks, other_ranks):
+    """
+    :param ranks: the committed rank by column index of one player
+    :param other_ranks: the same for the other player
+    :return: list of every (ranks, other ranks) that can follow, the board
+    itself included and the won games left out, with the boards that can
+    only follow each board before it
+    """
+    options = [_get_column_options(ranks[index], other_ranks[index], length)
+               for index, length in enumerate(Settings.COLUMN_LENGTHS)]
+    boards = []
+
+    def add_columns(index, board, other_board, won_count, other_won_count, open_ranks):
+        if index == Settings.COLUMN_COUNT:
+            boards.append((won_count + other_won_count, open_ranks, tuple(board), tuple(other_board)))
+            return
+        length = Settings.COLUMN_LENGTHS[index]
+        for rank, other_rank in options[index]:
+            next_won_count = won_count + (rank >= length)
+            next_other_won_count = other_won_count + (other_rank >= length)
+            if max(next_won_count, next_other_won_count) >= Settings.COLUMNS_TO_WIN:
+                continue
+            board.append(rank)
+            other_board.append(other_rank)
+            add_columns(index + 1, board, other_board, next_won_count, next_other_won_count,
+                        open_ranks if max(rank, other_rank) >= length else open_ranks + rank + other_rank)
+            board.pop()
+            other_board.pop()
+
+    add_columns(0, [], [], 0, 0, 0)
+    boards.sort(reverse=True)
+    return [(board, other_board) for _, _, board, other_board in boards]
+
+
+def is_endgame(ranks, other_ranks):
+    """
+    The answer is kept, so asking at every decision is cheap.
+
+    :param ranks: the committed rank by column index of the player to move
+    :param other_ranks: the same for the other player
+    :return: True if the tablebase should solve this board
+    """
+    key = (tuple(ranks), tuple(other_ranks))
+    endgame = _endgames.get(key)
+    if endgame is None:
+        endgame = (max(get_won_count(ranks), get_won_count(other_ranks)) < Settings.COLUMNS_TO_WIN
+                   and get_board_count(ranks, other_ranks) <= MAX_ENDGAME_BOARDS)
+        if len(_endgames) >= MAX_CACHE_SIZE:
+            _endgames.clear()
+        _endgames[key] = endgame
+    return endgame
+
+
+def get_tablebase_path():
+    """
+    The tablebase is only good for the rules it was solved with.
+
+    :return: the file of the tablebase or None if the table cache is turned off
+    """
+    return get_cache_path("endgame", ENDGAME_VERSION, (get_rules_key(), Settings.COLUMNS_TO_WIN))
+
+
+class WinOdds(object):
+    """
+    The utility of a turn in the endgame: the odds of winning the game after
+    it.  Equal utilities share their solved values in solver.py.
+    """
+
+    def __init__(self, tablebase, ranks, other_ranks, bust_odds):
+        """
+        :param tablebase: EndgameTablebase with the boards after a stop solved
+        :param ranks: the committed rank by column index of the player to move
+        :param other_ranks: the same for the other player
+        :param bust_odds: the odds of winning after a bust
+        """
+        self.tablebase = tablebase
+        self.ranks = tuple(ranks)
+        self.other_ranks = tuple(other_ranks)
+        self.bust_odds = bust_odds
+
+    def __call__(self, temp_items):
+        if not temp_items:
+            return self.bust_odds
+
+        ranks = list(self.ranks)
+        other_ranks = list(self.other_ranks)
+        for column, rank, temp_rank in temp_items:
+            index = column - Settings.MIN_COLUMN
+            ranks[index] = rank + temp_rank
+            if ranks[index] >= Settings.COLUMN_LENGTHS[index]:
+                other_ranks[index] = 0
+        if get_won_count(ranks) >= Settings.COLUMNS_TO_WIN:
+            return 1.0
+        if tuple(ranks) == self.ranks:
+            # The turn solver also values temp progress that can't happen,
+            # like no progress with every marker placed.
+            return self.bust_odds
+        return 1 - self.tablebase.win_odds[(tuple(other_ranks), tuple(ranks))]
+
+    def __eq__(self, other):
+        return (isinstance(other, WinOdds) and self.tablebase is other.tablebase
+                and self.ranks == other.ranks and self.other_ranks == other.other_ranks
+                and self.bust_odds == other.bust_odds)
+
+    def __hash__(self):
+        return hash((id(self.tablebase), self.ranks, self.other_ranks, self.bust_odds))
+
+
+class EndgameTablebase(object):
+    """
+    The solved boards, by (ranks of the player to move, ranks of the other
+    player).  Boards that aren't there yet are solved when they are asked for.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: the file to keep the solved boards in or None to keep
+        them in memory only
+        """
+        self.path = path
+        self.strides = get_strides(Settings.COLUMN_LENGTHS)
+        self.win_odds = {}
+        if path is not None and os.path.exists(path):
+            self.read()
+
+    def read(self):
+        """
+        A record that was cut short by a crash is skipped.
+        """
+        with open(self.path, "rb") as tablebase_file:
+            data = tablebase_file.read()
+        size = len(data) - len(data) % _RECORD.size
+        for board, other_board, win_odds in _RECORD.iter_unpack(data[:size]):
+            self.win_odds[(decode(board, Settings.COLUMN_LENGTHS),
+                           decode(other_board, Settings.COLUMN_LENGTHS))] = win_odds
+        logging.debug("Endgame: read {} boards from {}.".format(len(self.win_odds), self.path))
+
+    def write(self, boards):
+        """
+        :param boards: list of (ranks, other ranks) to append to the file
+        """
+        if self.path is None:
+            return
+        records = []
+        for ranks, other_ranks in boards:
+            records.append(_RECORD.pack(encode(ranks, self.strides), encode(other_ranks, self.strides),
+                                        self.win_odds[(ranks, other_ranks)]))
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as tablebase_file:
+                tablebase_file.write(b"".join(records))
+        except OSError as e:
+            logging.debug("Could not save the endgame tablebase: {}".format(e))
+            self.path = None
+
+    def get_turn_odds(self, ranks, other_ranks, bust_odds):
+        """
+        :return: the odds of winning after this turn, playing it the best way
+        """
+        # Each guess at the bust odds is a new utility so its values are
+        # dropped with the solver.
+        solver = TurnSolver(ranks, get_open_mask(ranks, other_ranks),
+                            WinOdds(self, ranks, other_ranks, bust_odds), share_values=False)
+        return solver.get_value(())
+
+    def solve(self, ranks, other_ranks, tolerance=1e-10):
+        """
+        Solve both sides of the board.  Every board that can follow it has
+        to be solved already.
+        """
+        def get_odds(x):
+            y = self.get_turn_odds(other_ranks, ranks, 1 - x)
+            return self.get_turn_odds(ranks, other_ranks, 1 - y), y
+
+        # Look for where get_odds(x)[0] - x is 0.
+        x0 = 0.5
+        y0 = get_odds(x0)[0]
+        x1 = y0
+        for _ in range(0, 100):
+            y1, other_odds = get_odds(x1)
+            if abs(y1 - x1) <= tolerance:
+                break
+            slope = (y1 - x1 - y0 + x0) / (x1 - x0)
+            if not slope:
+                break
+            x0, y0, x1 = x1, y1, x1 - (y1 - x1) / slope
+        else:
+            logging.warning("Endgame: {} vs {} didn't settle.".format(ranks, other_ranks))
+
+        self.win_odds[(ranks, other_ranks)] = y1
+        self.win_odds[(other_ranks, ranks)] = other_odds
+        self.write([(ranks, other_ranks), (other_ranks, ranks)])
+
+    def get_win_odds(self, ranks, other_ranks):
+        """
+        :param ranks: the committed rank by column index of the player to move
+        :param other_ranks: the same for the other player
+        :return: the odds that the player to move wins, 1.0 is 100%, or None
+        if the board isn't solved and isn't an endgame
+        """
+        key = (tuple(ranks), tuple(other_ranks))
+        win_odds = self.win_odds.get(key)
+        if win_odds is None and is_endgame(*key):
+            boards = get_following_boards(*key)
+            logging.info("Endgame: solving up to {} boards after {} vs {}.".format(len(boards), *key))
+            for board in boards:
+                if board not in self.win_odds:
+                    self.solve(*board)
+            win_odds = self.win_odds[key]
+        return win_odds
+
+    def get_solver(self, state, name):
+        """
+        :param state: State of a two player game
+        :param name: the player to move
+        :return: TurnSolver that plays the turn perfectly or None if the
+        board isn't an endgame
+        """
+        if len(state.player_positions) != 2:
+            return None
+        ranks = tuple(state.player_positions[name])
+        other_ranks = tuple(tuple(positions) for other_name, positions in state.player_positions.items()
+                            if other_name != name)[0]
+        if not is_endgame(ranks, other_ranks):
+            return None
+        bust_odds = 1 - self.get_win_odds(other_ranks, ranks)
+        return TurnSolver(ranks, get_open_mask(ranks, other_ranks), WinOdds(self, ranks, other_ranks, bust_odds))
+
+
+def get_tablebase():
+    """
+    The tablebase is only read once per process.
+
+    :return: the EndgameTablebase for the current Settings
+    """
+    global _tablebase
+    if _tablebase is None:
+        _tablebase = EndgameTablebase(get_tablebase_path())
+    return _tablebase
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+
+"""
+The compact core of the board.
+
+Board, Column and State in all_the_things.py are the friendly view of a game.
+The bookkeeping underneath them lives here in flat, fixed-size lists so that
+looking up or advancing a position is a single index instead of a scan
+through lists of player names.
+
+This should not import any other module in /lib except odds and settings.
+"""
+
+from types import MappingProxyType
+
+from cantstop.lib.odds import ALL_COLUMNS_MASK, COLUMN_BITS, ROLL_SUMS
+from cantstop.lib.settings import Settings
+
+
+# (roll index, free marker count, temp mask, blocked mask) -> tuple of choices
+_roll_choices_cache = {}
+
+# The kinds of undo records.
+UNDO_CHOICE = 0
+UNDO_STOP = 1
+UNDO_BUST = 2
+
+
+def _compute_roll_choices(roll_index, free_markers, temp_mask, blocked_mask):
+    roll_values = ROLL_SUMS[roll_index]
+
+    # If there are free markers, then the player can still choose
+    # a new column or two new columns.  Otherwise, their rolls
+    # have to overlap the columns they have already chosen on this
+    # turn.  Or they bust out.
+    choices = []
+    if free_markers >= 2:
+        for input_tuple in roll_values:
+            output_list = []
+            for element in input_tuple:
+                if not blocked_mask & COLUMN_BITS[element]:
+                    output_list.append(element)
+            if output_list:
+                choices.append(tuple(output_list))
+    else:
+        for input_tuple in roll_values:
+            for element in input_tuple:
+                if blocked_mask & COLUMN_BITS[element]:
+                    continue
+                if free_markers == 1 or temp_mask & COLUMN_BITS[element]:
+                    choices.append((element,))
+
+    return tuple(choices)
+
+
+def get_roll_choices(roll_index, free_markers, temp_mask, blocked_mask):
+    """
+    The legal choices only depend on the roll and on which columns are in
+    use or blocked, so they are computed once per combination and shared.
+
+    :param roll_index: index into odds.ROLL_SUMS
+    :param free_markers: how many markers the player has left this turn
+    :param temp_mask: bitmask of the columns with temp progress
+    :param blocked_mask: bitmask of the columns that can't be advanced, ie won
+    or temporarily maxed
+    :return: tuple of choice tuples, eg ((4, 11), (6, 9), (7,)).  Empty means a bust.
+    """
+    # The temp columns only matter once all the markers are placed.
+    if free_markers >= 2:
+        key = (roll_index, 2, 0, blocked_mask)
+    elif free_markers == 1:
+        key = (roll_index, 1, 0, blocked_mask)
+    else:
+        key = (roll_index, 0, temp_mask, blocked_mask)
+
+    choices = _roll_choices_cache.get(key)
+    if choices is None:
+        choices = _compute_roll_choices(roll_index, free_markers, temp_mask, blocked_mask)
+        _roll_choices_cache[key] = choices
+    return choices
+
+
+class BoardEngine(object):
+    """
+    Each player's committed ranks are a list of ints indexed by
+    column - MIN_COLUMN.  The column owners, the temp progress and the free
+    marker count sit in slots next to them.
+
+    Whenever a column is claimed or cleared, the open column bitmask and each
+    player's won columns are updated so that none of the availability or
+    winner checks have to look at every column.
+
+    A search can play moves in place with make_choice(), make_stop() and
+    make_bust() and take them back, newest first, with unmake().  Each move
+    pushes one small tuple on the undo stack:
+
+        (UNDO_CHOICE, choice)
+        (UNDO_STOP, name, temp_progress, winner, claimed)
+        (UNDO_BUST, temp_progress)
+
+    where claimed holds (column index, owner, rank of each player) for the
+    columns the stop won.  Don't mix them with the register and reset
+    methods, which leave the stack alone, until the stack is empty again.
+
+    The ranks only change when a turn ends so get_player_positions() keeps
+    its snapshot until then and every State in the turn shares it.
+    """
+    __slots__ = ("names", "ranks", "owners", "temp_progress", "free_markers",
+                 "open_mask", "won_masks", "won_counts", "winner", "undo_stack", "positions")
+
+    def __init__(self):
+        self.names = []  # Player names in the order they were added.
+        self.ranks = {}  # dict: name->list of committed rank by column index
+        self.owners = [None] * Settings.COLUMN_COUNT  # Name of the player who won each column.
+        self.temp_progress = {}  # dict: column_num->temp_rank_by_that_column
+        self.free_markers = Settings.MARKER_COUNT
+        self.open_mask = ALL_COLUMNS_MASK  # Bitmask of the columns nobody has won.
+        self.won_masks = {}  # dict: name->bitmask of the columns won
+        self.won_counts = {}  # dict: name->number of columns won
+        self.winner = None  # The first player to win COLUMNS_TO_WIN columns.
+        self.undo_stack = []  # list of undo records, see above
+        self.positions = None  # Snapshot for get_player_positions() or None if the ranks changed.
+
+    @classmethod
+    def from_positions(cls, player_positions, temp_progress=None):
+        """
+        Rebuild an engine from what a State shows.  A player at the top of a
+        column owns it.
+
+        :param player_positions: dict: name->tuple of current_rank_by_column
+        :param temp_progress: dict: column_num->temp_rank_by_that_column
+        """
+        engine = cls()
+        for name, positions in player_positions.items():
+            engine.add_player(name)
+            for index, rank in enumerate(positions):
+                if rank >= Settings.COLUMN_LENGTHS[index]:
+                    engine.claim_column(index + Settings.MIN_COLUMN, name)
+                else:
+                    engine.set_rank(name, index + Settings.MIN_COLUMN, rank)
+        if temp_progress:
+            engine.temp_progress = dict(temp_progress)
+            engine.free_markers = Settings.MARKER_COUNT - len(temp_progress)
+        return engine
+
+    def copy(self):
+        """
+        :return: an independent engine in the same position, with an empty
+        undo stack
+        """
+        engine = BoardEngine.__new__(BoardEngine)
+        engine.names = list(self.names)
+        engine.ranks = {name: list(ranks) for name, ranks in self.ranks.items()}
+        engine.owners = list(self.owners)
+        engine.temp_progress = dict(self.temp_progress)
+        engine.free_markers = self.free_markers
+        engine.open_mask = self.open_mask
+        engine.won_masks = dict(self.won_masks)
+        engine.won_counts = dict(self.won_counts)
+        engine.winner = self.winner
+        engine.undo_stack = []
+        engine.positions = self.positions
+        return engine
+
+    def add_player(self, name):
+        """
+        Players start at the bottom of every column.  Adding the same name
+        twice is harmless.
+
+        :param name:
+        :return:
+        """
+        if name in self.ranks:
+            return
+        self.names.append(name)
+        self.ranks[name] = [0] * Settings.COLUMN_COUNT
+        self.positions = None
+        self.won_masks[name] = 0
+        self.won_counts[name] = 0
+
+    def get_rank(self, name, column):
+        return self.ranks[name][column - Settings.MIN_COLUMN]
+
+    def set_rank(self, name, column, rank):
+        self.ranks[name][column - Settings.MIN_COLUMN] = rank
+        self.positions = None
+
+    def get_player_positions(self):
+        """
+        :return: read-only dict: name->tuple of current_rank_by_column.  The
+        same one is returned until the ranks change.
+        """
+        if self.positions is None:
+            player_positions = {}
+            for name in self.names:
+                player_positions[name] = tuple(self.ranks[name])
+            self.positions = MappingProxyType(player_positions)
+        return self.positions
+
+    def get_owner(self, column):
+        return self.owners[column - Settings.MIN_COLUMN]
+
+    def is_open(self, column):
+        return bool(self.open_mask & COLUMN_BITS[column])
+
+    def _release_column(self, index):
+        """
+        Take the column away from its owner, if it has one.
+        """
+        owner = self.owners[index]
+        if owner is None:
+            return
+        self.owners[index] = None
+        self.open_mask |= 1 << index
+        self.won_masks[owner] &= ~(1 << index)
+        self.won_counts[owner] -= 1
+        if self.winner == owner and self.won_counts[owner] < Settings.COLUMNS_TO_WIN:
+            self.winner = None
+
+    def claim_column(self, column, name):
+        """
+        The winner of a column sits at the top rank and everyone else is
+        knocked off of it.
+
+        :param column:
+        :param name:
+        :return:
+        """
+        index = column - Settings.MIN_COLUMN
+        self._release_column(index)
+        self.owners[index] = name
+        self.open_mask &= ~(1 << index)
+        self.won_masks[name] |= 1 << index
+        self.won_counts[name] += 1
+        if self.winner is None and self.won_counts[name] >= Settings.COLUMNS_TO_WIN:
+            self.winner = name
+
+        for player_ranks in self.ranks.values():
+            player_ranks[index] = 0
+        self.ranks[name][index] = Settings.COLUMN_LENGTHS[index]
+        self.positions = None
+
+    def clear_column(self, column):
+        """
+        Put everyone back at the bottom of this column.
+
+        :param column:
+        :return:
+        """
+        index = column - Settings.MIN_COLUMN
+        self._release_column(index)
+        for player_ranks in self.ranks.values():
+            player_ranks[index] = 0
+        self.positions = None
+
+    def advance(self, name, column, ranks):
+        """
+        Move a player up a column.  Progress past the top rank is dropped.
+
+        :return: True if this advance won the column
+        """
+        index = column - Settings.MIN_COLUMN
+        future_position = self.ranks[name][index] + ranks
+        if future_position >= Settings.COLUMN_LENGTHS[index]:
+            self.claim_column(column, name)
+            return True
+
+        self.ranks[name][index] = future_position
+        self.positions = None
+        return False
+
+    def register_roll_choice(self, choice):
+        for column in choice:
+            if column in self.temp_progress:
+                self.temp_progress[column] += 1
+            else:
+                self.free_markers -= 1
+                self.temp_progress[column] = 1
+
+    def commit_progress(self, name):
+        """
+        Stop: advance the player by the temp progress and start a new turn.
+
+        :return: list of the columns this won
+        """
+        won_columns = []
+        for column, temp_rank in self.temp_progress.items():
+            if self.advance(name, column, temp_rank):
+                won_columns.append(column)
+        self.reset_progress()
+        return won_columns
+
+    def reset_progress(self):
+        self.temp_progress = {}
+        self.free_markers = Settings.MARKER_COUNT
+
+    def make_choice(self, choice):
+        """
+        register_roll_choice() that can be undone.
+        """
+        self.register_roll_choice(choice)
+        self.undo_stack.append((UNDO_CHOICE, choice))
+
+    def make_stop(self, name):
+        """
+        commit_progress() that can be undone.
+
+        :return: list of the columns this won
+        """
+        claimed = []
+        for column in self.temp_progress:
+            index = column - Settings.MIN_COLUMN
+            if self.ranks[name][index] + self.temp_progress[column] >= Settings.COLUMN_LENGTHS[index]:
+                claimed.append((index, self.owners[index],
+                                tuple(self.ranks[player][index] for player in self.names)))
+        self.undo_stack.append((UNDO_STOP, name, self.temp_progress, self.winner, tuple(claimed)))
+        return self.commit_progress(name)
+
+    def make_bust(self):
+        """
+        reset_progress() that can be undone.
+        """
+        self.undo_stack.append((UNDO_BUST, self.temp_progress))
+        self.reset_progress()
+
+    def unmake(self):
+        """
+        Take back the last make_choice(), make_stop() or make_bust().
+        """
+        record = self.undo_stack.pop()
+        kind = record[0]
+        if kind == UNDO_CHOICE:
+            for column in reversed(record[1]):
+                if self.temp_progress[column] == 1:
+                    del self.temp_progress[column]
+                    self.free_markers += 1
+                else:
+                    self.temp_progress[column] -= 1
+            return
+
+        if kind == UNDO_STOP:
+            _, name, temp_progress, winner, claimed = record
+            claimed_indexes = 0
+            for index, owner, ranks in claimed:
+                claimed_indexes |= 1 << index
+                self._release_column(index)
+                if owner is not None:
+                    self.owners[index] = owner
+                    self.open_mask &= ~(1 << index)
+                    self.won_masks[owner] |= 1 << index
+                    self.won_counts[owner] += 1
+                for player, rank in zip(self.names, ranks):
+                    self.ranks[player][index] = rank
+            for column, temp_rank in temp_progress.items():
+                index = column - Settings.MIN_COLUMN
+                if not claimed_indexes & (1 << index):
+                    self.ranks[name][index] -= temp_rank
+            self.winner = winner
+            self.positions = None
+        else:
+            temp_progress = record[1]
+
+        self.temp_progress = temp_progress
+        self.free_markers = Settings.MARKER_COUNT - len(temp_progress)
+
+    def get_complete_mask(self):
+        return ALL_COLUMNS_MASK ^ self.open_mask
+
+    def get_choice_masks(self, name):
+        """
+        :return: (bitmask of the temp columns, bitmask of the columns that
+        are won or temporarily maxed by this player)
+        """
+        temp_mask = 0
+        blocked_mask = ALL_COLUMNS_MASK ^ self.open_mask
+        player_ranks = self.ranks[name]
+        for column, temp_rank in self.temp_progress.items():
+            index = column - Settings.MIN_COLUMN
+            temp_mask |= 1 << index
+            if player_ranks[index] + temp_rank >= Settings.COLUMN_LENGTHS[index]:
+                blocked_mask |= 1 << index
+        return temp_mask, blocked_mask
+
+    def get_roll_choices(self, name, roll_index):
+        temp_mask, blocked_mask = self.get_choice_masks(name)
+        return get_roll_choices(roll_index, self.free_markers, temp_mask, blocked_mask)
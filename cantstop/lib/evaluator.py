@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""
+Exact turn outcomes of a bot without playing any games.
+
+Most bots decide by looking only at the State, so a single turn is a Markov
+chain over the temp progress.  Walking that chain attempt by attempt gives
+the odds of a bust, the expected ranks gained in each column and the
+expected number of attempts.
+
+RollerBot's budget is the one bit of memory that is supported.  It's the
+number of attempts so it's kept in the chain state.  Bots that remember
+anything else can't be evaluated.
+"""
+
+import copy
+from collections import namedtuple
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.bots.bots import Bot, ChoosingScoringBot, ConservativeBot, RollerBot, \
+    RunningScoringBot, ScoringBot, SmartCowardBot
+from cantstop.lib.odds import ROLL_COUNT
+from cantstop.lib.settings import Settings
+from cantstop.lib.solver import TurnSolver, get_outcomes
+
+# bust: odds of busting, 1.0 is 100%
+# attempts: expected number of attempts
+# ranks: dict: column_num->expected ranks committed
+# claims: dict: column_num->odds of winning that column this turn
+TurnOutcome = namedtuple("TurnOutcome", ["bust", "attempts", "ranks", "claims"])
+
+class PolicyEvaluator(object):
+    """
+    Evaluate one turn of a bot from a given board.
+    """
+
+    def __init__(self, player_positions, name):
+        """
+        :param player_positions: dict: name->tuple of current_rank_by_column
+        :param name: the player whose turn it is
+        """
+        self.player_positions = player_positions
+        self.name = name
+        self.ranks = player_positions[name]
+        self.solver = TurnSolver.from_positions(player_positions, name)
+
+    def make_state(self, choices, temp):
+        return State(choices, (self.player_positions, dict(temp)), 0)
+
+    @staticmethod
+    def get_choice_context(bot):
+        """
+        Most bots choose from the choices and the committed columns only, so
+        their choices can be shared by every temp progress.
+
+        :return: function of the temp progress that returns what the bot's
+        choice depends on besides the choices
+        """
+        choose_method = type(bot).choose_columns
+        if choose_method in (Bot.choose_columns, SmartCowardBot.choose_columns, ConservativeBot.choose_columns,
+                             ScoringBot.choose_columns, RollerBot.choose_columns,
+                             ChoosingScoringBot.choose_columns):
+            return lambda temp: None
+        elif choose_method is RunningScoringBot.choose_columns:
+            return len
+        return lambda temp: temp
+
+    def evaluate(self, bot):
+        """
+        :param bot: a Bot.  It isn't changed.
+        :return: TurnOutcome
+        """
+        bot = copy.copy(bot)
+        stop_method = type(bot).stop_or_continue
+        budget = None
+        if isinstance(bot, RollerBot):
+            if stop_method is not RollerBot.stop_or_continue:
+                raise ValueError("{} decides to stop in a way the evaluator can't follow.".format(bot.name))
+            budget = bot.fixed_budget
+        get_context = self.get_choice_context(bot)
+
+        # (free marker bucket, temp mask, blocked mask, choice context) ->
+        # (bust roll count, tuple of (choice, roll count))
+        choice_counts_cache = {}
+        stop_cache = {}  # temp -> True to stop
+
+        bust = 0.0
+        attempts = 0.0
+        ranks = dict.fromkeys(Settings.COLUMN_RANGE, 0.0)
+        claims = dict.fromkeys(Settings.COLUMN_RANGE, 0.0)
+
+        # Each pass is one attempt.  The temp progress is a sorted tuple of
+        # (column, temp rank) and it can go past the top like the Board's.
+        attempt = 0
+        odds_by_temp = {(): 1.0}
+        while odds_by_temp:
+            attempt += 1
+            next_odds_by_temp = {}
+            for temp, odds in odds_by_temp.items():
+                attempts += odds
+                free_markers = Settings.MARKER_COUNT - len(temp)
+                temp_mask, blocked_mask = self.solver.get_masks(temp)
+                # The same choices as the outcomes, see get_outcomes().
+                key = (min(free_markers, 2), temp_mask if free_markers <= 0 else 0, blocked_mask,
+                       get_context(temp))
+                choice_counts = choice_counts_cache.get(key)
+                if choice_counts is None:
+                    bust_count = 0
+                    counts = {}
+                    for count, choices in get_outcomes(free_markers, temp_mask, blocked_mask, ordered=True):
+                        if not choices:
+                            bust_count += count
+                            continue
+                        choice = tuple(bot.choose_columns(self.make_state(choices, temp)))
+                        counts[choice] = counts.get(choice, 0) + count
+                    choice_counts = (bust_count, tuple(counts.items()))
+                    choice_counts_cache[key] = choice_counts
+
+                bust += odds * choice_counts[0] / ROLL_COUNT
+                for choice, count in choice_counts[1]:
+                    roll_odds = odds * count / ROLL_COUNT
+                    progress = dict(temp)
+                    for column in choice:
+                        progress[column] = progress.get(column, 0) + 1
+                    next_temp = tuple(sorted(progress.items()))
+
+                    if budget is not None:
+                        do_stop = attempt >= budget
+                    else:
+                        do_stop = stop_cache.get(next_temp)
+                        if do_stop is None:
+                            do_stop = bot.stop_or_continue(self.make_state((choice,), next_temp)) == 1
+                            stop_cache[next_temp] = do_stop
+
+                    if do_stop:
+                        for column, temp_rank in next_temp:
+                            index = column - Settings.MIN_COLUMN
+                            left = Settings.COLUMN_LENGTHS[index] - self.ranks[index]
+                            ranks[column] += roll_odds * min(temp_rank, left)
+                            if temp_rank >= left:
+                                claims[column] += roll_odds
+                    else:
+                        next_odds_by_temp[next_temp] = next_odds_by_temp.get(next_temp, 0) + roll_odds
+            odds_by_temp = next_odds_by_temp
+
+        return TurnOutcome(bust, attempts, ranks, claims)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+"""
+Monte Carlo tree search for a single decision.
+
+The tree covers the rest of the current turn.  A decision node is either
+the pick among the choices or the pick between stopping and rolling, and
+rolling leads to a chance node whose children are the sets of choices the
+dice offer.  The decisions are picked by UCT and the dice are sampled, so
+equal sets of choices share a child.
+
+Each iteration walks down the tree until it reaches a new node, and then
+plays the rest of the game out on a copy of the BoardEngine.  The
+rollout policy is either "heuristic", ie ChoosingScoringBot's choices and
+ScoringBot's rule 28 stop, or "random".  The win or loss is added to every
+edge on the way down.
+
+The other players take their turns in the rollouts in the order of
+State.turn_order, ie the seating of the game.
+
+For root parallel search, several independent trees are grown from the
+same root in a pool and their root statistics are added up.  The pools
+are kept for the life of the process and shut down when it exits.
+
+This should not import any other module in /lib except all_the_things, engine, odds and settings.
+"""
+
+import atexit
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from random import Random
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.engine import BoardEngine
+from cantstop.lib.odds import ROLL_COUNT
+from cantstop.lib.settings import Settings
+
+# The same codes as Player.stop_or_continue().
+STOP = 1
+ROLL = 2
+
+# The UCT exploration constant for win odds.
+EXPLORATION = 0.7
+
+# A rollout gives up after this many turns and counts as a loss.
+MAX_ROLLOUT_TURNS = 1000
+
+# (worker count, use threads) -> executor
+_pools = {}
+
+
+class Rollout(object):
+    """
+    Play a game forward on a BoardEngine with a cheap policy.
+    """
+    __slots__ = ("engine", "names", "turn", "rng", "policy")
+
+    def __init__(self, engine, names, turn, rng, policy="heuristic"):
+        """
+        :param engine: the BoardEngine to play on.  It is changed.
+        :param names: the players in the order they take their turns
+        :param turn: the index in names of the player to move
+        :param rng: Random for the dice and the random policy
+        :param policy: "heuristic" or "random"
+        """
+        self.engine = engine
+        self.names = names
+        self.turn = turn
+        self.rng = rng
+        self.policy = policy
+
+    def roll(self):
+        """
+        :return: the choices of a fresh roll for the player to move.  Empty is a bust.
+        """
+        return self.engine.get_roll_choices(self.names[self.turn], self.rng.randrange(ROLL_COUNT))
+
+    def choose(self, choices):
+        if self.policy == "random":
+            return choices[self.rng.randrange(len(choices))]
+
+        # Like ChoosingScoringBot.
+        ranks = self.engine.ranks[self.names[self.turn]]
+        best_choice = None
+        best_score = None
+        for choice in choices:
+            score = 0
+            for column in choice:
+                if not ranks[column - Settings.MIN_COLUMN]:
+                    score -= 6
+                score += State.weight_column(column)
+            if best_score is None or score > best_score:
+                best_choice = choice
+                best_score = score
+        return best_choice
+
+    def should_stop(self):
+        if self.policy == "random":
+            return self.rng.random() < 0.25
+
+        # Like ScoringBot.
+        return State.score_rule28(self.engine.temp_progress) >= 28
+
+    def stop(self):
+        self.engine.commit_progress(self.names[self.turn])
+
+    def bust(self):
+        self.engine.reset_progress()
+
+    def finish_turn(self, choices=None):
+        """
+        Play the current turn to the end.
+
+        :param choices: the choices of a roll to pick from first, or None
+        if the player has just picked and should decide whether to stop
+        """
+        while True:
+            if choices is not None:
+                self.engine.register_roll_choice(self.choose(choices))
+            if self.should_stop():
+                self.stop()
+                return
+            choices = self.roll()
+            if not choices:
+                self.bust()
+                return
+
+    def play_out(self):
+        """
+        Play the other turns until someone wins.
+
+        :return: the name of the winner or None if the rollout gave up
+        """
+        for _ in range(0, MAX_ROLLOUT_TURNS):
+            if self.engine.winner is not None:
+                return self.engine.winner
+            self.turn = (self.turn + 1) % len(self.names)
+            choices = self.roll()
+            if choices:
+                self.finish_turn(choices)
+            else:
+                self.bust()
+        return self.engine.winner
+
+
+class Node(object):
+    """
+    A decision node keeps [visits, wins] for each of its actions.  A chance
+    node only uses children, keyed by the choices of the roll.
+    """
+    __slots__ = ("visits", "stats", "children")
+
+    def __init__(self):
+        self.visits = 0
+        self.stats = {}  # action -> [visits, wins]
+        self.children = {}  # action or choices -> Node
+
+    def select(self, actions):
+        """
+        :return: the action to try, by UCT.  Untried actions go first.
+        """
+        best_action = None
+        best_score = None
+        log_visits = math.log(self.visits) if self.visits else 0
+        for action in actions:
+            stats = self.stats.get(action)
+            if stats is None:
+                return action
+            score = stats[1] / stats[0] + EXPLORATION * math.sqrt(log_visits / stats[0])
+            if best_score is None or score > best_score:
+                best_action = action
+                best_score = score
+        return best_action
+
+
+def search(engine, names, name, choices, rollouts, milliseconds=None, seed=None, policy="heuristic"):
+    """
+    Grow one tree from the decision of name.  This runs in the worker
+    processes so keep it at the module level.
+
+    :param engine: the BoardEngine at the decision.  It isn't changed.
+    :param names: the players in the order they take their turns
+    :param name: the player to decide
+    :param choices: the choices to pick from or None to decide whether to stop
+    :param rollouts: how many iterations to run
+    :param milliseconds: if given, run until this much time has gone by instead
+    :param seed: seed for the dice of the rollouts
+    :param policy: the rollout policy, "heuristic" or "random"
+    :return: dict: action->[visits, wins] of the root
+    """
+    rng = Random(seed)
+    turn = names.index(name)
+    deadline = None
+    if milliseconds is not None:
+        deadline = time.perf_counter() + milliseconds / 1000
+        rollouts = math.inf
+
+    root = Node()
+    iteration = 0
+    while iteration < rollouts and (deadline is None or time.perf_counter() < deadline):
+        iteration += 1
+        rollout = Rollout(engine.copy(), names, turn, rng, policy)
+        path = []
+        node = root
+        node_choices = choices
+        while True:
+            if node_choices is not None:
+                action = node.select(node_choices)
+                rollout.engine.register_roll_choice(action)
+            else:
+                action = node.select((STOP, ROLL))
+            path.append((node, action))
+            if action == STOP:
+                rollout.stop()
+                break
+
+            is_new = action not in node.children
+            node = node.children.setdefault(action, Node())
+            if action == ROLL:
+                # Move through the chance node to the pick among the choices.
+                node_choices = rollout.roll()
+                if not node_choices:
+                    rollout.bust()
+                    break
+                is_new = node_choices not in node.children
+                node = node.children.setdefault(node_choices, Node())
+            else:
+                node_choices = None
+            if is_new:
+                rollout.finish_turn(node_choices)
+                break
+
+        won = rollout.play_out() == name
+        for node, action in path:
+            node.visits += 1
+            stats = node.stats.setdefault(action, [0, 0])
+            stats[0] += 1
+            stats[1] += won
+
+    return root.stats
+
+
+def get_pool(workers, use_threads=False):
+    """
+    The pools are kept for the life of the process since a search is much
+    shorter than starting one.  See shutdown_pools().
+    """
+    key = (workers, use_threads)
+    pool = _pools.get(key)
+    if pool is None:
+        if use_threads:
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        _pools[key] = pool
+    return pool
+
+
+def shutdown_pools():
+    """
+    Stop the workers of every pool.  A later search starts new ones.
+    """
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+
+atexit.register(shutdown_pools)
+
+
+def search_parallel(engine, names, name, choices, rollouts, milliseconds=None, seed=None, policy="heuristic",
+                    workers=1, use_threads=False):
+    """
+    Grow one tree per worker and add up their root statistics.  The rollouts
+    are split between the workers, or each one searches for the whole time,
+    and each gets its own seed.
+
+    :return: dict: action->[visits, wins] of the merged root
+    """
+    if workers <= 1:
+        return search(engine, names, name, choices, rollouts, milliseconds, seed, policy)
+
+    pool = get_pool(workers, use_threads)
+    futures = []
+    for worker in range(0, workers):
+        worker_rollouts = rollouts
+        if milliseconds is None:
+            worker_rollouts = rollouts // workers + (worker < rollouts % workers)
+        worker_seed = None if seed is None else seed * workers + worker
+        futures.append(pool.submit(search, engine, names, name, choices, worker_rollouts, milliseconds,
+                                   worker_seed, policy))
+
+    merged = {}
+    for future in futures:
+        for action, (visits, wins) in future.result().items():
+            stats = merged.setdefault(action, [0, 0])
+            stats[0] += visits
+            stats[1] += wins
+    return merged
+
+
+class MonteCarloSearch(object):
+    """
+    Make the decisions of one player by MCTS.
+    """
+
+    def __init__(self, rollouts=1000, milliseconds=None, workers=1, use_threads=False, policy="heuristic",
+                 seed=None):
+        """
+        :param rollouts: iterations for each decision, across all the workers
+        :param milliseconds: if given, search each decision for this long instead
+        :param workers: how many trees to grow in parallel
+        :param use_threads: grow them on threads instead of processes
+        :param policy: the rollout policy, "heuristic" or "random"
+        :param seed: seed for the rollouts.  Only rollout counts are reproducible.
+        """
+        self.rollouts = rollouts
+        self.milliseconds = milliseconds
+        self.workers = workers
+        self.use_threads = use_threads
+        self.policy = policy
+        self.rng = Random(seed)
+
+    def get_stats(self, state, name, choices):
+        engine = BoardEngine.from_positions(state.player_positions, state.temp_progress)
+        return search_parallel(engine, list(state.turn_order), name, choices, self.rollouts,
+                               self.milliseconds, self.rng.getrandbits(32), self.policy, self.workers,
+                               self.use_threads)
+
+    def get_best_choice(self, state, name):
+        """
+        :return: the most visited of state.choices
+        """
+        stats = self.get_stats(state, name, tuple(state.choices))
+        return max(state.choices, key=lambda choice: stats.get(choice, (0, 0))[0])
+
+    def stop_or_continue(self, state, name):
+        """
+        :return: 1 to stop or 2 to roll, whichever was visited most
+        """
+        stats = self.get_stats(state, name, None)
+        return max((STOP, ROLL), key=lambda action: stats.get(action, (0, 0))[0])
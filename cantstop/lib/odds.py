@@ -7,67 +7,442 @@ Answer questions like:
 - Given two sums, which third sum maximizes a hit in the following attempt.
 - Given a temp_progress position, should player stop or continue.
 
+The roll tables here are built in memory at import since they only take
+milliseconds.  The solver tables that take minutes or more are cached in
+files, see tables.py.
+
 This should not import any other module in /lib.
 """
 
 import argparse
+import hashlib
 import logging
-from collections import defaultdict
-from random import randint
+import time
+from array import array
+from collections import defaultdict, namedtuple
+from itertools import combinations, combinations_with_replacement, groupby
+from math import erfc, factorial, nan, sqrt
+from random import Random, SystemRandom
+from types import MappingProxyType
 
 from cantstop.lib.settings import Settings
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The roll tables, the choices and the columns are all built for four d6:
+# the dice split into two pairs three ways and every pair-sum is a column.
+# These are named for the tables, they aren't settings.
+DICE_COUNT = 4
+DIE_FACES = 6
+
+if tuple(Settings.COLUMN_RANGE) != tuple(range(2, 13)):
+    raise ValueError("The columns have to be the pair-sums of d6, 2 to 12, not {} to {}."
+                     .format(Settings.MIN_COLUMN, Settings.MAX_COLUMN))
 
-class Die(object):
+
+def _build_roll_tables():
     """
-    This might be overkill.
+    Enumerate every roll of four dice once.  A roll is identified by its index
+    in [0, 1296), which is the four die values written in base 6.
+
+    :return: (tuple of the four die values, tuple of the unique and sorted
+    pair-sum tuples) for each roll index
     """
+    roll_values = []
+    roll_sums = []
+    for a in range(1, 7):
+        for b in range(1, 7):
+            for c in range(1, 7):
+                for d in range(1, 7):
+                    roll_values.append((a, b, c, d))
 
-    def __init__(self):
-        self.value = None
-        self.roll()
+                    # It's possible that there are duplicate tuples.  For example,
+                    # the dice rolls are 1, 2, 2, 5].  This results in these possible
+                    # pairs: [(3, 7), (4, 6), (3, 7)].  So unique the list.
+                    pairs = {tuple(sorted([a + b, c + d])),
+                             tuple(sorted([a + c, b + d])),
+                             tuple(sorted([a + d, b + c]))}
+                    roll_sums.append(tuple(sorted(pairs)))
 
-    def roll(self):
-        self.value = randint(1, 6)
+    return tuple(roll_values), tuple(roll_sums)
+
+
+ROLL_COUNT = DIE_FACES ** DICE_COUNT
+ROLL_VALUES, ROLL_SUMS = _build_roll_tables()
+
+# dict: (dice count, face count)->tuple of (sorted die values, weight)
+_weighted_multisets = {}
+
+
+def get_weighted_multisets(dice_count=DICE_COUNT, faces=DIE_FACES):
+    """
+    Every roll as its sorted die values and the number of ordered rolls
+    that sort to them, ie the multinomial coefficient.  Anything that only
+    depends on which values were rolled can be counted over these instead of
+    every ordered roll and give the same totals.  For four d6, that is 126
+    multisets instead of 1296 rolls.
+
+    :param dice_count: how many dice are rolled
+    :param faces: how many faces each die has
+    :return: tuple of (sorted die values, weight), eg ((1, 1, 5, 6), 12)
+    """
+    key = (dice_count, faces)
+    multisets = _weighted_multisets.get(key)
+    if multisets is None:
+        multisets = []
+        for values in combinations_with_replacement(range(1, faces + 1), dice_count):
+            weight = factorial(dice_count)
+            for _, repeats in groupby(values):
+                weight //= factorial(len(list(repeats)))
+            multisets.append((values, weight))
+        multisets = tuple(multisets)
+        _weighted_multisets[key] = multisets
+    return multisets
+
+
+def get_pair_sums(values):
+    """
+    :param values: die values, eg (1, 2, 2, 5)
+    :return: the sum of every two dice, eg (3, 3, 6, 4, 7, 7)
+    """
+    return tuple(a + b for a, b in combinations(values, 2))
+
+
+# The bit for each column in a column bitmask, indexed by the column number.
+COLUMN_BITS = tuple(1 << (column - Settings.MIN_COLUMN) if column >= Settings.MIN_COLUMN else 0
+                    for column in range(0, Settings.MAX_COLUMN + 1))
+
+# The bitmask with every column set.
+ALL_COLUMNS_MASK = (1 << Settings.COLUMN_COUNT) - 1
+
+
+def columns_to_mask(columns):
+    mask = 0
+    for column in columns:
+        mask |= COLUMN_BITS[column]
+    return mask
+
+
+def mask_to_columns(mask):
+    return [column for column in Settings.COLUMN_RANGE if mask & COLUMN_BITS[column]]
+
+
+def _build_roll_masks():
+    """
+    :return: array of the bitmask of the pair-sums of each roll
+    """
+    return array("H", [columns_to_mask(get_pair_sums(values)) for values in ROLL_VALUES])
+
+
+def _build_hit_counts():
+    """
+    A roll hits a set of columns if any of its six pair-sums is one of those
+    columns.  So first reduce each roll to the bitmask of its pair-sums.
+
+    Then count the rolls that miss every column of each of the 2^11 column
+    sets.  A roll misses a set if its mask fits inside the complement of the
+    set, so this is a sum over subsets.
+
+    :return: array of the number of rolls that hit each column set
+    """
+    # The masks only depend on the die values so count each multiset once.
+    fits_inside = [0] * (ALL_COLUMNS_MASK + 1)
+    for values, weight in get_weighted_multisets():
+        fits_inside[columns_to_mask(get_pair_sums(values))] += weight
+    for bit in range(0, Settings.COLUMN_COUNT):
+        for mask in range(0, ALL_COLUMNS_MASK + 1):
+            if mask & (1 << bit):
+                fits_inside[mask] += fits_inside[mask ^ (1 << bit)]
+
+    return array("H", [ROLL_COUNT - fits_inside[ALL_COLUMNS_MASK ^ mask]
+                       for mask in range(0, ALL_COLUMNS_MASK + 1)])
+
+
+# The pair-sum bitmask of each roll and the number of rolls that hit each
+# column set.  Both are read-only.
+ROLL_MASKS = memoryview(_build_roll_masks()).toreadonly()
+HIT_COUNTS = memoryview(_build_hit_counts()).toreadonly()
+
+
+def hit_odds(columns, blocked_columns=()):
+    """
+    The odds that the next attempt hits at least one of the columns.  Won
+    columns can't be hit so pass them in blocked_columns.
+
+    Any set of columns, from a single to all of them, is one lookup.
+
+    :param columns: eg (6, 7, 8)
+    :param blocked_columns: eg [7]
+    :return: 1.0 is 100%
+    """
+    mask = columns_to_mask(columns) & ~columns_to_mask(blocked_columns)
+    return HIT_COUNTS[mask] / ROLL_COUNT
+
+
+# Built the first time it's asked for.  See get_triple_hit_odds().
+_triple_hit_odds = None
+
+
+def get_triple_hit_odds():
+    """
+    The odds of the next attempt hitting at least one of three sums, for
+    every three sums at once.  Look up sums a, b and c with
+    [a - MIN_COLUMN][b - MIN_COLUMN][c - MIN_COLUMN].
+
+    Three sums are a column set so each entry is HIT_COUNTS at the union of
+    their bits.  With numpy, the whole tensor is one gather over HIT_COUNTS
+    and it's a read-only array.  Without numpy, it's nested tuples.
+
+    :return: 11x11x11 of floats, 1.0 is 100%
+    """
+    global _triple_hit_odds
+    if _triple_hit_odds is None:
+        bits = [COLUMN_BITS[column] for column in Settings.COLUMN_RANGE]
+        if numpy is not None:
+            bits = numpy.array(bits)
+            triple_masks = bits[:, None, None] | bits[None, :, None] | bits[None, None, :]
+            tensor = numpy.array(HIT_COUNTS)[triple_masks] / ROLL_COUNT
+            tensor.flags.writeable = False
+        else:
+            tensor = tuple(tuple(tuple(HIT_COUNTS[a | b | c] / ROLL_COUNT for c in bits)
+                                 for b in bits)
+                           for a in bits)
+        _triple_hit_odds = tensor
+    return _triple_hit_odds
+
+
+def derive_seed(seed, *keys):
+    """
+    Make an independent seed for a substream, eg one per game or per worker.
+    The same seed and keys always give the same result.
+
+    :param seed: int
+    :param keys: anything with a stable str(), eg the game number
+    :return: 64 bit int
+    """
+    text = ":".join(str(part) for part in (seed,) + keys)
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+class RollSource(object):
+    """
+    Where the rolls come from.  Every roll is an index in [0, ROLL_COUNT).
+
+    Give it a seed to make a game replay exactly.  Without one, a seed is
+    drawn from the OS so it can still be read back from self.seed.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = SystemRandom().getrandbits(63)
+        self.seed = seed
+        self.rng = Random(seed)
+        self._random = self.rng.random
+
+    def next_roll(self):
+        # This is what randrange() boils down to but without its checks.
+        return int(self._random() * ROLL_COUNT)
+
+    def shuffle(self, items):
+        self.rng.shuffle(items)
+
+    def spawn(self, *keys):
+        """
+        :return: a new source of the same kind with an independent stream
+        """
+        return self.__class__(derive_seed(self.seed, *keys))
+
+
+class BulkRollSource(RollSource):
+    """
+    Draw the rolls in blocks with a NumPy Generator and hand them out one by
+    one.  There is no RNG call per roll.
+
+    A game only takes a couple hundred rolls, so the blocks start small and
+    double up to block_size.  A source spawned for each game doesn't draw
+    thousands of rolls it never uses.  The rolls are the same as drawing
+    block_size at a time.
+    """
+
+    def __init__(self, seed=None, block_size=4096, first_block_size=64):
+        if numpy is None:
+            raise ImportError("BulkRollSource needs numpy.")
+        super().__init__(seed)
+        self.block_size = block_size
+        self.first_block_size = min(first_block_size, block_size)
+        self.generator = numpy.random.default_rng(derive_seed(self.seed, "bulk"))
+        self.next_roll = self._draw_blocks().__next__
+
+    def _draw_blocks(self):
+        size = self.first_block_size
+        while True:
+            yield from self.generator.integers(0, ROLL_COUNT, size=size).tolist()
+            size = min(2 * size, self.block_size)
+
+    def spawn(self, *keys):
+        return self.__class__(derive_seed(self.seed, *keys), self.block_size, self.first_block_size)
+
+
+# rolls: how many rolls were seen
+# chi_square: of the roll index counts against the uniform odds of each roll
+# degrees: degrees of freedom of chi_square
+# p_value: the odds of a chi_square at least this big from fair dice
+# worst_sum: the pair-sum whose hit count is furthest from the exact odds
+# worst_sum_z: how many standard errors that pair-sum is off
+# serial_correlation: of each roll index with the next one, about 0 for fair dice
+# serial_z: serial_correlation in standard errors
+AuditReport = namedtuple("AuditReport", ["rolls", "chi_square", "degrees", "p_value", "worst_sum",
+                                         "worst_sum_z", "serial_correlation", "serial_z"])
+
+# The column indices of the pair-sums of each roll, see get_roll_hits().
+_roll_hits = None
+
+
+def get_roll_hits():
+    """
+    :return: tuple where [roll index] is the tuple of the column indices
+    that the roll has a pair-sum for
+    """
+    global _roll_hits
+    if _roll_hits is None:
+        _roll_hits = tuple(tuple(column - Settings.MIN_COLUMN for column in mask_to_columns(mask))
+                           for mask in ROLL_MASKS)
+    return _roll_hits
+
+
+class RollAudit(object):
+    """
+    Watch a stream of rolls and check it against the exact odds.
+
+    Each roll bumps its counter and the counters of its pair-sums in fixed
+    arrays, and the running sums for the serial correlation.  Nothing is
+    allocated per roll.  Hand it to Dice, or to Game, to audit every roll of
+    a simulation.
+
+    A statistic that can't be worked out, eg the serial correlation of a
+    stream that only ever rolls one thing, is reported as NaN.
+    """
+
+    def __init__(self, report_every=1000000, reporter=None):
+        """
+        :param report_every: make a report after every this many rolls.  0 to
+        only report when asked.
+        :param reporter: function that is given each AuditReport.  By default,
+        it's logged at INFO.
+        """
+        self.counts = array("Q", bytes(8 * ROLL_COUNT))
+        self.hits = array("Q", bytes(8 * Settings.COLUMN_COUNT))  # Rolls with each pair-sum by column index.
+        self.roll_hits = get_roll_hits()
+        self.rolls = 0
+        self.previous = 0
+        self.total = 0  # Sum of the roll indices.
+        self.total_of_squares = 0  # Sum of the squares of the roll indices.
+        self.sum_of_products = 0  # Sum of each roll index times the one before it.
+        self.report_every = report_every
+        self.next_report = report_every
+        self.reporter = reporter or self.log_report
+
+    def observe(self, roll_index):
+        self.counts[roll_index] += 1
+        for index in self.roll_hits[roll_index]:
+            self.hits[index] += 1
+        self.total += roll_index
+        self.total_of_squares += roll_index * roll_index
+        self.sum_of_products += self.previous * roll_index
+        self.previous = roll_index
+        self.rolls += 1
+        if self.rolls == self.next_report:
+            self.next_report += self.report_every
+            self.reporter(self.get_report())
+
+    @staticmethod
+    def log_report(report):
+        logging.info("Audit of {} rolls: chi-square {:.1f} on {} degrees, p = {:.3f}; pair-sum {} is "
+                     "{:+.2f} standard errors off; serial correlation {:+.5f} ({:+.2f} standard errors)"
+                     .format(report.rolls, report.chi_square, report.degrees, report.p_value, report.worst_sum,
+                             report.worst_sum_z, report.serial_correlation, report.serial_z))
+
+    def get_report(self):
+        """
+        :return: AuditReport
+        """
+        rolls = self.rolls
+        if rolls < 2:
+            return AuditReport(rolls, 0.0, ROLL_COUNT - 1, 1.0, None, 0.0, 0.0, 0.0)
+
+        # Every roll index is equally likely.
+        expected = rolls / ROLL_COUNT
+        chi_square = sum((count - expected) ** 2 for count in self.counts) / expected
+        degrees = ROLL_COUNT - 1
+
+        # The Wilson-Hilferty approximation of the chi-square tail.
+        spread = 2 / (9 * degrees)
+        z = ((chi_square / degrees) ** (1 / 3) - (1 - spread)) / sqrt(spread)
+        p_value = erfc(z / sqrt(2)) / 2
+
+        worst_sum = None
+        worst_sum_z = 0.0
+        for column, (mean, variance) in get_exact_statistic(_count_hits).items():
+            sum_z = (self.hits[column - Settings.MIN_COLUMN] / rolls - mean) / sqrt(variance / rolls)
+            if worst_sum is None or abs(sum_z) > abs(worst_sum_z):
+                worst_sum = column
+                worst_sum_z = sum_z
+
+        # The lag-1 autocorrelation of the roll indices.  The stream starts
+        # from a previous index of 0, which adds nothing to the sum.
+        mean = self.total / rolls
+        variance = self.total_of_squares / rolls - mean * mean
+        if variance > 0:
+            serial_correlation = (self.sum_of_products / (rolls - 1) - mean * mean) / variance
+        else:
+            serial_correlation = nan
+        serial_z = serial_correlation * sqrt(rolls)
+
+        return AuditReport(rolls, chi_square, degrees, p_value, worst_sum, worst_sum_z,
+                           serial_correlation, serial_z)
 
 
 class Dice(object):
     """
     A set of dice.
+
+    The roll is kept as a single index into the roll tables so that rolling
+    is one call to the roll source and get_sums() is a lookup.
     """
 
-    def __init__(self):
-        self._dice = []
-        self.count = 4
-        for i in range(0, self.count):
-            self._dice.append(Die())
-        self.values = []
+    def __init__(self, source=None, audit=None):
+        """
+        :param source: a RollSource.  By default, one with a random seed.
+        :param audit: a RollAudit to show every roll to
+        """
+        if source is None:
+            source = RollSource()
+        self.source = source
+        self.audit = audit
+        self.count = DICE_COUNT
+        self.roll_index = 0
         self.roll()
 
+    @property
+    def values(self):
+        return list(ROLL_VALUES[self.roll_index])
+
     def roll(self):
-        self.values = []
-        for d in self._dice:
-            d.roll()
-            self.values.append(d.value)
+        self.roll_index = self.source.next_roll()
+        if self.audit is not None:
+            self.audit.observe(self.roll_index)
 
     def get_sums(self):
         """
-        This returns three tuples where each value has the sum of two distinct
-        pairs of dice.
+        This returns up to three tuples where each value has the sum of two
+        distinct pairs of dice.  The tuple is shared so don't modify it.
 
-        :return: eg [(5, 10), (6, 9), (7, 8)]
+        :return: eg ((5, 10), (6, 9), (7, 8))
         """
-        pair_of_sums1 = tuple(sorted([self._dice[0].value + self._dice[1].value,
-                                      self._dice[2].value + self._dice[3].value]))
-        pair_of_sums2 = tuple(sorted([self._dice[0].value + self._dice[2].value,
-                                      self._dice[1].value + self._dice[3].value]))
-        pair_of_sums3 = tuple(sorted([self._dice[0].value + self._dice[3].value,
-                                      self._dice[1].value + self._dice[2].value]))
-
-        # It's possible that there are duplicate tuples.  For example,
-        # the dice rolls are 1, 2, 2, 5].  This results in these possible
-        # pairs: [(3, 7), (4, 6), (3, 7)].  So unique the list.
-        return list({pair_of_sums1, pair_of_sums2, pair_of_sums3})
+        return ROLL_SUMS[self.roll_index]
 
 
 class Triplet(object):
@@ -128,94 +503,113 @@ class Triplet(object):
             return odds
 
 
+# Built the first time a RollSet needs them.  See _get_rollset_tables().
+_rollset_tables = None
+
+# dict: available column mask->tuple of the pair-sums of each roll that are in those columns
+_limited_sum_combinations = {}
+
+
+def _get_rollset_tables():
+    """
+    The RollSet views of the rolls are built once per process and then shared
+    by every RollSet.  They are tuples and a read-only dict so nobody can
+    change them under the other RollSets.
+
+    :return: (tuple of the six pair-sums of each roll, read-only dict:
+    pair_sum->number of rolls with that pair-sum, total of those counts,
+    tuple of the sorted die values of each distinct roll)
+    """
+    global _rollset_tables
+    if _rollset_tables is None:
+        sum_combinations = tuple((a + b, a + c, a + d, b + c, b + d, c + d)
+                                 for (a, b, c, d) in ROLL_VALUES)
+
+        # Count each roll once per distinct pair-sum it has.
+        multisets = get_weighted_multisets()
+        possibilities = dict.fromkeys(Settings.COLUMN_RANGE, 0)
+        for values, weight in multisets:
+            for column in set(get_pair_sums(values)):
+                possibilities[column] += weight
+
+        sorted_combinations = tuple(values for values, _ in multisets)
+
+        _rollset_tables = (sum_combinations, MappingProxyType(possibilities),
+                           sum(possibilities.values()), sorted_combinations)
+    return _rollset_tables
+
+
+def _get_limited_sum_combinations(available_mask):
+    """
+    :param available_mask: bitmask of the columns that can still be played
+    :return: tuple of the pair-sums of each roll that are in those columns
+    """
+    limited = _limited_sum_combinations.get(available_mask)
+    if limited is None:
+        sum_combinations = _get_rollset_tables()[0]
+        if available_mask == ALL_COLUMNS_MASK:
+            limited = sum_combinations
+        else:
+            limited = tuple(tuple(pair_sum for pair_sum in pair_sums if available_mask & COLUMN_BITS[pair_sum])
+                            for pair_sums in sum_combinations)
+        _limited_sum_combinations[available_mask] = limited
+    return limited
+
+
 class RollSet(object):
     """
     All the possible ways to sum four dice.
+
+    The tables are shared by every RollSet so making one is free.  Don't
+    modify them.
     """
 
     def __init__(self):
-        self.possibilities = defaultdict(int)
+        self.possibilities = MappingProxyType({})
         self.possibilities_ctr = 0
-        # List of unsorted tuples, eg (1, 1, 5, 6).
-        self.roll_combinations = []
-        self.roll_combinations_length = 6 * 6 * 6 * 6
-        self.roll_sorted_combinations = []
-        # List of unsorted tuples, eg (2, 6, 7, 6, 7, 11)
-        self.sum_combinations = []
+        # Tuple of unsorted tuples, eg (1, 1, 5, 6).
+        self.roll_combinations = ()
+        self.roll_combinations_length = ROLL_COUNT
+        self.roll_sorted_combinations = ()
+        # Tuple of (sorted tuple, number of rolls that sort to it), eg ((1, 1, 5, 6), 12)
+        self.roll_weighted_combinations = ()
+        # Tuple of unsorted tuples, eg (2, 6, 7, 6, 7, 11)
+        self.sum_combinations = ()
+        self.available_mask = ALL_COLUMNS_MASK
         self.compute_combinations()
 
     def reset(self):
-        self.roll_combinations = []
-        self.possibilities = defaultdict(int)
+        self.roll_combinations = ()
+        self.possibilities = MappingProxyType({})
         self.possibilities_ctr = 0
-        self.sum_combinations = []
-        self.roll_sorted_combinations = []
+        self.sum_combinations = ()
+        self.roll_sorted_combinations = ()
+        self.roll_weighted_combinations = ()
+        self.available_mask = ALL_COLUMNS_MASK
 
     def compute_combinations(self):
-        self.reset()
-        for a in range(1, 7):
-            for b in range(1, 7):
-                for c in range(1, 7):
-                    for d in range(1, 7):
-                        self.roll_combinations.append((a, b, c, d))
-                        total = defaultdict(int)
-                        total[a + b] = 1
-                        total[a + c] = 1
-                        total[a + d] = 1
-                        total[b + c] = 1
-                        total[b + d] = 1
-                        total[c + d] = 1
-                        for t in total:
-                            self.possibilities[t] += 1
-                            self.possibilities_ctr += 1
-
-                        self.sum_combinations.append((a + b, a + c, a + d, b + c, b + d, c + d))
-
-        for a in range(1, 7):
-            for b in range(a, 7):
-                for c in range(b, 7):
-                    for d in range(c, 7):
-                        self.roll_sorted_combinations.append((a, b, c, d))
+        self.compute_limited_combinations()
 
     def compute_limited_combinations(self, available_columns=Settings.COLUMN_RANGE):
         """
-        Keep this separate from compute_combinations() until it's clear what is needed.
-
         Compute the combinations when a one or more columns have been won, ie are
         unavailable.
 
+        Only sum_combinations depends on the available columns.  The pair-sums
+        in won columns are masked out of it and the result is kept for the
+        next RollSet with the same columns.
+
+        :param available_columns: the columns that can still be played
         :return:
         """
-        self.reset()
-        for a in range(1, 7):
-            for b in range(1, 7):
-                for c in range(1, 7):
-                    for d in range(1, 7):
-                        self.roll_combinations.append((a, b, c, d))
-                        total = defaultdict(int)
-                        total[a + b] = 1
-                        total[a + c] = 1
-                        total[a + d] = 1
-                        total[b + c] = 1
-                        total[b + d] = 1
-                        total[c + d] = 1
-                        for t in total:
-                            self.possibilities[t] += 1
-                            self.possibilities_ctr += 1
-
-                        good_pairs = []
-                        for pair_sum in [a + b, a + c, a + d, b + c, b + d, c + d]:
-                            if pair_sum in available_columns:
-                                good_pairs.append(pair_sum)
-
-                        self.sum_combinations.append(tuple(good_pairs))
-        print("There are {} combinations of pair-sums.".format(len(self.sum_combinations)))
-
-        for a in range(1, 7):
-            for b in range(a, 7):
-                for c in range(b, 7):
-                    for d in range(c, 7):
-                        self.roll_sorted_combinations.append((a, b, c, d))
+        sum_combinations, possibilities, possibilities_ctr, sorted_combinations = _get_rollset_tables()
+        self.roll_combinations = ROLL_VALUES
+        self.possibilities = possibilities
+        self.possibilities_ctr = possibilities_ctr
+        self.roll_sorted_combinations = sorted_combinations
+        self.roll_weighted_combinations = get_weighted_multisets()
+        self.available_mask = columns_to_mask(available_columns)
+        self.sum_combinations = _get_limited_sum_combinations(self.available_mask)
 
 
 class ScoreRule28(object):
@@ -242,51 +636,48 @@ class ScoreRule28(object):
 class TripleValueOdds(object):
     """
     Start with two sums, what are the odds of rolling a match with a given third sum?
+
+    The odds are looked up in get_triple_hit_odds() so there's no enumeration here.
     """
 
     def __init__(self, sum1, sum2):
         self.sums = [sum1, sum2]
 
     def find_odds(self, sum3):
-        three_sums = [self.sums[0], self.sums[1], sum3]
-
-        possibilities = 0
-        hits = 0
-        for d1 in range(1, 7):
-            for d2 in range(1, 7):
-                for d3 in range(1, 7):
-                    for d4 in range(1, 7):
-                        possibilities += 1
-                        if d1 + d2 in three_sums:
-                            hits += 1
-                            continue
-                        if d1 + d3 in three_sums:
-                            hits += 1
-                            continue
-                        if d1 + d4 in three_sums:
-                            hits += 1
-                            continue
-                        if d2 + d3 in three_sums:
-                            hits += 1
-                            continue
-                        if d2 + d4 in three_sums:
-                            hits += 1
-                            continue
-                        if d3 + d4 in three_sums:
-                            hits += 1
-                            continue
-
-        return hits / possibilities
+        """
+        :param sum3: the third sum
+        :return: the odds of hitting at least one of the three sums, 1.0 is 100%
+        """
+        odds = get_triple_hit_odds()
+        return float(odds[self.sums[0] - Settings.MIN_COLUMN][self.sums[1] - Settings.MIN_COLUMN]
+                     [sum3 - Settings.MIN_COLUMN])
+
+    def find_best_third_sum(self):
+        """
+        Ties go to the sum closest to 7.
+
+        :return: (third sum, odds) of the third sum that best improves the odds
+        """
+        best = None
+        for third_sum in sorted(Settings.COLUMN_RANGE, key=lambda column: abs(7 - column)):
+            if third_sum in self.sums:
+                continue
+            odds = self.find_odds(third_sum)
+            if best is None or odds > best[1]:
+                best = (third_sum, odds)
+        return best
 
 
 class HitPredictor(object):
     """
     Accept a triplet of pair-sums and return the percentage odds that the next attempt
     will hit.
+
+    The odds come from HIT_COUNTS so making one of these is free.
     """
     def __init__(self):
-        self.rollset = RollSet()
         self.available_cols = Settings.COLUMN_RANGE
+        self.available_mask = ALL_COLUMNS_MASK
 
     def update_columns(self, available_columns):
         """
@@ -296,66 +687,113 @@ class HitPredictor(object):
         :return:
         """
         self.available_cols = available_columns
-        self.rollset.compute_limited_combinations(self.available_cols)
+        self.available_mask = columns_to_mask(available_columns)
 
     def compute_next_attempt_odds(self, trips):
-        hit_ctr = 0
-        miss_ctr = 0
-        tripset = set(trips)
-        for roll in self.rollset.sum_combinations:
-            if tripset.intersection(set(roll)):
-                hit_ctr += 1
-                # print("{} hits".format(roll))
-            else:
-                miss_ctr += 1
-                # print("{} misses".format(roll))
+        hit_ctr = HIT_COUNTS[columns_to_mask(trips) & self.available_mask]
+        next_attempt_odds = 100 * hit_ctr / ROLL_COUNT
+        return next_attempt_odds
 
-        # print("length = {}".format(len(self.rollset.sum_combinations)))
-        # print("hit_ctr = {}".format(hit_ctr))
-        # print("miss_ctr = {}".format(miss_ctr))
 
-        next_attempt_odds = 100 * hit_ctr / len(self.rollset.sum_combinations)
-        return next_attempt_odds
+def get_pair_tuples(values):
+    """
+    :param values: four die values, eg (1, 2, 2, 5)
+    :return: the sorted pair of sums of each way to split the dice in two,
+    eg [(3, 7), (3, 7), (4, 6)]
+    """
+    a, b, c, d = values
+    return [tuple(sorted([a + b, c + d])), tuple(sorted([a + c, b + d])), tuple(sorted([a + d, b + c]))]
 
 
-def roll_the_dice(iterations):
-    odds = {}
-    dice = [Die(), Die(), Die(), Die()]
+def _count_pair_tuples(values):
+    counts = defaultdict(int)
+    for pair_tuple in get_pair_tuples(values):
+        counts[pair_tuple] += 1
+    return counts
 
-    for i in range(0, iterations):
-        for d in dice:
-            d.roll()
 
-        pair_of_sums_1 = tuple(sorted([dice[0].value + dice[1].value, dice[2].value + dice[3].value]))
-        pair_of_sums_2 = tuple(sorted([dice[0].value + dice[2].value, dice[1].value + dice[3].value]))
-        pair_of_sums_3 = tuple(sorted([dice[0].value + dice[3].value, dice[1].value + dice[2].value]))
-        for t in pair_of_sums_1, pair_of_sums_2, pair_of_sums_3:
-            if t in odds:
-                odds[t] += 1
-            else:
-                odds[t] = 1
+def _count_pair_sums(values):
+    counts = defaultdict(int)
+    for pair_sum in get_pair_sums(values):
+        counts[pair_sum] += 1
+    return counts
+
 
-    return odds
+def _count_hits(values):
+    return dict.fromkeys(get_pair_sums(values), 1)
 
 
-def roll_the_dice_2(iterations):
-    odds = {}
-    for i in range(2, 13):
-        odds[i] = 0
-    dice = [Die(), Die(), Die(), Die()]
+# (title, function of the die values that counts each label in that roll)
+ROLL_STATISTICS = (
+    ("The odds of each tuple, ie each way to split the dice:", _count_pair_tuples),
+    ("The odds of hitting each sum of two dice, counting all six pairs:", _count_pair_sums),
+    ("The odds of rolling four dice and getting at least one of this sum:", _count_hits),
+)
 
-    for i in range(0, iterations):
-        for d in dice:
-            d.roll()
 
-        odds[dice[0].value + dice[1].value] += 1
-        odds[dice[0].value + dice[2].value] += 1
-        odds[dice[0].value + dice[3].value] += 1
-        odds[dice[1].value + dice[2].value] += 1
-        odds[dice[1].value + dice[3].value] += 1
-        odds[dice[2].value + dice[3].value] += 1
+def get_exact_statistic(count_labels):
+    """
+    Average a per-roll count over every roll.  The multisets stand in for the
+    rolls so this only looks at 126 of them.
 
-    return odds
+    :param count_labels: function of the die values that returns dict: label->count in that roll
+    :return: dict: label->(mean count per roll, variance of the count per roll)
+    """
+    totals = defaultdict(int)
+    squares = defaultdict(int)
+    for values, weight in get_weighted_multisets():
+        for label, count in count_labels(values).items():
+            totals[label] += weight * count
+            squares[label] += weight * count * count
+
+    moments = {}
+    for label in sorted(totals):
+        mean = totals[label] / ROLL_COUNT
+        moments[label] = (mean, squares[label] / ROLL_COUNT - mean * mean)
+    return moments
+
+
+def sample_roll_counts(rolls, seed=None, block_size=1 << 20, source=None):
+    """
+    Count how many times each roll index comes up.  By default, the rolls
+    are drawn with a NumPy Generator a block at a time.  Pass a RollSource
+    to check that source instead.
+
+    :param rolls: how many rolls to draw
+    :param source: eg RollSource(seed), the source that Game uses
+    :return: list of the count of each roll index
+    """
+    if source is not None:
+        counts = [0] * ROLL_COUNT
+        next_roll = source.next_roll
+        for _ in range(0, rolls):
+            counts[next_roll()] += 1
+        return counts
+
+    if numpy is None:
+        raise ImportError("The Monte Carlo needs numpy.")
+    generator = numpy.random.default_rng(seed)
+    counts = numpy.zeros(ROLL_COUNT, dtype=numpy.int64)
+    while rolls > 0:
+        size = min(rolls, block_size)
+        counts += numpy.bincount(generator.integers(0, ROLL_COUNT, size=size), minlength=ROLL_COUNT)
+        rolls -= size
+    return counts.tolist()
+
+
+def get_sampled_statistic(count_labels, roll_counts):
+    """
+    :param count_labels: see get_exact_statistic()
+    :param roll_counts: the count of each roll index, eg from sample_roll_counts()
+    :return: dict: label->mean count per sampled roll
+    """
+    totals = defaultdict(int)
+    for roll_index, roll_count in enumerate(roll_counts):
+        if roll_count:
+            for label, count in count_labels(ROLL_VALUES[roll_index]).items():
+                totals[label] += roll_count * count
+    rolls = sum(roll_counts)
+    return {label: total / rolls for label, total in totals.items()}
 
 
 def perc(numerator, denominator, no_decimal=False):
@@ -380,47 +818,55 @@ def get_column_triplets():
 
 def main():
     description = '''
-Just go.
+Print the exact odds from the enumeration of every roll.  With --iterations, also
+sample that many rolls with numpy and show how far the samples are from the
+exact odds.
 '''
     epilog = '''
 Examples:
 ./odds.py
+./odds.py --iterations 10000000 --seed 42
+./odds.py --iterations 1000000 --source game
 '''
     parser = argparse.ArgumentParser(description=description, epilog=epilog)
-    parser.add_argument("--iterations", help="How exact do you want to be?",
-                        type=int, default=10000)
+    parser.add_argument("--iterations", help="How many rolls to sample.  0 to only print the exact odds.",
+                        type=int, default=0)
+    parser.add_argument("--seed", help="Seed for the sampled rolls.", type=int, default=None)
+    parser.add_argument("--source", help="Sample with numpy or with the RollSource that Game uses.",
+                        choices=["numpy", "game"], default="numpy")
     args = parser.parse_args()
 
-    # First method
-    print("\nThe odds of each tuple:")
-    odds = roll_the_dice(args.iterations)
-    for o in sorted(odds):
-        print("{}, {}, {}".format(o[0], o[1], perc(odds[o], args.iterations)))
-
-    print("Another way to see this is to count the elements of the tuples:")
-    elements = defaultdict(int)
-    roll_ctr = 0
-    for (a, b) in odds:
-        elements[a] += odds[(a, b)]
-        elements[b] += odds[(a, b)]
-        roll_ctr += odds[(a, b)]
-    for total in sorted(elements):
-        print("{}, {}, {}".format(total, elements[total], perc(elements[total], args.iterations)))
-
-    # Second method.
-    print("\nThe odds of hitting each sum of two dice:")
-    odds = roll_the_dice_2(args.iterations)
-    for o in odds:
-        print("{:>2}, {}, {}".format(o, odds[o], perc(odds[o], args.iterations)))
-
-    # Third method
-    print("\nThis is theoretical and not empirical.")
-    print("This counts four bullets as rolling 2 exactly once.")
-    print("The odds rolling four dice and getting at this sum:")
-    rs = RollSet()
-    for total in sorted(rs.possibilities):
-        print("{}, {}, {}".format(total, rs.possibilities[total],
-                                  perc(rs.possibilities[total], rs.roll_combinations_length)))
+    roll_counts = None
+    if args.iterations:
+        source = None
+        if args.source == "game":
+            source = RollSource(args.seed)
+        start = time.perf_counter()
+        roll_counts = sample_roll_counts(args.iterations, args.seed, source=source)
+        elapsed = time.perf_counter() - start
+        print("Sampled {} rolls in {:.2f}s, {:.1f} million rolls per second."
+              .format(args.iterations, elapsed, args.iterations / elapsed / 1000000))
+
+    worst_z = 0
+    for title, count_labels in ROLL_STATISTICS:
+        print("\n" + title)
+        exact = get_exact_statistic(count_labels)
+        sampled = None
+        if roll_counts:
+            sampled = get_sampled_statistic(count_labels, roll_counts)
+
+        for label, (mean, variance) in exact.items():
+            line = "{:>8}, {:>4}, {:>6}".format(str(label), round(mean * ROLL_COUNT), perc(mean, 1))
+            if sampled is not None:
+                # How many standard errors the sample is from the exact odds.
+                observed = sampled.get(label, 0)
+                z = (observed - mean) / (variance / args.iterations) ** 0.5
+                worst_z = max(worst_z, abs(z))
+                line += ", sampled {:>6}, z = {:+.2f}".format(perc(observed, 1), z)
+            print(line)
+
+    if roll_counts:
+        print("\nThe worst sample is {:.2f} standard errors from the exact odds.".format(worst_z))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+"""
+Depth limited expectimax over the current turn, under a depth limit and
+optionally a time budget.
+
+The turn alternates between chance nodes, ie the roll, and decision nodes,
+ie which choice to take and then whether to stop.  The 1296 rolls are
+grouped by the choices they offer, so a chance node only has one branch
+per distinct set of choices.  See solver.get_outcomes().
+
+The depth is the number of rolls to look ahead.  At the horizon, a node is
+scored like ScoringBot would play it: if rule 28 says stop, it's the P2
+gain of the temp progress, otherwise one more roll is looked at and then
+the turn stops.  The search deepens one roll at a time until it reaches
+the depth limit or the budget runs out, and the last depth that finished is
+used.  Once no node reaches the horizon, the answer is exact and the search
+stops early.  Without a time budget, the answer only depends on the
+position, so seeded games play the same every time.
+
+This should not import any other module in /lib except all_the_things, odds, solver and settings.
+"""
+
+import logging
+import math
+import time
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.odds import ALL_COLUMNS_MASK, ROLL_COUNT
+from cantstop.lib.settings import Settings
+from cantstop.lib.solver import TurnSolver, get_outcomes
+
+# Looking further ahead than this never pays off.
+MAX_SEARCH_DEPTH = 32
+
+
+class OutOfTime(Exception):
+    """
+    The budget ran out in the middle of a depth.
+    """
+
+
+class ExpectimaxSearch(TurnSolver):
+    """
+    Search the current turn for one player.  The temp progress is kept like
+    TurnSolver keeps it.
+    """
+
+    def __init__(self, ranks, open_mask=ALL_COLUMNS_MASK, budget=0.01, utility=None, max_depth=MAX_SEARCH_DEPTH):
+        """
+        :param ranks: the player's committed rank by column index
+        :param open_mask: bitmask of the columns nobody has won
+        :param budget: seconds to search for each decision or None for no
+        time limit
+        :param utility: function of the temp items, see TurnSolver
+        :param max_depth: the most rolls to look ahead
+        """
+        super().__init__(ranks, open_mask, utility)
+        self.budget = budget
+        self.max_depth = max_depth
+        self.deadline = None
+        self.reached_horizon = False
+        self.values = {}  # (temp, depth) -> value
+        self.inexact = set()  # The (temp, depth) whose values saw the horizon.
+        self.leaf_values = {}  # temp -> value
+
+    @classmethod
+    def from_state(cls, state, name, budget=0.01, utility=None, max_depth=MAX_SEARCH_DEPTH):
+        solver = TurnSolver.from_state(state, name)
+        return cls(solver.ranks, solver.open_mask, budget, utility, max_depth)
+
+    def get_one_roll_value(self, temp):
+        """
+        :return: the expected utility of rolling once more and then stopping
+        """
+        temp_mask, blocked_mask = self.get_masks(temp)
+        bust_value = self.utility(())
+        total = 0
+        for count, choices in get_outcomes(Settings.MARKER_COUNT - len(temp), temp_mask, blocked_mask):
+            best = bust_value
+            for i, choice in enumerate(choices):
+                value = self.utility(self.get_temp_items(self.apply_choice(temp, choice)))
+                if i == 0 or value > best:
+                    best = value
+            total += count * best
+        return total / ROLL_COUNT
+
+    def get_leaf_value(self, temp):
+        """
+        :return: the value of a node at the horizon
+        """
+        value = self.leaf_values.get(temp)
+        if value is None:
+            if temp and State.score_rule28(dict(temp)) >= 28:
+                value = self.utility(self.get_temp_items(temp))
+            elif temp:
+                value = max(self.utility(self.get_temp_items(temp)), self.get_one_roll_value(temp))
+            else:
+                value = self.get_one_roll_value(temp)
+            self.leaf_values[temp] = value
+        return value
+
+    def search_value(self, temp, depth):
+        """
+        :param temp: the temp progress after a choice, or () before the first roll
+        :param depth: how many more rolls to look ahead
+        :return: the expected utility of the better of stopping and rolling
+        """
+        key = (temp, depth)
+        value = self.values.get(key)
+        if value is not None:
+            if key in self.inexact:
+                self.reached_horizon = True
+            return value
+        if time.perf_counter() > self.deadline:
+            raise OutOfTime()
+
+        # Remember which values saw the horizon so that a value found in
+        # self.values does too.
+        reached_horizon = self.reached_horizon
+        self.reached_horizon = False
+        temp_mask, blocked_mask = self.get_masks(temp)
+        if temp_mask & ~blocked_mask == 0 and len(temp) >= Settings.MARKER_COUNT:
+            # Every temp column is maxed so there is nothing to roll for.
+            value = self.utility(self.get_temp_items(temp))
+        elif depth == 0:
+            self.reached_horizon = True
+            value = self.get_leaf_value(temp)
+        elif temp:
+            value = max(self.utility(self.get_temp_items(temp)), self.search_go_value(temp, depth))
+        else:
+            # A turn can't stop before it starts.
+            value = self.search_go_value(temp, depth)
+        self.values[key] = value
+        if self.reached_horizon:
+            self.inexact.add(key)
+        self.reached_horizon = self.reached_horizon or reached_horizon
+        return value
+
+    def search_go_value(self, temp, depth):
+        """
+        :return: the expected utility of rolling again, looking depth rolls ahead
+        """
+        temp_mask, blocked_mask = self.get_masks(temp)
+        bust_value = self.utility(())
+        total = 0
+        for count, choices in get_outcomes(Settings.MARKER_COUNT - len(temp), temp_mask, blocked_mask):
+            best = bust_value
+            for i, choice in enumerate(choices):
+                value = self.search_value(self.apply_choice(temp, choice), depth - 1)
+                if i == 0 or value > best:
+                    best = value
+            total += count * best
+        return total / ROLL_COUNT
+
+    def deepen(self, search):
+        """
+        Run search(depth) for depth 1, 2, ... until the depth limit, the
+        budget runs out or the answer is exact.  The depth 0 answer is
+        always there.
+
+        :param search: function of the depth
+        :return: the answer of the last depth that finished
+        """
+        start = time.perf_counter()
+        self.deadline = math.inf
+        answer = search(0)
+        if self.budget is not None:
+            self.deadline = start + self.budget
+        depth = 0
+        for depth in range(1, self.max_depth + 1):
+            self.reached_horizon = False
+            try:
+                answer = search(depth)
+            except OutOfTime:
+                depth -= 1
+                break
+            if not self.reached_horizon:
+                break
+        if logging.root.level <= logging.DEBUG:
+            logging.debug("Search: depth {} -> {}".format(depth, answer))
+        return answer
+
+    def get_best_choice(self, temp_progress, choices):
+        """
+        :param choices: eg ((4, 11), (6, 9), (7,))
+        :return: the choice with the best expected utility
+        """
+        temp = self.get_temp(temp_progress)
+
+        def search(depth):
+            return max(choices, key=lambda choice: self.search_value(self.apply_choice(temp, choice), depth))
+        return self.deepen(search)
+
+    def should_continue(self, temp_progress):
+        temp = self.get_temp(temp_progress)
+        stop = self.utility(self.get_temp_items(temp))
+
+        def search(depth):
+            if depth == 0:
+                return self.get_leaf_value(temp) > stop
+            return self.search_go_value(temp, depth) > stop
+        return self.deepen(search)
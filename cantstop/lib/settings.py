@@ -1,4 +1,16 @@
+
+
 class Settings(object):
     MIN_COLUMN = 2
     MAX_COLUMN = 12
     COLUMN_RANGE = range(MIN_COLUMN, MAX_COLUMN+1)
+    COLUMN_COUNT = MAX_COLUMN - MIN_COLUMN + 1
+
+    # The number of ranks in each column, indexed by column - MIN_COLUMN.
+    COLUMN_LENGTHS = (3, 5, 7, 9, 11, 13, 11, 9, 7, 5, 3)
+
+    # Each turn, a player gets this many markers for temp progress.
+    MARKER_COUNT = 3
+
+    # The first player to win this many columns wins the game.
+    COLUMNS_TO_WIN = 3
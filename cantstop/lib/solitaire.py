@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+
+"""
+Solitaire Can't Stop: the fewest turns to win COLUMNS_TO_WIN columns when
+nobody else is playing.
+
+A board is just the committed rank of each column, and a column is won
+when it is at its top rank.  So the board is a mixed radix number with one
+digit per column, where the column of length L has L + 1 digits.  That
+index is the whole encoding and the table is a flat array of the expected
+number of turns left from each board.  Boards that have already won are 0.
+
+Every turn either busts, which leaves the board as it was, or commits
+some progress, which moves to a board with a higher rank sum.  So the
+boards are solved from the highest rank sum down, and the boards with the
+same rank sum don't depend on each other and can be split across
+processes.  Within a board, the expected turns E is the fixed point of
+
+    E = 1 + (expected turns left after the turn, if a bust costs E)
+
+The turn itself is solved by TurnSolver, with the turns left of each board
+as the utility.  The right side is piecewise linear in E with a slope of
+the bust odds, which is less than 1, so the secant method finds E in a few
+passes.
+
+The table lives next to the other cached tables.  Boards that aren't solved
+yet are NaN, so a solve that is stopped picks up where it left off.
+
+The column lengths and the columns to win are passed in rather than read
+from Settings, so a solve of a small variant doesn't change the rules of
+anything else in the process.  They default to the Settings.
+
+Solving the standard board isn't feasible.  It has about 7.4e9 boards and
+30GB of table, and a board of it takes about half a second to solve, so
+that's over a century of CPU time.  solve_table() refuses anything over
+MAX_SOLITAIRE_BOARDS.  Small variants, eg columns 1 to 3 long, solve in
+seconds to hours.
+
+This should not import any other module in /lib except odds, solver, tables and settings.
+"""
+
+import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from cantstop.lib.odds import ALL_COLUMNS_MASK
+from cantstop.lib.settings import Settings
+from cantstop.lib.solver import TurnSolver
+from cantstop.lib.tables import close_table, create_table, get_cache_path, get_rules_key, map_table
+
+# Bump this whenever the encoding or the meaning of the table changes.
+SOLITAIRE_VERSION = 1
+
+# Expected turns are stored as 32-bit floats.
+_TYPECODE = "f"
+
+# solve_table() won't start on a bigger table than this.
+MAX_SOLITAIRE_BOARDS = 1 << 24
+
+# The writable table and the column lengths of a solving process.
+_solving_values = None
+_solving_lengths = None
+
+# (lengths, columns to win) -> the solved table of this process, or None
+_tables = {}
+
+
+def get_strides(lengths):
+    """
+    :param lengths: the length of each column
+    :return: list of how far apart the boards one rank apart in each column are
+    """
+    strides = [1] * len(lengths)
+    for i in range(len(lengths) - 2, -1, -1):
+        strides[i] = strides[i + 1] * (lengths[i + 1] + 1)
+    return strides
+
+
+def get_board_count(lengths):
+    count = 1
+    for length in lengths:
+        count *= length + 1
+    return count
+
+
+def encode(ranks, strides):
+    """
+    :param ranks: the committed rank by column index
+    :return: the index of the board in the table
+    """
+    index = 0
+    for rank, stride in zip(ranks, strides):
+        index += rank * stride
+    return index
+
+
+def decode(index, lengths):
+    """
+    :return: tuple of the committed rank by column index
+    """
+    ranks = []
+    for length in reversed(lengths):
+        index, rank = divmod(index, length + 1)
+        ranks.append(rank)
+    return tuple(reversed(ranks))
+
+
+def get_rules(lengths=None, columns_to_win=None):
+    """
+    :return: (tuple of the column lengths, columns to win), from the Settings
+    where they aren't given
+    """
+    return tuple(lengths or Settings.COLUMN_LENGTHS), columns_to_win or Settings.COLUMNS_TO_WIN
+
+
+def is_won(ranks, lengths, columns_to_win):
+    return sum(1 for rank, length in zip(ranks, lengths) if rank >= length) >= columns_to_win
+
+
+def get_table_path(lengths=None, columns_to_win=None):
+    """
+    The table is only good for the rules it was solved with.
+
+    :return: the file of the table or None if the table cache is turned off
+    """
+    lengths, columns_to_win = get_rules(lengths, columns_to_win)
+    return get_cache_path("solitaire", SOLITAIRE_VERSION, (get_rules_key(lengths), columns_to_win))
+
+
+def _create_table(path, lengths, columns_to_win):
+    """
+    Write a table where the won boards are 0 and the others are NaN.
+    """
+    create_table(path, _TYPECODE, get_board_count(lengths),
+                 (0.0 if is_won(ranks, lengths, columns_to_win) else math.nan
+                  for ranks in product(*[range(0, length + 1) for length in lengths])))
+
+
+class TurnsLeft(object):
+    """
+    The utility of a turn in solitaire: minus the expected turns left after
+    it.
+    """
+
+    def __init__(self, values, ranks, bust_turns, lengths):
+        """
+        :param values: the table of expected turns left by board
+        :param ranks: the committed rank by column index at the start of the turn
+        :param bust_turns: the expected turns left after a bust
+        :param lengths: the length of each column
+        """
+        self.values = values
+        self.strides = get_strides(lengths)
+        self.index = encode(ranks, self.strides)
+        self.bust_turns = bust_turns
+
+    def __call__(self, temp_items):
+        if not temp_items:
+            return -self.bust_turns
+
+        index = self.index
+        for column, _, temp_rank in temp_items:
+            index += temp_rank * self.strides[column - Settings.MIN_COLUMN]
+        return -self.values[index]
+
+    def __eq__(self, other):
+        return (isinstance(other, TurnsLeft) and self.values is other.values
+                and self.index == other.index and self.bust_turns == other.bust_turns)
+
+    def __hash__(self):
+        return hash((id(self.values), self.index, self.bust_turns))
+
+
+def get_open_mask(ranks, lengths):
+    open_mask = ALL_COLUMNS_MASK
+    for index, rank in enumerate(ranks):
+        if rank >= lengths[index]:
+            open_mask &= ~(1 << index)
+    return open_mask
+
+
+def solve_board(values, ranks, lengths, tolerance=1e-7):
+    """
+    Every board with a higher rank sum has to be solved already.
+
+    :param values: the table of expected turns left by board
+    :param ranks: the committed rank by column index
+    :param lengths: the length of each column
+    :return: the expected turns left from this board, playing the best way
+    """
+    open_mask = get_open_mask(ranks, lengths)
+
+    def get_turns(bust_turns):
+        # Each guess at the bust turns is a new utility so its values are
+        # dropped with the solver.
+        solver = TurnSolver(ranks, open_mask, TurnsLeft(values, ranks, bust_turns, lengths), lengths,
+                            share_values=False)
+        return 1 - solver.get_value(())
+
+    # Look for where get_turns(x) - x is 0.
+    x0 = 1.0
+    y0 = get_turns(x0)
+    x1 = y0
+    for _ in range(0, 100):
+        y1 = get_turns(x1)
+        if abs(y1 - x1) <= tolerance * x1:
+            return y1
+        slope = (y1 - x1 - y0 + x0) / (x1 - x0)
+        if not slope:
+            return y1
+        x0, y0, x1 = x1, y1, x1 - (y1 - x1) / slope
+    logging.warning("Solitaire: {} didn't settle.".format(ranks))
+    return y1
+
+
+def _init_worker(path, lengths):
+    """
+    Map the table of the main process.  The map goes with the process.
+    Every chunk is flushed so nothing is lost.
+    """
+    global _solving_values, _solving_lengths
+    _solving_values = map_table(path, _TYPECODE, writable=True)
+    _solving_lengths = lengths
+
+
+def _solve_chunk(indices):
+    """
+    This runs in the worker processes so keep it at the module level.
+
+    :return: the number of boards solved
+    """
+    for index in indices:
+        _solving_values[index] = solve_board(_solving_values, decode(index, _solving_lengths), _solving_lengths)
+    _solving_values.obj.flush()
+    return len(indices)
+
+
+def solve_table(workers=1, chunk_size=64, lengths=None, columns_to_win=None):
+    """
+    Solve the table, or finish solving it.
+
+    :param workers: number of processes to solve on
+    :param chunk_size: boards per job sent to a worker
+    :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+    :param columns_to_win: Settings.COLUMNS_TO_WIN by default
+    :return: the expected number of turns to win from the empty board
+    """
+    global _solving_values, _solving_lengths
+    lengths, columns_to_win = get_rules(lengths, columns_to_win)
+    if get_board_count(lengths) > MAX_SOLITAIRE_BOARDS:
+        raise ValueError("The solitaire table for columns {} long has {} boards, more than the {} that can be "
+                         "solved.  Try shorter columns.".format(lengths, get_board_count(lengths),
+                                                                 MAX_SOLITAIRE_BOARDS))
+    path = get_table_path(lengths, columns_to_win)
+    if path is None:
+        raise ValueError("The solitaire table needs the table cache.  Set CANTSTOP_CACHE_DIR.")
+    values = map_table(path, _TYPECODE, writable=True)
+    if values is None:
+        logging.info("Solitaire: starting {} with {} boards.".format(path, get_board_count(lengths)))
+        _create_table(path, lengths, columns_to_win)
+        values = map_table(path, _TYPECODE, writable=True)
+
+    # Group the boards that are left by their rank sum.
+    levels = {}
+    for index, ranks in enumerate(product(*[range(0, length + 1) for length in lengths])):
+        if math.isnan(values[index]):
+            levels.setdefault(sum(ranks), []).append(index)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path, lengths))
+    else:
+        _solving_values = values
+        _solving_lengths = lengths
+    try:
+        for level in sorted(levels, reverse=True):
+            indices = levels[level]
+            chunks = [indices[first:first + chunk_size] for first in range(0, len(indices), chunk_size)]
+            if pool is None:
+                for chunk in chunks:
+                    _solve_chunk(chunk)
+            else:
+                # Each level needs the one above it so wait for all of it.
+                for _ in pool.map(_solve_chunk, chunks):
+                    pass
+            logging.info("Solitaire: solved the {} boards with rank sum {}.".format(len(indices), level))
+        turns = values[0]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _solving_values = None
+        _solving_lengths = None
+        close_table(values)
+    return turns
+
+
+class SolitaireTable(object):
+    """
+    The solved table, mapped read-only.
+    """
+
+    def __init__(self, values, lengths):
+        """
+        :param values: the table of expected turns left by board
+        :param lengths: the length of each column
+        """
+        self.values = values
+        self.lengths = lengths
+        self.strides = get_strides(lengths)
+
+    @classmethod
+    def load(cls, lengths=None, columns_to_win=None):
+        """
+        :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+        :param columns_to_win: Settings.COLUMNS_TO_WIN by default
+        :return: the table or None if it hasn't been solved
+        """
+        lengths, columns_to_win = get_rules(lengths, columns_to_win)
+        path = get_table_path(lengths, columns_to_win)
+        if path is None:
+            return None
+        values = map_table(path, _TYPECODE)
+        if values is None or math.isnan(values[0]):
+            return None
+        return cls(values, lengths)
+
+    def get_expected_turns(self, ranks):
+        """
+        :param ranks: the committed rank by column index
+        :return: the expected number of turns left to win
+        """
+        return self.values[encode(ranks, self.strides)]
+
+    def get_utility(self, ranks):
+        """
+        :param ranks: the committed rank by column index at the start of the turn
+        :return: the TurnSolver utility that plays the turn like the table
+        """
+        return TurnsLeft(self.values, ranks, self.get_expected_turns(ranks), self.lengths)
+
+
+def get_table():
+    """
+    Each table is only mapped once per process.
+
+    :return: the SolitaireTable for the current Settings or None
+    """
+    rules = get_rules()
+    if rules not in _tables:
+        _tables[rules] = SolitaireTable.load(*rules)
+    return _tables[rules]
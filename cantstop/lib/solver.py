@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+
+"""
+Exact answers to "should I keep rolling?" for a single turn.
+
+The survival curve is the odds of getting through the next k attempts
+without a bust.  It walks the turn as a Markov chain whose rows are cached.
+
+The turn is a small game against the dice.  Every attempt either busts or
+moves the temp progress up, so the temp progress states form a DAG that
+ends when the player stops, busts or has nothing left to roll for.  The
+value of each state is the better of stopping, ie the utility of the temp
+progress, and rolling, ie the average over the rolls of the best choice.
+
+The values are kept between calls.  Once all the markers are placed, only
+the temp columns matter so those values are solved a block at a time and
+shared by every board.  A solver for a utility that won't be used again
+can keep its values to itself instead, see TurnSolver.
+
+This should not import any other module in /lib except engine, odds and settings.
+"""
+
+import logging
+from collections import namedtuple
+from itertools import product
+
+from cantstop.lib.engine import get_roll_choices
+from cantstop.lib.odds import ALL_COLUMNS_MASK, COLUMN_BITS, ROLL_COUNT, ROLL_MASKS, ROLL_SUMS, mask_to_columns
+from cantstop.lib.settings import Settings
+
+TurnValue = namedtuple("TurnValue", ["stop", "go"])
+
+# When the caches grow past this many entries, they start over.
+MAX_CACHE_SIZE = 1 << 20
+
+# The choices only depend on the pair-sums so one roll stands in for all
+# the rolls with the same sums.  List of (roll index, number of rolls).
+_sums_rolls = None
+
+# (free marker bucket, temp mask, blocked mask, ordered) -> tuple of (roll count, choices)
+_outcomes_cache = {}
+
+# (utility, column lengths, ranks, open mask, temp) -> value
+_values_cache = {}
+
+# (utility, column lengths, tuple of (column, committed rank)) -> (strides, values)
+_full_values_cache = {}
+
+# column lengths -> the P2 gain utility for those lengths
+_p2_gains = {}
+
+# tuple of columns -> list of (roll count, positions hit)
+_hit_subsets_cache = {}
+
+# (ranks left by column, temp mask) -> tuple of ((ranks left, temp mask), roll count)
+_transitions_cache = {}
+
+# (ranks left by column, temp mask, attempts) -> survival curve
+_survival_cache = {}
+
+
+def get_p2_gain(lengths=None):
+    """
+    The same lengths always get the same function so that their solved
+    values are shared.
+
+    :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+    :return: the utility that is the P2 score that the temp progress adds,
+    like State.p2_temp_progress()
+    """
+    lengths = tuple(lengths or Settings.COLUMN_LENGTHS)
+    p2_gain = _p2_gains.get(lengths)
+    if p2_gain is None:
+        def p2_gain(temp_items):
+            """
+            :param temp_items: tuple of (column, committed rank, temp rank)
+            :return: float
+            """
+            gain = 0
+            for column, rank, temp_rank in temp_items:
+                length = lengths[column - Settings.MIN_COLUMN]
+                gain += ((rank + temp_rank) ** 2 - rank ** 2) / (length * length)
+            return gain * 100
+        _p2_gains[lengths] = p2_gain
+    return p2_gain
+
+
+def _get_sums_rolls():
+    global _sums_rolls
+    if _sums_rolls is None:
+        by_sums = {}
+        for roll_index, roll_sums in enumerate(ROLL_SUMS):
+            if roll_sums in by_sums:
+                by_sums[roll_sums][1] += 1
+            else:
+                by_sums[roll_sums] = [roll_index, 1]
+        _sums_rolls = [tuple(roll) for roll in by_sums.values()]
+    return _sums_rolls
+
+
+def _compute_outcomes(free_markers, temp_mask, blocked_mask, ordered):
+    counts = {}
+    if free_markers >= 2 or ordered:
+        for roll_index, roll_count in _get_sums_rolls():
+            choices = get_roll_choices(roll_index, free_markers, temp_mask, blocked_mask)
+            counts[choices] = counts.get(choices, 0) + roll_count
+    else:
+        # With fewer than two free markers, each choice is a single column
+        # and they are the roll's pair-sums that can be advanced.
+        if free_markers == 1:
+            allowed_mask = ALL_COLUMNS_MASK & ~blocked_mask
+        else:
+            allowed_mask = temp_mask & ~blocked_mask
+        by_mask = {}
+        for roll_mask in ROLL_MASKS:
+            by_mask[roll_mask & allowed_mask] = by_mask.get(roll_mask & allowed_mask, 0) + 1
+        for mask, count in by_mask.items():
+            counts[tuple((column,) for column in mask_to_columns(mask))] = count
+
+    return tuple((count, choices) for choices, count in counts.items())
+
+
+def get_hit_subsets(columns):
+    """
+    :param columns: tuple of columns
+    :return: list of (number of rolls, list of the positions in columns
+    that those rolls hit)
+    """
+    subsets = _hit_subsets_cache.get(columns)
+    if subsets is None:
+        hit_counts = [0] * (1 << len(columns))
+        for roll_mask in ROLL_MASKS:
+            hit = 0
+            for i, column in enumerate(columns):
+                if roll_mask & COLUMN_BITS[column]:
+                    hit |= 1 << i
+            hit_counts[hit] += 1
+        subsets = [(count, [i for i in range(0, len(columns)) if hit & (1 << i)])
+                   for hit, count in enumerate(hit_counts) if count]
+        _hit_subsets_cache[columns] = subsets
+    return subsets
+
+
+def _solve_full(utility, columns, lengths):
+    """
+    Once every marker is placed, the only choices are which of the temp
+    columns to advance.  So solve every temp progress on these columns at
+    once, from the top ranks down, in a flat list.
+
+    :param columns: sorted tuple of (column, committed rank)
+    :param lengths: the length of each column
+    :return: (stride of each column in values, list of values by temp progress)
+    """
+    remaining = [lengths[column - Settings.MIN_COLUMN] - rank for column, rank in columns]
+    strides = [1] * len(columns)
+    for i in range(len(columns) - 2, -1, -1):
+        strides[i] = strides[i + 1] * (remaining[i + 1] + 1)
+
+    subsets = get_hit_subsets(tuple(column for column, _ in columns))
+    bust_value = utility(())
+    values = [0.0] * (strides[0] * (remaining[0] + 1))
+    for temp_ranks in product(*[range(r, -1, -1) for r in remaining]):
+        index = 0
+        for i, temp_rank in enumerate(temp_ranks):
+            index += temp_rank * strides[i]
+
+        total = 0
+        for count, hits in subsets:
+            best = None
+            for i in hits:
+                if temp_ranks[i] < remaining[i]:
+                    value = values[index + strides[i]]
+                    if best is None or value > best:
+                        best = value
+            total += count * (bust_value if best is None else best)
+
+        temp_items = tuple((column, rank, temp_rank) for (column, rank), temp_rank in zip(columns, temp_ranks))
+        values[index] = max(utility(temp_items), total / ROLL_COUNT)
+
+    return strides, values
+
+
+def get_full_value(utility, temp_items, lengths=None, cache=None):
+    """
+    :param temp_items: sorted tuple of (column, committed rank, temp rank)
+    for every marker
+    :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+    :param cache: dict to keep the solved blocks in, the shared one by default
+    :return: the expected utility of playing the turn on from there
+    """
+    if cache is None:
+        cache = _full_values_cache
+    lengths = tuple(lengths or Settings.COLUMN_LENGTHS)
+    key = (utility, lengths, tuple((column, rank) for column, rank, _ in temp_items))
+    solved = cache.get(key)
+    if solved is None:
+        solved = _solve_full(utility, key[2], lengths)
+        if len(cache) >= MAX_CACHE_SIZE >> 8:
+            cache.clear()
+        cache[key] = solved
+
+    strides, values = solved
+    index = 0
+    for i, (_, _, temp_rank) in enumerate(temp_items):
+        index += temp_rank * strides[i]
+    return values[index]
+
+
+def get_outcomes(free_markers, temp_mask, blocked_mask, ordered=False):
+    """
+    Group the rolls by the choices that they offer.  Duplicate rolls only
+    need to be looked at once.
+
+    With fewer than two free markers, the choices are sorted and each column
+    is only listed once.  That's all a search needs.  Pass ordered to get the
+    choices exactly as engine.get_roll_choices() lists them, for the bots
+    that break ties by position.
+
+    :return: tuple of (number of rolls, tuple of choices).  Empty choices is a bust.
+    """
+    # Like get_roll_choices(), the temp columns only matter once all the
+    # markers are placed.  With two free markers, the choices are the same
+    # either way.
+    if free_markers >= 2:
+        key = (2, 0, blocked_mask, False)
+    elif free_markers == 1:
+        key = (1, 0, blocked_mask, ordered)
+    else:
+        key = (0, temp_mask, blocked_mask, ordered)
+
+    outcomes = _outcomes_cache.get(key)
+    if outcomes is None:
+        outcomes = _compute_outcomes(free_markers, temp_mask, blocked_mask, ordered)
+        _outcomes_cache[key] = outcomes
+    return outcomes
+
+
+def choose_for_survival(temp_mask, choices):
+    """
+    Keep to the temp columns when possible, like
+    Bot.choose_already_selected_columns() but with the temp columns.  Ties go
+    to the first choice.
+
+    :return: the choice with the most columns in temp_mask
+    """
+    best_choice = None
+    best_overlap = -1
+    for choice in choices:
+        overlap = 0
+        for column in choice:
+            if temp_mask & COLUMN_BITS[column]:
+                overlap += 1
+        if overlap > best_overlap:
+            best_choice = choice
+            best_overlap = overlap
+    return best_choice
+
+
+def _compute_transitions(left, temp_mask):
+    blocked_mask = 0
+    for index, ranks_left in enumerate(left):
+        if not ranks_left:
+            blocked_mask |= 1 << index
+    free_markers = Settings.MARKER_COUNT - bin(temp_mask).count("1")
+
+    counts = {}
+    next_states = {}  # choice -> next state
+    for count, choices in get_outcomes(free_markers, temp_mask, blocked_mask):
+        if not choices:
+            continue
+        choice = choose_for_survival(temp_mask, choices)
+        next_state = next_states.get(choice)
+        if next_state is None:
+            next_left = list(left)
+            next_temp_mask = temp_mask
+            for column in choice:
+                index = column - Settings.MIN_COLUMN
+                next_left[index] = max(next_left[index] - 1, 0)
+                next_temp_mask |= COLUMN_BITS[column]
+            next_state = _get_chain_state(next_left, next_temp_mask)
+            next_states[choice] = next_state
+        counts[next_state] = counts.get(next_state, 0) + count
+    return tuple(counts.items())
+
+
+def _get_chain_state(left, temp_mask):
+    """
+    Once the markers are placed, the other columns can't be reached so
+    forget how far they are from the top.  That way more states are shared.
+    """
+    if bin(temp_mask).count("1") >= Settings.MARKER_COUNT:
+        left = [ranks_left if temp_mask & (1 << index) else 0 for index, ranks_left in enumerate(left)]
+    return tuple(left), temp_mask
+
+
+def get_transitions(left, temp_mask):
+    """
+    One row of the transition matrix of the turn.  The rows that are missing
+    mass are the busts.
+
+    :param left: tuple of the ranks left before the top of each column, 0
+    for the columns that are won or maxed
+    :param temp_mask: bitmask of the temp columns
+    :return: tuple of ((next left, next temp mask), number of rolls)
+    """
+    key = (left, temp_mask)
+    transitions = _transitions_cache.get(key)
+    if transitions is None:
+        transitions = _compute_transitions(left, temp_mask)
+        if len(_transitions_cache) >= MAX_CACHE_SIZE:
+            _transitions_cache.clear()
+        _transitions_cache[key] = transitions
+    return transitions
+
+
+def get_survival_curve(left, temp_mask, attempts=20):
+    """
+    The odds of surviving each of the next attempts, following the marker
+    placements and the columns that max out along the way.  The choices are
+    made by choose_for_survival().
+
+    :param left: tuple of the ranks left before the top of each column
+    :param temp_mask: bitmask of the temp columns
+    :param attempts: how many attempts to look ahead
+    :return: tuple where [k - 1] is the odds of surviving k more attempts, 1.0 is 100%
+    """
+    left, temp_mask = _get_chain_state(left, temp_mask)
+    key = (left, temp_mask, attempts)
+    curve = _survival_cache.get(key)
+    if curve is not None:
+        return curve
+
+    curve = []
+    odds_by_state = {(left, temp_mask): 1.0}
+    for _ in range(0, attempts):
+        next_odds_by_state = {}
+        for state, odds in odds_by_state.items():
+            for next_state, count in get_transitions(*state):
+                next_odds_by_state[next_state] = next_odds_by_state.get(next_state, 0) + odds * count / ROLL_COUNT
+        odds_by_state = next_odds_by_state
+        curve.append(sum(odds_by_state.values()))
+
+    curve = tuple(curve)
+    if len(_survival_cache) >= MAX_CACHE_SIZE >> 8:
+        _survival_cache.clear()
+    _survival_cache[key] = curve
+    return curve
+
+
+class TurnSolver(object):
+    """
+    Solve the current turn for one player.
+
+    The temp progress is a sorted tuple of (column, temp rank) and it never
+    goes past the top of a column.  Pass in utility to maximize something
+    other than the P2 gain.  It gets a tuple of (column, committed rank, temp
+    rank) and a bust is worth utility(()).
+
+    Equal utilities share their solved values with every other solver.  A
+    solver that isn't sharing keeps them until it's dropped, so a utility
+    that is only used once doesn't crowd out the others.
+    """
+
+    def __init__(self, ranks, open_mask=ALL_COLUMNS_MASK, utility=None, lengths=None, share_values=True):
+        """
+        :param ranks: the player's committed rank by column index
+        :param open_mask: bitmask of the columns nobody has won
+        :param utility: function of the temp items, get_p2_gain() by default
+        :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+        :param share_values: False to keep the solved values in this solver only
+        """
+        self.ranks = tuple(ranks)
+        self.open_mask = open_mask
+        self.lengths = tuple(lengths or Settings.COLUMN_LENGTHS)
+        self.utility = get_p2_gain(self.lengths) if utility is None else utility
+        if share_values:
+            self.values = _values_cache
+            self.full_values = _full_values_cache
+        else:
+            self.values = {}
+            self.full_values = {}
+
+    @classmethod
+    def from_positions(cls, player_positions, name, utility=None, lengths=None):
+        """
+        A column is won when somebody sits at its top rank.
+
+        :param player_positions: dict: name->tuple of current_rank_by_column
+        :param name: the player whose turn it is
+        :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+        """
+        lengths = tuple(lengths or Settings.COLUMN_LENGTHS)
+        open_mask = ALL_COLUMNS_MASK
+        for ranks in player_positions.values():
+            for index, rank in enumerate(ranks):
+                if rank >= lengths[index]:
+                    open_mask &= ~(1 << index)
+        return cls(player_positions[name], open_mask, utility, lengths)
+
+    @classmethod
+    def from_state(cls, state, name, utility=None, lengths=None):
+        return cls.from_positions(state.player_positions, name, utility, lengths)
+
+    def get_temp(self, temp_progress):
+        """
+        :param temp_progress: dict: column_num->temp_rank_by_that_column
+        :return: the sorted tuple of (column, temp rank) used by the solver
+        """
+        temp = []
+        for column, temp_rank in temp_progress.items():
+            index = column - Settings.MIN_COLUMN
+            temp.append((column, min(temp_rank, self.lengths[index] - self.ranks[index])))
+        return tuple(sorted(temp))
+
+    def get_temp_items(self, temp):
+        return tuple((column, self.ranks[column - Settings.MIN_COLUMN], temp_rank) for column, temp_rank in temp)
+
+    def apply_choice(self, temp, choice):
+        """
+        :return: the temp progress after the choice
+        """
+        progress = dict(temp)
+        for column in choice:
+            index = column - Settings.MIN_COLUMN
+            progress[column] = min(progress.get(column, 0) + 1, self.lengths[index] - self.ranks[index])
+        return tuple(sorted(progress.items()))
+
+    def get_value(self, temp):
+        """
+        :return: the expected utility of playing the turn on from here
+        """
+        if len(temp) >= Settings.MARKER_COUNT:
+            return get_full_value(self.utility, self.get_temp_items(temp), self.lengths, self.full_values)
+
+        key = (self.utility, self.lengths, self.ranks, self.open_mask, temp)
+        value = self.values.get(key)
+        if value is None:
+            if temp:
+                value = max(self.utility(self.get_temp_items(temp)), self.get_go_value(temp))
+            else:
+                # A turn can't stop before it starts.
+                value = self.get_go_value(temp)
+            if len(self.values) >= MAX_CACHE_SIZE:
+                self.values.clear()
+            self.values[key] = value
+        return value
+
+    def get_masks(self, temp):
+        """
+        :return: (bitmask of the temp columns, bitmask of the columns that
+        are won or maxed)
+        """
+        temp_mask = 0
+        blocked_mask = ALL_COLUMNS_MASK ^ self.open_mask
+        for column, temp_rank in temp:
+            index = column - Settings.MIN_COLUMN
+            temp_mask |= COLUMN_BITS[column]
+            if self.ranks[index] + temp_rank >= self.lengths[index]:
+                blocked_mask |= COLUMN_BITS[column]
+        return temp_mask, blocked_mask
+
+    def get_go_value(self, temp):
+        """
+        :return: the expected utility of rolling again and then playing on
+        """
+        temp_mask, blocked_mask = self.get_masks(temp)
+
+        # Many rolls share the same choices, so value each choice once.
+        choice_values = {}
+        bust_value = self.utility(())
+        total = 0
+        for count, choices in get_outcomes(Settings.MARKER_COUNT - len(temp), temp_mask, blocked_mask):
+            best = bust_value
+            for i, choice in enumerate(choices):
+                value = choice_values.get(choice)
+                if value is None:
+                    value = self.get_value(self.apply_choice(temp, choice))
+                    choice_values[choice] = value
+                if i == 0 or value > best:
+                    best = value
+            total += count * best
+        return total / ROLL_COUNT
+
+    def evaluate(self, temp_progress):
+        """
+        :param temp_progress: dict: column_num->temp_rank_by_that_column
+        :return: TurnValue of stopping now and of rolling again
+        """
+        temp = self.get_temp(temp_progress)
+        turn_value = TurnValue(self.utility(self.get_temp_items(temp)), self.get_go_value(temp))
+        if logging.root.level <= logging.DEBUG:
+            logging.debug("Solver: {} -> {}".format(temp, turn_value))
+        return turn_value
+
+    def should_continue(self, temp_progress):
+        turn_value = self.evaluate(temp_progress)
+        return turn_value.go > turn_value.stop
+
+    def get_survival_curve(self, temp_progress, attempts=20):
+        """
+        :param temp_progress: dict: column_num->temp_rank_by_that_column
+        :return: see get_survival_curve()
+        """
+        left = []
+        for index, rank in enumerate(self.ranks):
+            if self.open_mask & (1 << index):
+                left.append(self.lengths[index] - rank)
+            else:
+                left.append(0)
+        temp_mask = 0
+        for column, temp_rank in self.get_temp(temp_progress):
+            left[column - Settings.MIN_COLUMN] -= temp_rank
+            temp_mask |= COLUMN_BITS[column]
+        return get_survival_curve(tuple(left), temp_mask, attempts)
+
+    def get_best_choice(self, temp_progress, choices):
+        """
+        :param choices: eg ((4, 11), (6, 9), (7,))
+        :return: the choice that leads to the best expected utility
+        """
+        temp = self.get_temp(temp_progress)
+        return max(choices, key=lambda choice: self.get_value(self.apply_choice(temp, choice)))
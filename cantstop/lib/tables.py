@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+"""
+Cache files for the tables that take a while to build.
+
+Each table is a file under ~/.cache/cantstop, or $CANTSTOP_CACHE_DIR if
+set.  Set it to an empty string to turn the cache off.  The file name has a
+hash of the rules the table was built with, so a change of rules never
+picks up a stale table.  A table of numbers starts with TABLE_HEADER and is
+then a flat array that is memory mapped, so loading it costs page faults
+instead of a rebuild.
+
+The roll tables in odds.py aren't cached.  They take a few milliseconds to
+build, which is less than opening a file.
+
+This should not import any other module in /lib except settings.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+from cantstop.lib.settings import Settings
+
+# Bump this whenever the layout of the cached tables changes.
+TABLE_CACHE_VERSION = 1
+
+# Starts every table of numbers: magic, version, array typecode, item count.
+TABLE_HEADER = struct.Struct("<4sHcxQ")
+TABLE_MAGIC = b"CSTB"
+
+# Items written to a new table at a time.
+BLOCK_SIZE = 1 << 16
+
+
+def get_rules_key(lengths=None):
+    """
+    The cached solver tables are only good for the rules they were built
+    with so every cache file name includes a hash of those rules.  They play
+    whole turns so they depend on all of these.  The dice are always four
+    d6, see odds.py.
+
+    :param lengths: the length of each column, Settings.COLUMN_LENGTHS by default
+    :return: str of 16 hex digits
+    """
+    rules = (TABLE_CACHE_VERSION, tuple(Settings.COLUMN_RANGE), tuple(lengths or Settings.COLUMN_LENGTHS),
+             Settings.MARKER_COUNT)
+    return hashlib.sha256(repr(rules).encode()).hexdigest()[:16]
+
+
+def get_table_cache_dir():
+    """
+    :return: the cache directory or None if the cache is turned off
+    """
+    cache_dir = os.environ.get("CANTSTOP_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                 "cantstop")
+    return cache_dir or None
+
+
+def get_cache_path(name, version, rules):
+    """
+    :param name: what the table is, eg "solitaire"
+    :param version: the version of the table's own encoding
+    :param rules: anything else the table depends on besides get_rules_key()
+    :return: the file of the table or None if the cache is turned off
+    """
+    cache_dir = get_table_cache_dir()
+    if cache_dir is None:
+        return None
+    rules_key = hashlib.sha256(repr((version, rules)).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, "{}-v{}-{}.bin".format(name, version, rules_key))
+
+
+def create_table(path, typecode, count, items):
+    """
+    Write a table.  It's written to a temp file and renamed so that a half
+    written table is never picked up.
+
+    :param typecode: the array typecode of the items
+    :param count: how many items there are
+    :param items: iterable of the items
+    """
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as table_file:
+            table_file.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_CACHE_VERSION, typecode.encode(), count))
+            block = array(typecode)
+            for item in items:
+                block.append(item)
+                if len(block) >= BLOCK_SIZE:
+                    table_file.write(block.tobytes())
+                    block = array(typecode)
+            table_file.write(block.tobytes())
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def map_table(path, typecode, writable=False):
+    """
+    :param writable: map it so that writes go to the file
+    :return: a memoryview of the table or None if the file is missing or
+    doesn't look right.  Read-only unless writable.  See close_table().
+    """
+    access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+    try:
+        with open(path, "r+b" if writable else "rb") as table_file:
+            mapped = mmap.mmap(table_file.fileno(), 0, access=access)
+    except (OSError, ValueError):
+        return None
+
+    if len(mapped) >= TABLE_HEADER.size:
+        magic, version, cached_typecode, count = TABLE_HEADER.unpack_from(mapped)
+        body_size = count * array(typecode).itemsize
+        if (magic == TABLE_MAGIC and version == TABLE_CACHE_VERSION
+                and cached_typecode == typecode.encode()
+                and len(mapped) == TABLE_HEADER.size + body_size):
+            return memoryview(mapped)[TABLE_HEADER.size:].cast(typecode)
+    mapped.close()
+    return None
+
+
+def close_table(values):
+    """
+    Flush and unmap a table from map_table().  It can't be used after this.
+    """
+    mapped = values.obj
+    values.release()
+    mapped.flush()
+    mapped.close()
@@ -0,0 +1,47 @@
+from random import Random
+
+import pytest
+
+from cantstop.bin.multi_sim import play_batch, play_games
+from cantstop.lib.all_the_things import State
+from cantstop.lib.bots.bots import ChoosingScoringBot, ConservativeBot, HexRollerBot, ScoringBot
+from cantstop.lib.settings import Settings
+
+numpy = pytest.importorskip("numpy")
+from cantstop.lib.batch import WIDTH, rule28  # noqa: E402
+
+# The games are seeded so these can only fail if the two disagree.  The
+# tolerance is about four standard deviations.
+SCALAR_GAMES = 1000
+BATCH_GAMES = 4000
+TOLERANCE = 0.07
+
+
+@pytest.mark.parametrize("players", [
+    [ChoosingScoringBot, HexRollerBot],
+    [ScoringBot, ConservativeBot],
+])
+def test_batch_and_scalar_win_rates_agree(players):
+    name = players[0].__name__
+    scalar_results = play_games(players, 5, False, 0, SCALAR_GAMES)
+    batch_results = play_batch(players, 5, 0, BATCH_GAMES)
+    scalar_rate = sum(result.winner == name for result in scalar_results) / SCALAR_GAMES
+    batch_rate = sum(result.winner == name for result in batch_results) / BATCH_GAMES
+    assert abs(scalar_rate - batch_rate) < TOLERANCE
+
+    scalar_rounds = sum(result.rounds for result in scalar_results) / SCALAR_GAMES
+    batch_rounds = sum(result.rounds for result in batch_results) / BATCH_GAMES
+    assert abs(scalar_rounds - batch_rounds) < 0.1 * scalar_rounds
+
+
+def test_rule28_matches_state():
+    rng = Random(5)
+    temp = numpy.zeros((500, WIDTH), dtype=numpy.int16)
+    progress = []
+    for game in range(0, 500):
+        temp_progress = {}
+        for column in rng.sample(list(Settings.COLUMN_RANGE), rng.randint(0, Settings.MARKER_COUNT)):
+            temp_progress[column] = rng.randint(1, Settings.COLUMN_LENGTHS[column - Settings.MIN_COLUMN])
+            temp[game, column - Settings.MIN_COLUMN] = temp_progress[column]
+        progress.append(temp_progress)
+    assert list(rule28(temp)) == [State.score_rule28(temp_progress) for temp_progress in progress]
@@ -0,0 +1,53 @@
+import pytest
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.endgame import MAX_ENDGAME_BOARDS, EndgameTablebase, get_board_count, is_endgame
+from cantstop.lib.odds import hit_odds
+from cantstop.lib.settings import Settings
+
+# A late game like the ones CSB plays: the first player has won 7 and 9 and the
+# second has won 8.  The columns are 3,5,7,9,11,13,11,9,7,5,3 long.
+LATE_RANKS = (1, 2, 4, 6, 0, 13, 3, 9, 2, 0, 0)
+LATE_OTHER_RANKS = (0, 3, 0, 5, 7, 0, 13, 0, 4, 1, 2)
+
+# The last turn: the first player has won 7 and 8, the second has won 6 and
+# 9 and both are one rank from the top of every other column.
+LAST_RANKS = (2, 4, 6, 8, 0, 13, 11, 0, 6, 4, 2)
+LAST_OTHER_RANKS = (2, 4, 6, 8, 11, 0, 0, 9, 6, 4, 2)
+
+
+def test_empty_board_is_not_endgame():
+    empty = (0,) * Settings.COLUMN_COUNT
+    assert not is_endgame(empty, empty)
+
+
+def test_late_game_is_not_solved():
+    assert get_board_count(LATE_RANKS, LATE_OTHER_RANKS) > MAX_ENDGAME_BOARDS
+    assert not is_endgame(LATE_RANKS, LATE_OTHER_RANKS)
+
+    tablebase = EndgameTablebase()
+    assert tablebase.get_win_odds(LATE_RANKS, LATE_OTHER_RANKS) is None
+    state = State([(12,)], ({"A": LATE_RANKS, "B": LATE_OTHER_RANKS}, {}), 0)
+    assert tablebase.get_solver(state, "A") is None
+
+
+def test_last_turn_win_odds():
+    assert get_board_count(LAST_RANKS, LAST_OTHER_RANKS) == 1
+    assert is_endgame(LAST_RANKS, LAST_OTHER_RANKS)
+
+    # Any hit wins, so roll once.  With h the odds of a hit, the player to
+    # move wins x = h + (1 - h) * (1 - x) of the time.
+    hit = hit_odds((2, 3, 4, 5, 10, 11, 12))
+    tablebase = EndgameTablebase()
+    assert tablebase.get_win_odds(LAST_RANKS, LAST_OTHER_RANKS) == pytest.approx(1 / (2 - hit))
+    assert tablebase.get_win_odds(LAST_OTHER_RANKS, LAST_RANKS) == pytest.approx(1 / (2 - hit))
+
+
+def test_last_turn_solver():
+    tablebase = EndgameTablebase()
+    positions = {"A": LAST_RANKS, "B": LAST_OTHER_RANKS}
+    state = State([(12,)], (positions, {12: 1}), 0)
+    solver = tablebase.get_solver(state, "A")
+    assert solver is not None
+    assert not solver.should_continue(state.temp_progress)
+    assert solver.evaluate(state.temp_progress).stop == 1.0
@@ -0,0 +1,129 @@
+from random import Random
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.engine import BoardEngine
+from cantstop.lib.odds import ROLL_COUNT, ROLL_VALUES
+from cantstop.lib.settings import Settings
+
+NAMES = ("A", "B", "C")
+
+
+def make_random_engine(rng):
+    """
+    :return: BoardEngine of two or three players part way through a game,
+    with some columns won and some temp progress for the first player
+    """
+    names = NAMES[:rng.randint(2, 3)]
+    positions = {name: [0] * Settings.COLUMN_COUNT for name in names}
+    won_counts = dict.fromkeys(names, 0)
+    for index, length in enumerate(Settings.COLUMN_LENGTHS):
+        for name in names:
+            positions[name][index] = rng.randrange(length)
+        owner = rng.choice(names)
+        if rng.random() < 0.2 and won_counts[owner] < Settings.COLUMNS_TO_WIN - 1:
+            for name in names:
+                positions[name][index] = 0
+            positions[owner][index] = length
+            won_counts[owner] += 1
+    engine = BoardEngine.from_positions({name: tuple(ranks) for name, ranks in positions.items()})
+
+    open_columns = [column for column in Settings.COLUMN_RANGE if engine.is_open(column)]
+    for column in rng.sample(open_columns, rng.randint(0, Settings.MARKER_COUNT)):
+        left = Settings.COLUMN_LENGTHS[column - Settings.MIN_COLUMN] - engine.get_rank(names[0], column)
+        engine.temp_progress[column] = rng.randint(1, left)
+    engine.free_markers = Settings.MARKER_COUNT - len(engine.temp_progress)
+    return engine
+
+
+def get_baseline_choices(engine, name, values):
+    """
+    The choices as the original Game.get_roll_choices() found them, from the
+    die values.
+    """
+    roll_values = list({tuple(sorted([values[0] + values[1], values[2] + values[3]])),
+                        tuple(sorted([values[0] + values[2], values[1] + values[3]])),
+                        tuple(sorted([values[0] + values[3], values[1] + values[2]]))})
+    temp_columns = engine.temp_progress.keys()
+    free_columns = [column for column in Settings.COLUMN_RANGE if engine.is_open(column)]
+    for column in temp_columns:
+        if engine.get_rank(name, column) + engine.temp_progress[column] >= \
+                Settings.COLUMN_LENGTHS[column - Settings.MIN_COLUMN]:
+            free_columns.remove(column)
+
+    choices = []
+    if engine.free_markers >= 2:
+        for input_tuple in roll_values:
+            output_list = [element for element in input_tuple if element in free_columns]
+            if output_list:
+                choices.append(tuple(output_list))
+    else:
+        for element in [item for rv in roll_values for item in rv]:
+            if element in free_columns and (engine.free_markers == 1 or element in temp_columns):
+                choices.append((element,))
+    return choices
+
+
+def get_snapshot(engine):
+    return (list(engine.names), {name: tuple(ranks) for name, ranks in engine.ranks.items()},
+            tuple(engine.owners), dict(engine.temp_progress), engine.free_markers, engine.open_mask,
+            dict(engine.won_masks), dict(engine.won_counts), engine.winner, dict(engine.get_player_positions()))
+
+
+def test_roll_choices_match_baseline():
+    rng = Random(1)
+    for _ in range(300):
+        engine = make_random_engine(rng)
+        for roll_index in rng.sample(range(0, ROLL_COUNT), 50):
+            choices = engine.get_roll_choices("A", roll_index)
+            assert sorted(choices) == sorted(get_baseline_choices(engine, "A", ROLL_VALUES[roll_index]))
+
+
+def test_make_unmake_round_trip():
+    rng = Random(2)
+    for _ in range(200):
+        engine = make_random_engine(rng)
+        engine.reset_progress()
+        shadow = engine.copy()
+        snapshots = []
+        turn = 0
+        for _ in range(rng.randint(1, 80)):
+            if engine.winner is not None:
+                break
+            name = engine.names[turn]
+            snapshots.append(get_snapshot(engine))
+            if engine.temp_progress and rng.random() < 0.3:
+                engine.make_stop(name)
+                shadow.commit_progress(name)
+                turn = (turn + 1) % len(engine.names)
+            else:
+                choices = engine.get_roll_choices(name, rng.randrange(ROLL_COUNT))
+                if choices:
+                    choice = rng.choice(choices)
+                    engine.make_choice(choice)
+                    shadow.register_roll_choice(choice)
+                else:
+                    engine.make_bust()
+                    shadow.reset_progress()
+                    turn = (turn + 1) % len(engine.names)
+            assert get_snapshot(engine) == get_snapshot(shadow)
+
+        while snapshots:
+            engine.unmake()
+            assert get_snapshot(engine) == snapshots.pop()
+        assert not engine.undo_stack
+
+
+def test_states_share_positions_until_a_turn_ends():
+    engine = BoardEngine.from_positions({"A": (1, 0, 2, 0, 0, 0, 0, 0, 0, 0, 0), "B": (0,) * 11})
+    engine.make_choice((4, 7))
+    first = State([(4, 7)], None, 1, engine)
+    engine.make_choice((7,))
+    second = State([(7,)], None, 1, engine)
+    assert first.player_positions is second.player_positions
+    assert dict(first.temp_progress) == {4: 1, 7: 1}
+    assert dict(second.temp_progress) == {4: 1, 7: 2}
+
+    engine.make_stop("A")
+    third = State([(5,)], None, 2, engine)
+    assert third.player_positions["A"] == (1, 0, 3, 0, 0, 2, 0, 0, 0, 0, 0)
+    assert first.player_positions["A"] == (1, 0, 2, 0, 0, 0, 0, 0, 0, 0, 0)
@@ -0,0 +1,89 @@
+import pytest
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.bots.bots import ChoosingScoringBot, ConservativeBot, RollerBot, ScoringBot
+from cantstop.lib.engine import BoardEngine
+from cantstop.lib.evaluator import PolicyEvaluator
+from cantstop.lib.odds import ROLL_COUNT
+from cantstop.lib.settings import Settings
+
+# A late game where B has won 7 and A is near the top of most columns, so
+# the brute force has few turns to play.
+POSITIONS = {
+    "A": (2, 3, 5, 6, 9, 0, 8, 6, 5, 2, 1),
+    "B": (1, 0, 2, 4, 0, 13, 0, 3, 2, 0, 1),
+}
+
+
+def play_every_roll(engine, name, bot, budget, attempt, cache):
+    """
+    Play the rest of the turn for every roll of the dice, one roll at a time.
+
+    :return: (bust odds, expected attempts, dict: column_num->expected ranks
+    committed, dict: column_num->odds of winning that column)
+    """
+    temp = tuple(sorted(engine.temp_progress.items()))
+    key = ("turn", temp, attempt if budget else None)
+    if key in cache:
+        return cache[key]
+
+    bust = 0.0
+    attempts = 1.0
+    ranks = dict.fromkeys(Settings.COLUMN_RANGE, 0.0)
+    claims = dict.fromkeys(Settings.COLUMN_RANGE, 0.0)
+    for roll_index in range(0, ROLL_COUNT):
+        choices = engine.get_roll_choices(name, roll_index)
+        if not choices:
+            bust += 1 / ROLL_COUNT
+            continue
+
+        # These bots only look at the State so ask once per State.
+        choice = cache.get(("choice", temp, choices))
+        if choice is None:
+            choice = bot.choose_columns(State(list(choices), None, 0, engine))
+            cache[("choice", temp, choices)] = choice
+        engine.make_choice(choice)
+        if budget:
+            do_stop = attempt >= budget
+        else:
+            stop_key = ("stop", tuple(sorted(engine.temp_progress.items())))
+            do_stop = cache.get(stop_key)
+            if do_stop is None:
+                do_stop = bot.stop_or_continue(State([choice], None, 0, engine)) == 1
+                cache[stop_key] = do_stop
+        if do_stop:
+            for column, temp_rank in engine.temp_progress.items():
+                left = Settings.COLUMN_LENGTHS[column - Settings.MIN_COLUMN] - engine.get_rank(name, column)
+                ranks[column] += min(temp_rank, left) / ROLL_COUNT
+                if temp_rank >= left:
+                    claims[column] += 1 / ROLL_COUNT
+        else:
+            next_bust, next_attempts, next_ranks, next_claims = play_every_roll(engine, name, bot, budget,
+                                                                                attempt + 1, cache)
+            bust += next_bust / ROLL_COUNT
+            attempts += next_attempts / ROLL_COUNT
+            for column in Settings.COLUMN_RANGE:
+                ranks[column] += next_ranks[column] / ROLL_COUNT
+                claims[column] += next_claims[column] / ROLL_COUNT
+        engine.unmake()
+
+    cache[key] = (bust, attempts, ranks, claims)
+    return cache[key]
+
+
+@pytest.mark.parametrize("bot, budget", [
+    (ConservativeBot("A"), None),
+    (ScoringBot("A"), None),
+    (ChoosingScoringBot("A"), None),
+    (RollerBot("A", 2), 2),
+])
+def test_evaluator_matches_brute_force(bot, budget):
+    outcome = PolicyEvaluator(POSITIONS, "A").evaluate(bot)
+    engine = BoardEngine.from_positions(POSITIONS)
+    bust, attempts, ranks, claims = play_every_roll(engine, "A", bot, budget, 1, {})
+
+    assert outcome.bust == pytest.approx(bust)
+    assert outcome.attempts == pytest.approx(attempts)
+    for column in Settings.COLUMN_RANGE:
+        assert outcome.ranks[column] == pytest.approx(ranks[column], abs=1e-12)
+        assert outcome.claims[column] == pytest.approx(claims[column], abs=1e-12)
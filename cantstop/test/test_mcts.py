@@ -0,0 +1,65 @@
+from random import Random
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.bots.bots import ChoosingScoringBot
+from cantstop.lib.engine import BoardEngine
+from cantstop.lib.mcts import ROLL, STOP, MonteCarloSearch, Rollout, search, search_parallel
+from cantstop.lib.odds import ROLL_COUNT
+from cantstop.lib.settings import Settings
+
+# A has won 2 and 12 and is a rank from the top of 7.
+NEAR_WIN = {
+    "A": (3, 0, 0, 0, 0, 12, 0, 0, 0, 0, 3),
+    "B": (0, 2, 4, 1, 0, 3, 0, 0, 5, 1, 0),
+}
+
+
+def test_heuristic_rollout_chooses_like_csb():
+    rng = Random(7)
+    bot = ChoosingScoringBot("A")
+    for _ in range(200):
+        positions = {"A": tuple(rng.randrange(length) for length in Settings.COLUMN_LENGTHS),
+                     "B": (0,) * Settings.COLUMN_COUNT}
+        engine = BoardEngine.from_positions(positions)
+        choices = engine.get_roll_choices("A", rng.randrange(ROLL_COUNT))
+        if not choices:
+            continue
+        rollout = Rollout(engine, ["A", "B"], 0, rng)
+        assert rollout.choose(choices) == bot.choose_columns(State(list(choices), (positions, {}), 0))
+
+
+def test_rollouts_finish_the_game():
+    for policy in ("heuristic", "random"):
+        rng = Random(8)
+        for _ in range(20):
+            engine = BoardEngine.from_positions(NEAR_WIN)
+            winner = Rollout(engine, ["A", "B"], 1, rng, policy).play_out()
+            assert winner in ("A", "B")
+            assert engine.won_counts[winner] >= Settings.COLUMNS_TO_WIN
+
+
+def test_stop_on_the_winning_roll():
+    # Stopping wins now.  Rolling again can bust.
+    engine = BoardEngine.from_positions(NEAR_WIN, {7: 1})
+    stats = search(engine, ["A", "B"], "A", None, 300, seed=9)
+    assert sum(visits for visits, _ in stats.values()) == 300
+    assert stats[STOP][1] == stats[STOP][0]
+    assert stats[STOP][0] > stats[ROLL][0]
+
+    state = State([(7,)], (NEAR_WIN, {7: 1}), 0)
+    assert MonteCarloSearch(rollouts=300, seed=9).stop_or_continue(state, "A") == STOP
+
+
+def test_choose_the_winning_column():
+    state = State([(6,), (7,)], (NEAR_WIN, {}), 0)
+    assert MonteCarloSearch(rollouts=300, seed=10).get_best_choice(state, "A") == (7,)
+
+
+def test_root_parallel_merges_the_trees():
+    engine = BoardEngine.from_positions(NEAR_WIN)
+    choices = ((6,), (7,), (8,))
+    merged = search_parallel(engine, ["A", "B"], "A", choices, 101, seed=11, workers=2, use_threads=True)
+    first = search(engine, ["A", "B"], "A", choices, 51, seed=22)
+    second = search(engine, ["A", "B"], "A", choices, 50, seed=23)
+    for choice in choices:
+        assert merged[choice] == [first[choice][0] + second[choice][0], first[choice][1] + second[choice][1]]
@@ -0,0 +1,155 @@
+import math
+from itertools import combinations, product
+from random import Random
+
+import pytest
+
+from cantstop.lib.odds import ALL_COLUMNS_MASK, HIT_COUNTS, ROLL_COUNT, ROLL_MASKS, ROLL_STATISTICS, ROLL_VALUES, \
+    RollAudit, RollSource, TripleValueOdds, columns_to_mask, get_exact_statistic, get_sampled_statistic, \
+    get_weighted_multisets, hit_odds, mask_to_columns, sample_roll_counts
+from cantstop.lib.settings import Settings
+
+
+def get_brute_sums(values):
+    """
+    :return: set of the sums of every pair of the dice
+    """
+    return {a + b for a, b in combinations(values, 2)}
+
+
+# The pair sums of every roll of four dice.
+BRUTE_SUMS = [get_brute_sums(values) for values in product(range(1, 7), repeat=4)]
+
+
+def count_brute_hits(columns):
+    """
+    :return: how many of the rolls of four dice have a pair that sums to one of the columns
+    """
+    columns = set(columns)
+    return sum(1 for sums in BRUTE_SUMS if sums & columns)
+
+
+def test_roll_values():
+    assert list(ROLL_VALUES) == list(product(range(1, 7), repeat=4))
+
+
+def test_weighted_multisets():
+    assert len(get_weighted_multisets()) == 126
+    assert sum(weight for _, weight in get_weighted_multisets()) == ROLL_COUNT
+
+    # They aren't tied to four d6.
+    multisets = get_weighted_multisets(5, 8)
+    assert len(multisets) == 792
+    assert sum(weight for _, weight in multisets) == 8 ** 5
+    assert dict(multisets)[(1, 1, 2, 8, 8)] == 30
+
+
+def test_roll_masks_match_brute_force():
+    for roll_index, values in enumerate(ROLL_VALUES):
+        assert set(mask_to_columns(ROLL_MASKS[roll_index])) == get_brute_sums(values)
+
+
+def test_hit_counts_match_brute_force():
+    rng = Random(3)
+    masks = [0, ALL_COLUMNS_MASK] + [1 << index for index in range(0, Settings.COLUMN_COUNT)]
+    masks += [rng.randrange(ALL_COLUMNS_MASK + 1) for _ in range(100)]
+    for mask in masks:
+        assert HIT_COUNTS[mask] == count_brute_hits(mask_to_columns(mask))
+
+
+def test_hit_odds():
+    assert hit_odds((6, 7, 8)) == count_brute_hits((6, 7, 8)) / ROLL_COUNT
+    assert hit_odds((6, 7, 8), blocked_columns=[7]) == HIT_COUNTS[columns_to_mask((6, 8))] / ROLL_COUNT
+
+
+def test_triple_value_odds_match_brute_force():
+    rng = Random(4)
+    for _ in range(40):
+        sums = rng.sample(list(Settings.COLUMN_RANGE), 3)
+        odds = TripleValueOdds(sums[0], sums[1]).find_odds(sums[2])
+        assert odds == count_brute_hits(sums) / ROLL_COUNT
+
+
+def test_find_best_third_sum_matches_brute_force():
+    for sum1, sum2 in combinations(Settings.COLUMN_RANGE, 2):
+        best = None
+        for sum3 in sorted(Settings.COLUMN_RANGE, key=lambda column: abs(7 - column)):
+            if sum3 in (sum1, sum2):
+                continue
+            odds = count_brute_hits((sum1, sum2, sum3)) / ROLL_COUNT
+            if best is None or odds > best[1]:
+                best = (sum3, odds)
+        assert TripleValueOdds(sum1, sum2).find_best_third_sum() == best
+
+
+def test_audit_of_every_roll_once():
+    audit = RollAudit(report_every=0)
+    for roll_index in range(0, ROLL_COUNT):
+        audit.observe(roll_index)
+    for index in range(0, Settings.COLUMN_COUNT):
+        assert audit.hits[index] == HIT_COUNTS[1 << index]
+
+    report = audit.get_report()
+    assert report.rolls == ROLL_COUNT
+    assert report.chi_square == 0
+    assert report.p_value == pytest.approx(1.0)
+    assert report.worst_sum_z == pytest.approx(0.0, abs=1e-9)
+
+
+def test_audit_of_a_stuck_stream():
+    audit = RollAudit(report_every=0)
+    for _ in range(0, 500):
+        audit.observe(7)
+    report = audit.get_report()
+    assert report.chi_square == pytest.approx((ROLL_COUNT - 1) * 500)
+    assert report.p_value == pytest.approx(0.0)
+    assert math.isnan(report.serial_correlation)
+
+
+def test_audit_of_an_alternating_stream():
+    reports = []
+    audit = RollAudit(report_every=1000, reporter=reports.append)
+    for i in range(0, 10000):
+        audit.observe(100 if i % 2 else 1200)
+    assert [report.rolls for report in reports] == list(range(1000, 10001, 1000))
+    assert reports[-1].serial_correlation == pytest.approx(-1.0, abs=1e-3)
+    assert reports[-1].serial_z < -50
+
+
+@pytest.mark.parametrize("title, count_labels", ROLL_STATISTICS)
+def test_exact_statistics_match_brute_force(title, count_labels):
+    totals = {}
+    squares = {}
+    for values in product(range(1, 7), repeat=4):
+        for label, count in count_labels(values).items():
+            totals[label] = totals.get(label, 0) + count
+            squares[label] = squares.get(label, 0) + count * count
+
+    moments = get_exact_statistic(count_labels)
+    assert sorted(moments) == sorted(totals)
+    for label, (mean, variance) in moments.items():
+        assert mean == pytest.approx(totals[label] / ROLL_COUNT)
+        assert variance == pytest.approx(squares[label] / ROLL_COUNT - (totals[label] / ROLL_COUNT) ** 2)
+
+    # Every roll once is exact.
+    sampled = get_sampled_statistic(count_labels, [1] * ROLL_COUNT)
+    for label, (mean, _) in moments.items():
+        assert sampled[label] == pytest.approx(mean)
+
+
+def test_sampled_statistics_are_close():
+    pytest.importorskip("numpy")
+    rolls = 1000000
+    counts = sample_roll_counts(rolls, seed=12)
+    assert sum(counts) == rolls
+    assert counts == sample_roll_counts(rolls, seed=12)
+
+    sampled = get_sampled_statistic(ROLL_STATISTICS[2][1], counts)
+    for column, (mean, variance) in get_exact_statistic(ROLL_STATISTICS[2][1]).items():
+        assert abs(sampled[column] - mean) < 5 * math.sqrt(variance / rolls)
+
+
+def test_sample_a_roll_source():
+    counts = sample_roll_counts(5000, source=RollSource(13))
+    assert sum(counts) == 5000
+    assert counts == sample_roll_counts(5000, source=RollSource(13))
@@ -0,0 +1,33 @@
+import pytest
+
+from cantstop.lib.odds import ALL_COLUMNS_MASK
+from cantstop.lib.search import ExpectimaxSearch
+from cantstop.lib.settings import Settings
+from cantstop.lib.solver import TurnSolver
+
+# Two ranks from the top of every column, so every turn ends within a few
+# rolls and the search gets to the bottom of it.  Column 12 is won.
+RANKS = tuple(length - 2 for length in Settings.COLUMN_LENGTHS)
+OPEN_MASK = ALL_COLUMNS_MASK & ~(1 << 10)
+
+
+@pytest.mark.parametrize("temp_progress", [{}, {7: 1}, {4: 2, 9: 1}, {2: 1, 6: 1, 10: 2}])
+def test_exact_search_matches_solver(temp_progress):
+    solver = TurnSolver(RANKS, OPEN_MASK)
+    search = ExpectimaxSearch(RANKS, OPEN_MASK, budget=None)
+    temp = search.get_temp(temp_progress)
+
+    value = search.deepen(lambda depth: search.search_go_value(temp, depth))
+    assert not search.reached_horizon
+    assert value == pytest.approx(solver.get_go_value(temp))
+    assert search.should_continue(temp_progress) == solver.should_continue(temp_progress)
+
+
+def test_depth_limit_is_repeatable():
+    choices = ((2, 12), (6, 8), (7,))
+    answers = set()
+    for _ in range(3):
+        search = ExpectimaxSearch(RANKS, OPEN_MASK, budget=None, max_depth=1)
+        answers.add(search.get_best_choice({}, choices))
+        assert search.reached_horizon
+    assert len(answers) == 1
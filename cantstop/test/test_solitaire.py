@@ -0,0 +1,53 @@
+import math
+from random import Random
+
+import pytest
+
+from cantstop.lib.odds import hit_odds
+from cantstop.lib.settings import Settings
+from cantstop.lib.solitaire import SolitaireTable, decode, encode, get_board_count, get_strides, is_won, \
+    solve_board, solve_table
+from cantstop.lib.solver import TurnSolver
+
+ONE_RANK = (1,) * Settings.COLUMN_COUNT
+
+
+def test_encode_decode_round_trip():
+    rng = Random(6)
+    lengths = Settings.COLUMN_LENGTHS
+    strides = get_strides(lengths)
+    assert encode((0,) * Settings.COLUMN_COUNT, strides) == 0
+    assert encode(lengths, strides) == get_board_count(lengths) - 1
+    for _ in range(1000):
+        ranks = tuple(rng.randint(0, length) for length in lengths)
+        assert decode(encode(ranks, strides), lengths) == ranks
+
+
+def test_solve_board_with_one_column_left():
+    # Every column is a rank long and all of them but 2 are won.  A turn
+    # either hits 2 and wins or busts, so it takes 1 / hit odds turns.
+    values = [0.0 if is_won(decode(index, ONE_RANK), ONE_RANK, Settings.COLUMN_COUNT) else math.nan
+              for index in range(0, get_board_count(ONE_RANK))]
+    ranks = (0,) + (1,) * (Settings.COLUMN_COUNT - 1)
+
+    # The bots' values are left alone.
+    solver = TurnSolver((0,) * Settings.COLUMN_COUNT)
+    solver.get_value(())
+    count = len(solver.values)
+
+    assert solve_board(values, ranks, ONE_RANK) == pytest.approx(1 / hit_odds((2,)))
+    assert len(solver.values) == count
+
+
+def test_solve_table(monkeypatch, tmp_path):
+    # Any roll wins a column so the game takes one turn.
+    monkeypatch.setenv("CANTSTOP_CACHE_DIR", str(tmp_path))
+    assert SolitaireTable.load(ONE_RANK, 1) is None
+    assert solve_table(lengths=ONE_RANK, columns_to_win=1) == pytest.approx(1.0)
+
+    table = SolitaireTable.load(ONE_RANK, 1)
+    assert table.get_expected_turns((0,) * Settings.COLUMN_COUNT) == pytest.approx(1.0)
+    assert table.get_expected_turns(ONE_RANK) == 0.0
+
+    # It's solved so there's nothing left to do.
+    assert solve_table(lengths=ONE_RANK, columns_to_win=1) == pytest.approx(1.0)
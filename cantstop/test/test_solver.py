@@ -0,0 +1,108 @@
+import pytest
+
+from cantstop.lib.all_the_things import State
+from cantstop.lib.bots.bots import AdaptiveRollerBot
+from cantstop.lib.engine import get_roll_choices
+from cantstop.lib.odds import ALL_COLUMNS_MASK, ROLL_COUNT, columns_to_mask, hit_odds
+from cantstop.lib.settings import Settings
+from cantstop.lib.solver import TurnSolver, get_survival_curve
+
+# A tiny board where column 12 is won by someone else.
+LENGTHS = (1, 1, 2, 2, 2, 3, 2, 2, 2, 1, 1)
+RANKS = (0, 0, 1, 0, 1, 1, 0, 1, 0, 0, 0)
+OPEN_MASK = ALL_COLUMNS_MASK & ~(1 << 10)
+
+
+def get_gain(temp):
+    gain = 0
+    for column, temp_rank in temp:
+        rank = RANKS[column - Settings.MIN_COLUMN]
+        length = LENGTHS[column - Settings.MIN_COLUMN]
+        gain += ((rank + temp_rank) ** 2 - rank ** 2) / (length * length)
+    return gain * 100
+
+
+def advance(temp, choice):
+    progress = dict(temp)
+    for column in choice:
+        index = column - Settings.MIN_COLUMN
+        progress[column] = min(progress.get(column, 0) + 1, LENGTHS[index] - RANKS[index])
+    return tuple(sorted(progress.items()))
+
+
+def get_go_value(temp, cache):
+    """
+    Roll every one of the dice rolls and take the best choice of each.
+    """
+    temp_mask = 0
+    blocked_mask = ALL_COLUMNS_MASK ^ OPEN_MASK
+    for column, temp_rank in temp:
+        index = column - Settings.MIN_COLUMN
+        temp_mask |= 1 << index
+        if RANKS[index] + temp_rank >= LENGTHS[index]:
+            blocked_mask |= 1 << index
+
+    total = 0
+    for roll_index in range(0, ROLL_COUNT):
+        choices = get_roll_choices(roll_index, Settings.MARKER_COUNT - len(temp), temp_mask, blocked_mask)
+        if choices:
+            total += max(get_value(advance(temp, choice), cache) for choice in choices)
+    return total / ROLL_COUNT
+
+
+def get_value(temp, cache):
+    if temp not in cache:
+        cache[temp] = max(get_gain(temp), get_go_value(temp, cache))
+    return cache[temp]
+
+
+def test_solver_matches_brute_force():
+    solver = TurnSolver(RANKS, OPEN_MASK, lengths=LENGTHS)
+    cache = {}
+    assert solver.get_go_value(()) == pytest.approx(get_go_value((), cache))
+
+    for temp_progress in ({4: 1}, {7: 1, 8: 1}, {3: 1, 6: 1}, {5: 1, 7: 2, 9: 1}, {2: 1, 4: 1, 10: 2}):
+        temp = tuple(sorted(temp_progress.items()))
+        turn_value = solver.evaluate(temp_progress)
+        assert turn_value.stop == pytest.approx(get_gain(temp))
+        assert turn_value.go == pytest.approx(get_go_value(temp, cache))
+
+    choices = ((4, 9), (6, 7), (3,))
+    best = max(choices, key=lambda choice: get_value(advance((), choice), cache))
+    assert solver.get_best_choice({}, choices) == best
+
+
+def test_survival_with_every_marker_placed():
+    # The columns are too long to max out so every attempt is the same.
+    solver = TurnSolver((0,) * Settings.COLUMN_COUNT)
+    curve = solver.get_survival_curve({6: 1, 7: 1, 8: 1}, 8)
+    odds = hit_odds((6, 7, 8))
+    assert curve == pytest.approx([odds ** k for k in range(1, 9)])
+
+
+def test_survival_until_the_columns_max_out():
+    # 6 and 8 are maxed and 7 has three ranks left, so the fourth attempt
+    # has nothing to roll for.
+    left = [0] * Settings.COLUMN_COUNT
+    left[7 - Settings.MIN_COLUMN] = 3
+    curve = get_survival_curve(tuple(left), columns_to_mask((6, 7, 8)), 6)
+    odds = hit_odds((7,))
+    assert curve == pytest.approx([odds, odds ** 2, odds ** 3, 0, 0, 0])
+
+
+def test_survival_of_a_new_turn():
+    curve = TurnSolver((0,) * Settings.COLUMN_COUNT).get_survival_curve({}, 3)
+    assert curve[0] == pytest.approx(1.0)
+    assert curve[1] < 1.0
+    assert curve[2] < curve[1]
+
+
+def test_adaptive_roller_budget():
+    bot = AdaptiveRollerBot("A", target=0.5, max_budget=12)
+    state = State([(6, 8)], ({"A": (0,) * Settings.COLUMN_COUNT}, {6: 1, 7: 1, 8: 1}), 0)
+    bot.choose_columns(state)
+    assert bot.stop_or_continue(state) == 2
+
+    # It survives as many attempts as it keeps at least even odds.
+    odds = hit_odds((6, 7, 8))
+    assert bot.risk_budget == sum(1 for k in range(1, 12) if odds ** k >= 0.5)
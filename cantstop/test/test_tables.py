@@ -0,0 +1,48 @@
+from cantstop.lib.tables import TABLE_HEADER, close_table, create_table, get_cache_path, map_table
+
+
+def test_create_and_map_table(tmp_path):
+    path = str(tmp_path / "squares.bin")
+    create_table(path, "d", 1000, (float(i * i) for i in range(0, 1000)))
+
+    values = map_table(path, "d")
+    assert len(values) == 1000
+    assert values[999] == 999.0 * 999.0
+    assert values.readonly
+    close_table(values)
+
+    # The header says what's in the file so other arrays are turned down.
+    assert map_table(path, "f") is None
+    assert map_table(str(tmp_path / "missing.bin"), "d") is None
+
+
+def test_writable_table(tmp_path):
+    path = str(tmp_path / "zeros.bin")
+    create_table(path, "f", 10, [0.0] * 10)
+    values = map_table(path, "f", writable=True)
+    values[3] = 1.5
+    close_table(values)
+
+    values = map_table(path, "f")
+    assert list(values) == [0.0, 0.0, 0.0, 1.5] + [0.0] * 6
+    close_table(values)
+
+
+def test_cut_short_table(tmp_path):
+    path = str(tmp_path / "short.bin")
+    create_table(path, "d", 10, [1.0] * 10)
+    with open(path, "r+b") as table_file:
+        table_file.truncate(TABLE_HEADER.size + 8)
+    assert map_table(path, "d") is None
+
+
+def test_cache_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("CANTSTOP_CACHE_DIR", str(tmp_path))
+    path = get_cache_path("solitaire", 1, ("rules", 3))
+    assert path.startswith(str(tmp_path))
+    assert get_cache_path("solitaire", 1, ("rules", 3)) == path
+    assert get_cache_path("solitaire", 1, ("rules", 2)) != path
+    assert get_cache_path("solitaire", 2, ("rules", 3)) != path
+
+    monkeypatch.setenv("CANTSTOP_CACHE_DIR", "")
+    assert get_cache_path("solitaire", 1, ("rules", 3)) is None